@@ -37,6 +37,9 @@ requires = ['pandas', 'openpyxl', 'tabulate', 'plotly', 'kaleido != 0.2.1']
 extras_require = {
     'test': [
         'dulwich'
+    ],
+    'watch': [
+        'watchdog'
     ]
 }
 
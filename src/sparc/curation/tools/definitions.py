@@ -11,11 +11,21 @@ SCAFFOLD_THUMBNAIL_MIME = 'image/x.vnd.abi.thumbnail+jpeg'
 STL_MODEL_MIME = 'model/stl'
 VTK_MODEL_MIME = 'model/vtk'
 
+ALT_FORM_EXTENSION_TO_MIMETYPE_MAP = {
+    '.stl': STL_MODEL_MIME,
+    '.vtk': VTK_MODEL_MIME,
+}
+ALT_FORM_MIMES = list(ALT_FORM_EXTENSION_TO_MIMETYPE_MAP.values())
+
 OLD_SCAFFOLD_MIMES = [SCAFFOLD_DIR_MIME, 'inode/vnd.abi.scaffold+file', 'inode/vnd.abi.scaffold+thumbnail']
 
 SIZE_NAME = ("B", "KiB", "MiB", "GiB", "TiB", "PiB", "EiB", "ZiB", "YiB")
 
 MANIFEST_FILENAME = 'manifest.xlsx'
+MANIFEST_FILENAMES = (MANIFEST_FILENAME, 'manifest.csv', 'manifest.tsv', 'manifest.json')
+
+CACHE_DIRNAME = '.sparc-curation-cache'
+IGNORE_FILENAME = '.sparcignore'
 
 ADDITIONAL_TYPES_COLUMN = 'additional types'
 ANATOMICAL_ENTITY_COLUMN = 'IsAboutAnatomicalEntity'
@@ -23,9 +33,12 @@ DERIVED_FROM_COLUMN = 'IsDerivedFrom'
 FILE_LOCATION_COLUMN = 'file_location'
 FILENAME_COLUMN = 'filename'
 MANIFEST_DIR_COLUMN = 'manifest_dir'
+MANIFEST_PATH_COLUMN = 'manifest_path'
 SHEET_NAME_COLUMN = 'sheet_name'
+DEFAULT_SHEET_NAME = 'Sheet1'
 SOURCE_OF_COLUMN = 'IsSourceOf'
 SUPPLEMENTAL_JSON_COLUMN = 'Supplemental JSON Metadata'
+MANIFEST_VALIDATION_COLUMNS = [FILENAME_COLUMN, ADDITIONAL_TYPES_COLUMN, DERIVED_FROM_COLUMN, SOURCE_OF_COLUMN]
 
 MIMETYPE_TO_FILETYPE_MAP = {
     SCAFFOLD_META_MIME: 'Metadata',
@@ -204,6 +204,26 @@ class IncorrectDerivedFromError(IncorrectBaseError):
         super(IncorrectDerivedFromError, self).__init__(message, location, mime, target)
 
 
+class MovedFileError(IncorrectBaseError):
+    """
+    Class for errors related to annotated files that have been moved.
+    Inherits from IncorrectBaseError.
+    """
+
+    def __init__(self, location, mime, target):
+        """
+        Initialize the MovedFileError object.
+
+        Args:
+            location (str): Location of the file in the manifest.
+            mime (str): MIME type of the file.
+            target (str): Location the file has been moved to.
+        """
+        fileType = MIMETYPE_TO_FILETYPE_MAP.get(mime, 'unknown')
+        message = f"Found Scaffold '{fileType}' file '{location}' has been moved to '{target}'."
+        super(MovedFileError, self).__init__(message, location, mime, target)
+
+
 class IncorrectAnnotationError(ScaffoldAnnotationError):
     """
     Class for errors related to incorrect annotations.
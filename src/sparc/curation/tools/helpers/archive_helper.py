@@ -0,0 +1,136 @@
+import os
+import posixpath
+import tarfile
+import zipfile
+from pathlib import Path
+
+from sparc.curation.tools.definitions import CACHE_DIRNAME, MANIFEST_FILENAMES
+
+
+def is_dataset_archive(dataset_path):
+    """
+    Check if the given dataset path is a zip or tar archive rather than a directory.
+
+    Args:
+        dataset_path (str): The dataset path.
+
+    Returns:
+        bool: True if the path is a zip or tar archive file.
+    """
+    dataset_path = str(dataset_path)
+    if not os.path.isfile(dataset_path):
+        return False
+
+    return zipfile.is_zipfile(dataset_path) or tarfile.is_tarfile(dataset_path)
+
+
+class DatasetArchive(object):
+    """
+    Read-only dataset held in a zip or tar archive.
+
+    The members of the archive are given paths as if the archive were a
+    directory at the archive's path, so a member 'derivative/view.json' of
+    'dataset.zip' has the path 'dataset.zip/derivative/view.json'.  Members are
+    streamed from the archive when they are read, nothing is extracted to disk.
+    Compressed tar archives are read fastest in archive order, see get_files.
+    """
+
+    def __init__(self, archive_path):
+        """
+        Initialize the DatasetArchive object.
+
+        Args:
+            archive_path (str): The path to the zip or tar archive.
+        """
+        self._archive_path = str(Path(archive_path))
+        self._zip_file = None
+        self._tar_file = None
+        self._members = {}
+        if zipfile.is_zipfile(self._archive_path):
+            self._zip_file = zipfile.ZipFile(self._archive_path)
+            for info in self._zip_file.infolist():
+                if not info.is_dir():
+                    self._add_member(info.filename, info.file_size, info)
+        else:
+            self._tar_file = tarfile.open(self._archive_path)
+            for info in self._tar_file.getmembers():
+                if info.isfile():
+                    self._add_member(info.name, info.size, info)
+
+    def _add_member(self, member_name, size, info):
+        member_name = posixpath.normpath(member_name.lstrip('/'))
+        if member_name.startswith(os.pardir):
+            return
+
+        self._members[os.path.join(self._archive_path, *member_name.split('/'))] = (member_name, size, info)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_archive_path(self):
+        return self._archive_path
+
+    def get_files(self, prune_rules=None):
+        """
+        Get the files held in the archive, in archive order.
+
+        Like walk_dataset_files the scan cache directory is skipped, as are the
+        files and directories matching the prune rules.
+
+        Args:
+            prune_rules (PruneRules): Optional rules for the files and directories to skip.
+
+        Returns:
+            list: Tuples of the path and size of each file.
+        """
+        files = []
+        for file_path, (member_name, size, _) in self._members.items():
+            parts = member_name.split('/')
+            if CACHE_DIRNAME in parts[:-1]:
+                continue
+            if prune_rules is not None and \
+                    (any(prune_rules.is_pruned(os.path.join(*parts[:i]), True) for i in range(1, len(parts))) or
+                     prune_rules.is_pruned(os.path.join(*parts), False)):
+                continue
+            files.append((file_path, size))
+
+        return files
+
+    def get_manifest_paths(self):
+        return [file_path for file_path in self._members if os.path.basename(file_path) in MANIFEST_FILENAMES]
+
+    def is_file(self, file_path):
+        return os.path.normpath(str(file_path)) in self._members
+
+    def open(self, file_path):
+        """
+        Open a file held in the archive for reading.
+
+        Args:
+            file_path (str): The path to the file, see the class description.
+
+        Returns:
+            file object: The binary file object to read the file from.
+
+        Raises:
+            FileNotFoundError: If the archive does not hold the file.
+        """
+        member = self._members.get(str(file_path))
+        if member is None:
+            raise FileNotFoundError(f"No file '{file_path}' in archive '{self._archive_path}'.")
+
+        if self._zip_file is not None:
+            return self._zip_file.open(member[2])
+
+        return self._tar_file.extractfile(member[2])
+
+    def close(self):
+        if self._zip_file is not None:
+            self._zip_file.close()
+            self._zip_file = None
+        if self._tar_file is not None:
+            self._tar_file.close()
+            self._tar_file = None
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+
+from sparc.curation.tools.definitions import CACHE_DIRNAME
+
+SCAN_CACHE_FILENAME = 'scan.sqlite'
+SCAN_CACHE_VERSION = '4'
+MANIFEST_CACHE_DIRNAME = 'manifests'
+MANIFEST_CACHE_VERSION = '1'
+
+
+def get_cache_dir(dataset_dir):
+    """
+    Get the directory used to cache scan results for the given dataset.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+
+    Returns:
+        str: The cache directory path.
+    """
+    return os.path.join(dataset_dir, CACHE_DIRNAME)
+
+
+def file_cache_key(stat_result):
+    """
+    Get the key a file's cached classification is stored under.
+
+    Args:
+        stat_result (os.stat_result): The stat result for the file.
+
+    Returns:
+        tuple: The size, modification time in nanoseconds and inode of the file.
+    """
+    return stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino
+
+
+class ScanCache(object):
+    """
+    Persistent cache of the classification results of dataset files.
+
+    Each file's roles and view URLs are stored against its path and are only
+    returned while the file's size, modification time and inode are unchanged.
+    The cache is held in a SQLite database in the cache directory.  Cached
+    results are discarded whenever the scan settings differ from the settings
+    the results were produced with.
+    """
+
+    def __init__(self, cache_dir):
+        self._cache_dir = cache_dir
+        self._entries = None
+        self._updated = {}
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            self._connection = sqlite3.connect(os.path.join(self._cache_dir, SCAN_CACHE_FILENAME))
+            self._connection.execute('CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, '
+                                     'mtime_ns INTEGER, inode INTEGER, roles TEXT, view_urls TEXT)')
+
+        return self._connection
+
+    def use_settings(self, settings):
+        """
+        Load the cached entries, discarding them if they were produced with different settings.
+
+        Args:
+            settings (dict): The settings the scan is made with.
+        """
+        connection = self._connect()
+        settings = json.dumps(dict(settings, version=SCAN_CACHE_VERSION), sort_keys=True)
+        row = connection.execute("SELECT value FROM settings WHERE name = 'scan'").fetchone()
+        if row is None or row[0] != settings:
+            with connection:
+                connection.execute('DELETE FROM files')
+                connection.execute("INSERT OR REPLACE INTO settings VALUES ('scan', ?)", (settings,))
+
+        self._entries = {}
+        for path, size, mtime_ns, inode, roles, view_urls in connection.execute('SELECT * FROM files'):
+            self._entries[path] = ((size, mtime_ns, inode), roles, view_urls)
+        self._updated = {}
+
+    def get(self, file_path, key):
+        """
+        Get the cached classification of a file.
+
+        Args:
+            file_path (str): The path to the file.
+            key (tuple): The cache key of the file, see file_cache_key.
+
+        Returns:
+            tuple: A set of roles and a list of view URLs, None if the file has no valid cached entry.
+        """
+        entry = self._entries.get(file_path)
+        if entry is None or entry[0] != key:
+            return None
+
+        return set(filter(None, entry[1].split(','))), json.loads(entry[2])
+
+    def set(self, file_path, key, roles, view_urls):
+        """
+        Set the cached classification of a file.
+
+        Args:
+            file_path (str): The path to the file.
+            key (tuple): The cache key of the file, see file_cache_key.
+            roles (set): The roles of the file.
+            view_urls (list): The view URLs of the file.
+        """
+        entry = (tuple(key), ','.join(sorted(roles)), json.dumps(view_urls))
+        self._entries[file_path] = entry
+        self._updated[file_path] = entry
+
+    def get_shard(self, dir_paths):
+        """
+        Get a detached copy of the cache holding only the entries of the files under the given directories.
+
+        The copy can be sent to a worker process, its updates are brought back with merge_updates.
+
+        Args:
+            dir_paths (list): The directory paths of the shard.
+
+        Returns:
+            ScanCache: A cache with the entries of the shard's files, that is never saved itself.
+        """
+        prefixes = tuple(os.path.join(dir_path, '') for dir_path in dir_paths)
+        shard = ScanCache(self._cache_dir)
+        shard._entries = {path: entry for path, entry in self._entries.items() if path.startswith(prefixes)}
+        return shard
+
+    def get_updates(self):
+        return dict(self._updated)
+
+    def merge_updates(self, updates):
+        """
+        Merge the updated entries of a shard into the cache.
+
+        Args:
+            updates (dict): The updated entries from the shard's get_updates.
+        """
+        self._entries.update(updates)
+        self._updated.update(updates)
+
+    def save(self, present_paths):
+        """
+        Write the updated entries to disk and drop the entries of files that no longer exist.
+
+        Args:
+            present_paths (set): The paths of all the files found in the scan.
+        """
+        connection = self._connect()
+        removed_paths = [path for path in self._entries if path not in present_paths]
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(path,) + tuple(key) + (roles, view_urls)
+                                    for path, (key, roles, view_urls) in self._updated.items()])
+            connection.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in removed_paths])
+
+        for path in removed_paths:
+            del self._entries[path]
+        self._updated = {}
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class ManifestCache(object):
+    """
+    Persistent cache of the parsed sheets of manifest files.
+
+    The sheets of each manifest file are pickled to their own file in the
+    manifests directory of the cache directory, named by a hash of the manifest
+    file's path.  The cached sheets are only returned while the manifest file's
+    size, modification time and inode are unchanged.
+    """
+
+    def __init__(self, cache_dir):
+        self._cache_dir = os.path.join(cache_dir, MANIFEST_CACHE_DIRNAME)
+
+    def _get_entry_path(self, manifest_path):
+        digest = hashlib.blake2b(os.path.realpath(manifest_path).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self._cache_dir, f"{digest}.pickle")
+
+    def get(self, manifest_path, key):
+        """
+        Get the cached sheets of a manifest file.
+
+        Args:
+            manifest_path (str): The path to the manifest file.
+            key (tuple): The cache key of the manifest file, see file_cache_key.
+
+        Returns:
+            dict: Maps each sheet name to the data frame of the sheet, None if the manifest file has no valid cached entry.
+        """
+        try:
+            with open(self._get_entry_path(manifest_path), 'rb') as f:
+                version, path, entry_key, sheets = pickle.load(f)
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+            return None
+
+        if version != MANIFEST_CACHE_VERSION or path != os.path.realpath(manifest_path) or entry_key != tuple(key):
+            return None
+
+        return sheets
+
+    def set(self, manifest_path, key, sheets):
+        """
+        Set the cached sheets of a manifest file.
+
+        The entry is written to a temporary file that then replaces the old entry,
+        so a partly written entry is never read.
+
+        Args:
+            manifest_path (str): The path to the manifest file.
+            key (tuple): The cache key of the manifest file, see file_cache_key.
+            sheets (dict): Maps each sheet name to the data frame of the sheet.
+        """
+        os.makedirs(self._cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self._cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((MANIFEST_CACHE_VERSION, os.path.realpath(manifest_path), tuple(key), sheets), f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._get_entry_path(manifest_path))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
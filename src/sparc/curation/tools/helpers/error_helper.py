@@ -4,11 +4,11 @@ import pandas as pd
 
 from sparc.curation.tools.helpers.base import Singleton
 from sparc.curation.tools.errors import IncorrectAnnotationError, NotAnnotatedError, IncorrectDerivedFromError, \
-    IncorrectSourceOfError, OldAnnotationError
+    IncorrectSourceOfError, OldAnnotationError, MovedFileError
 from sparc.curation.tools.definitions import FILE_LOCATION_COLUMN, FILENAME_COLUMN, ADDITIONAL_TYPES_COLUMN, \
     SCAFFOLD_META_MIME, SCAFFOLD_VIEW_MIME, \
     SCAFFOLD_THUMBNAIL_MIME, DERIVED_FROM_COLUMN, SOURCE_OF_COLUMN, MANIFEST_DIR_COLUMN, \
-    OLD_SCAFFOLD_MIMES, MIMETYPE_TO_PARENT_FILETYPE_MAP, MIMETYPE_TO_FILETYPE_MAP, STL_MODEL_MIME, VTK_MODEL_MIME, SCAFFOLD_INFO_MIME
+    OLD_SCAFFOLD_MIMES, MIMETYPE_TO_PARENT_FILETYPE_MAP, MIMETYPE_TO_FILETYPE_MAP, SCAFFOLD_INFO_MIME, ALT_FORM_MIMES
 from sparc.curation.tools.helpers.file_helper import OnDiskFiles
 from sparc.curation.tools.helpers.manifest_helper import ManifestDataFrame
 
@@ -20,6 +20,8 @@ def fix_error(error):
     # Correct old annotation first, then incorrect annotation, and lastly no annotation.
     if isinstance(error, OldAnnotationError) or isinstance(error, IncorrectAnnotationError):
         ManifestDataFrame().update_additional_type(error.get_location(), None)
+    elif isinstance(error, MovedFileError):
+        ErrorManager().relocate_annotation(error.get_location(), error.get_target())
     elif isinstance(error, NotAnnotatedError):
         ManifestDataFrame().update_additional_type(error.get_location(), error.get_mime())
     elif isinstance(error, IncorrectDerivedFromError):
@@ -47,6 +49,7 @@ class ErrorManager(metaclass=Singleton):
         self.manifest_thumbnail_files = None
         self._manifest_alt_forms_files = None
         self.on_disk_context_info_files = None
+        self._fingerprint_index = None
 
         self.update_content()
 
@@ -69,8 +72,8 @@ class ErrorManager(metaclass=Singleton):
                                                                          SCAFFOLD_THUMBNAIL_MIME,
                                                                          FILE_LOCATION_COLUMN)
         self._manifest_alt_forms_files = {
-            STL_MODEL_MIME: self.manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, STL_MODEL_MIME, FILE_LOCATION_COLUMN),
-            VTK_MODEL_MIME: self.manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, VTK_MODEL_MIME, FILE_LOCATION_COLUMN),
+            mime_type: self.manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, mime_type, FILE_LOCATION_COLUMN)
+            for mime_type in ALT_FORM_MIMES
         }
 
     # === Find Errors ===
@@ -116,13 +119,62 @@ class ErrorManager(metaclass=Singleton):
         #     if i not in manifest_thumbnail_files:
         #         errors.append(NotAnnotatedError(i, SCAFFOLD_THUMBNAIL_MIME))
 
-        for mime_type in [STL_MODEL_MIME, VTK_MODEL_MIME]:
+        for mime_type in ALT_FORM_MIMES:
             for i in self._on_disk_alt_forms_files[mime_type]:
                 if i not in self._manifest_alt_forms_files[mime_type]:
                     errors.append(NotAnnotatedError(i, mime_type))
 
         return errors
 
+    def set_fingerprint_index(self, fingerprint_index):
+        """
+        Set the fingerprint index used to recognise moved files, see get_moved_files.
+
+        Args:
+            fingerprint_index (FingerprintIndex): The fingerprint index, None to not look for moved files.
+        """
+        self._fingerprint_index = fingerprint_index
+
+    def get_fingerprint_index(self):
+        return self._fingerprint_index
+
+    def get_moved_files(self):
+        """
+        Get errors for annotated files that have been moved.
+
+        A file annotated in the manifest that no longer exists has been moved if
+        exactly one on-disk file of the same type that is not annotated has the
+        fingerprint the missing file had when it was last indexed.  Moved files
+        are only looked for when a fingerprint index has been set.
+
+        Returns:
+            list: List of MovedFileError objects.
+        """
+        errors = []
+        if self._fingerprint_index is None:
+            return errors
+
+        relocatable = [
+            (SCAFFOLD_META_MIME, self.manifest_metadata_files, self.on_disk_metadata_files),
+            (SCAFFOLD_VIEW_MIME, self.manifest_view_files, self.on_disk_view_files),
+            (SCAFFOLD_THUMBNAIL_MIME, self.manifest_thumbnail_files, self.on_disk_thumbnail_files),
+        ]
+        relocatable.extend((mime_type, self._manifest_alt_forms_files[mime_type], self._on_disk_alt_forms_files[mime_type])
+                           for mime_type in ALT_FORM_MIMES)
+
+        for mime_type, manifest_files, on_disk_files in relocatable:
+            not_annotated_files = [i for i in on_disk_files if i not in manifest_files]
+            for i in manifest_files:
+                fingerprint = self._fingerprint_index.get_fingerprint(i)
+                if fingerprint is None or self.on_disk.is_file(i):
+                    continue
+
+                moved_to = [f for f in self._fingerprint_index.find_current_paths(fingerprint) if f in not_annotated_files]
+                if len(moved_to) == 1:
+                    errors.append(MovedFileError(i, mime_type, moved_to[0]))
+
+        return errors
+
     def get_incorrect_annotations(self):
         """
         Get errors for incorrect annotations in the manifest dataframe.
@@ -195,7 +247,7 @@ class ErrorManager(metaclass=Singleton):
             SCAFFOLD_THUMBNAIL_MIME)
         errors.extend(thumbnail_derived_from_errors)
 
-        for mime_type in [STL_MODEL_MIME, VTK_MODEL_MIME]:
+        for mime_type in ALT_FORM_MIMES:
             alt_forms_derived_from_errors = self._process_incorrect_derived_from(
                 self._on_disk_alt_forms_files[mime_type], self.on_disk_view_files, self._manifest_alt_forms_files[mime_type], mime_type)
             errors.extend(alt_forms_derived_from_errors)
@@ -226,7 +278,7 @@ class ErrorManager(metaclass=Singleton):
                         source_of_mimetype = self.manifest.get_matching_entry(FILENAME_COLUMN, source_of, ADDITIONAL_TYPES_COLUMN)
                         if _is_valid_mimetype_for(mimetype, source_of_mimetype[0]):
                             on_disk_source_of = self.manifest.get_matching_entry(FILENAME_COLUMN, source_of, FILE_LOCATION_COLUMN)
-                            if not os.path.isfile(on_disk_source_of[0]):
+                            if not self.on_disk.is_file(on_disk_source_of[0]):
                                 errors.append(IncorrectSourceOfError(on_disk_file, mimetype, on_disk_child_files))
                         else:
                             corrected_source_of_entries = source_of_entries[:] + on_disk_child_files
@@ -285,7 +337,7 @@ class ErrorManager(metaclass=Singleton):
         view_source_of_errors = self._process_incorrect_source_of(self.on_disk_view_files, SCAFFOLD_VIEW_MIME, self.on_disk_thumbnail_files)
         errors.extend(view_source_of_errors)
 
-        for mime_type in [STL_MODEL_MIME, VTK_MODEL_MIME]:
+        for mime_type in ALT_FORM_MIMES:
             alt_forms_derived_from_errors = self._process_incorrect_source_of(
                 self.on_disk_view_files, SCAFFOLD_VIEW_MIME, self._on_disk_alt_forms_files[mime_type])
             errors.extend(alt_forms_derived_from_errors)
@@ -325,7 +377,7 @@ class ErrorManager(metaclass=Singleton):
                     values = self.manifest.get_matching_entry(FILE_LOCATION_COLUMN, source_of, DERIVED_FROM_COLUMN)
                     mimetypes = self.manifest.get_matching_entry(FILE_LOCATION_COLUMN, source_of,
                                                                  ADDITIONAL_TYPES_COLUMN)
-                    if mimetypes[0] in [STL_MODEL_MIME, VTK_MODEL_MIME]:
+                    if mimetypes[0] in ALT_FORM_MIMES:
                         pass
                     elif mimetypes[0] != SCAFFOLD_THUMBNAIL_MIME:
                         errors.append(NotAnnotatedError(source_of, SCAFFOLD_THUMBNAIL_MIME))
@@ -361,7 +413,7 @@ class ErrorManager(metaclass=Singleton):
                 if source_manifest == target_manifest:
                     target_filenames.extend(
                         self.manifest.get_matching_entry(FILE_LOCATION_COLUMN, t, FILENAME_COLUMN))
-        elif mime in [SCAFFOLD_THUMBNAIL_MIME, STL_MODEL_MIME, VTK_MODEL_MIME]:
+        elif mime in [SCAFFOLD_THUMBNAIL_MIME] + ALT_FORM_MIMES:
             target_filenames = self._find_best_match(file_location, source_manifest, target)
         elif mime in [SCAFFOLD_META_MIME]:
             target_filenames = target
@@ -369,6 +421,18 @@ class ErrorManager(metaclass=Singleton):
         # Update the 'Derived From' column content with the target filenames
         self.manifest.update_column_content(file_location, DERIVED_FROM_COLUMN, "\n".join(target_filenames))
 
+    def relocate_annotation(self, file_location, new_location):
+        """
+        Carry the annotation of a moved file over to its new location.
+
+        Args:
+            file_location (str): The file location in the manifest.
+            new_location (str): The location the file has been moved to.
+        """
+        self.manifest.relocate_entry(file_location, new_location)
+        if self._fingerprint_index is not None:
+            self._fingerprint_index.forget(file_location)
+
     def update_source_of(self, file_location, mime, target, replace):
         """
         Update the 'Source Of' column in the manifest data frame for the given file location.
@@ -387,7 +451,7 @@ class ErrorManager(metaclass=Singleton):
         target_filenames = self.manifest.get_matching_entry(FILE_LOCATION_COLUMN, file_location, SOURCE_OF_COLUMN)
         target_filenames = [tt for tt in target_filenames if str(tt) != "nan"]
 
-        if mime in [SCAFFOLD_META_MIME, SCAFFOLD_VIEW_MIME, STL_MODEL_MIME, VTK_MODEL_MIME]:
+        if mime in [SCAFFOLD_META_MIME, SCAFFOLD_VIEW_MIME] + ALT_FORM_MIMES:
             # If the MIME type is SCAFFOLD_META_MIME, find the matching target filenames
             filtered_targets = []
             for t in target:
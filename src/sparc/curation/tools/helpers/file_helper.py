@@ -1,14 +1,41 @@
+import bisect
+import collections
 import csv
+import fnmatch
+import io
 import json
 import os
+import time
+import zlib
+from itertools import chain
 from pathlib import Path
 
-from sparc.curation.tools.definitions import STL_MODEL_MIME, VTK_MODEL_MIME
+from sparc.curation.tools.definitions import ALT_FORM_EXTENSION_TO_MIMETYPE_MAP, ALT_FORM_MIMES, CACHE_DIRNAME, \
+    IGNORE_FILENAME, MANIFEST_FILENAMES
+from sparc.curation.tools.errors import DatasetNotDefinedError
+from sparc.curation.tools.helpers.archive_helper import DatasetArchive, is_dataset_archive
 from sparc.curation.tools.helpers.base import Singleton
+from sparc.curation.tools.helpers.cache_helper import file_cache_key
+from sparc.curation.tools.helpers.store_helper import PathStore
 from sparc.curation.tools.utilities import convert_to_bytes
-from sparc.curation.tools.plot_utilities import generate_dataframe_from_txt
+from sparc.curation.tools.plot_utilities import sniff_txt_plot
 
 ZINC_GRAPHICS_TYPES = ["points", "lines", "surfaces", "contours", "streamlines"]
+IMAGE_FILE_EXTENSIONS = (".png", ".jpeg", ".jpg")
+PLOT_FILE_SUFFIXES = ("csv", "tsv")
+PREFILTER_DENY_EXTENSIONS = (".png", ".jpeg", ".jpg", ".tif", ".tiff", ".bmp", ".gif", ".exf", ".exfile", ".exnode",
+                             ".exelem", ".vtk", ".stl", ".xlsx", ".xls", ".zip", ".gz", ".tar", ".pdf", ".mp4", ".avi")
+PREFILTER_SNIFF_SIZE = 512
+JSON_WHITESPACE = b" \t\r\n"
+JSON_LEADING_BYTES = (b"[", b"{")
+CLASSIFY_CHUNK_SIZE = 64
+CLASSIFY_BATCH_SIZE = CLASSIFY_CHUNK_SIZE * 64
+CONTEXT_MAX_SIZE = convert_to_bytes("2MiB")
+ALT_FORMS_LIST_PREFIX = 'alt_forms:'
+ALT_FORM_CANDIDATES_LIST = 'alt_form_candidates'
+SCAN_ROLES = ('image', 'metadata', 'view', 'plot', 'context')
+SHARD_DEPTHS = {'subdir': 1, 'hash': 2}
+SHARD_STRATEGIES = tuple(SHARD_DEPTHS)
 
 
 def is_graphics_entry(entry):
@@ -115,6 +142,13 @@ def is_context_data_file(json_data):
     return False
 
 
+JSON_FILE_CLASSIFIERS = {
+    'metadata': contains_metadata,
+    'view': represents_view,
+    'context': is_context_data_file,
+}
+
+
 def is_annotation_csv_file(csv_reader):
     """
     Check if the given CSV reader represents an annotation CSV file.
@@ -142,6 +176,53 @@ def is_annotation_csv_file(csv_reader):
     return False
 
 
+def _read_text_data(file_path, opener=None):
+    """
+    Read the text held in the UTF-8 encoded file at the given path.
+
+    Args:
+        file_path (str): The path to the file.
+        opener (function): Optional function opening the file for binary reading, used in place of open.
+
+    Returns:
+        str: The text of the file, None if the file is not a UTF-8 encoded text file.
+    """
+    try:
+        if opener is not None:
+            with io.TextIOWrapper(opener(file_path), encoding='utf-8') as f:
+                return f.read()
+
+        with open(file_path, encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        return None
+    except IsADirectoryError:
+        return None
+
+
+def _decode_json_data(file_data):
+    if file_data is None:
+        return None
+
+    try:
+        return json.loads(file_data)
+    except json.decoder.JSONDecodeError:
+        return None
+
+
+def _read_json_data(file_path):
+    """
+    Read and decode the JSON data held in the file at the given path.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        The decoded JSON data, None if the file is not a UTF-8 encoded JSON file.
+    """
+    return _decode_json_data(_read_text_data(file_path))
+
+
 def is_json_of_type(file_path, max_size, test_func):
     """
     Check if the file at the given path is a JSON file of a specific type.
@@ -157,19 +238,9 @@ def is_json_of_type(file_path, max_size, test_func):
     result = False
 
     if os.path.getsize(file_path) < max_size and os.path.isfile(file_path):
-        try:
-            with open(file_path, encoding='utf-8') as f:
-                file_data = f.read()
-        except UnicodeDecodeError:
-            return result
-        except IsADirectoryError:
-            return result
-
-        try:
-            data = json.loads(file_data)
+        data = _read_json_data(file_path)
+        if data is not None:
             result = test_func(data)
-        except json.decoder.JSONDecodeError:
-            return result
 
     return result
 
@@ -203,6 +274,21 @@ def is_csv_of_type(file_path, max_size, test_func):
     return result
 
 
+def _extract_view_urls(metadata_file, json_data):
+    view_urls = []
+
+    if json_data:
+        if isinstance(json_data, list):
+            for entry in json_data:
+                if 'URL' in entry and 'Type' in entry:
+                    entry_type = entry['Type']
+                    if entry_type.lower() == "view":
+                        view_url = os.path.join(os.path.dirname(metadata_file), entry['URL'])
+                        view_urls.append(view_url)
+
+    return view_urls
+
+
 def get_view_urls(metadata_file):
     """
     Get the view URLs from the metadata file.
@@ -213,51 +299,864 @@ def get_view_urls(metadata_file):
     Returns:
         list: A list of view URLs.
     """
-    view_urls = []
-
     try:
         with open(metadata_file, encoding='utf-8') as f:
             file_data = f.read()
 
         json_data = json.loads(file_data)
+    except json.decoder.JSONDecodeError:
+        return []
 
-        if json_data:
-            if isinstance(json_data, list):
-                for entry in json_data:
-                    if 'URL' in entry and 'Type' in entry:
-                        entry_type = entry['Type']
-                        if entry_type.lower() == "view":
-                            view_url = os.path.join(os.path.dirname(metadata_file), entry['URL'])
-                            view_urls.append(view_url)
+    return _extract_view_urls(metadata_file, json_data)
 
-    except json.decoder.JSONDecodeError:
-        return view_urls
 
-    return view_urls
+class FilePrefilter(object):
+    """
+    Cheap checks made on a file before it is read in full for classification.
+
+    A file is rejected if its extension is on the deny list, or an allow list is
+    given and its extension is not on it.  Otherwise the first bytes of the file
+    are sniffed, only files whose first non-whitespace byte could start a JSON
+    object or array are read in full.  The number of files rejected for each reason is kept in
+    rejections.
+
+    Attributes:
+        rejections (collections.Counter): The number of files rejected for each reason.
+    """
+
+    def __init__(self, deny_extensions=PREFILTER_DENY_EXTENSIONS, allow_extensions=None,
+                 sniff_size=PREFILTER_SNIFF_SIZE):
+        """
+        Initialize the FilePrefilter object.
+
+        Args:
+            deny_extensions (iterable): Extensions of files that are never read.
+            allow_extensions (iterable): Extensions of the only files that are read, None to allow any extension.
+            sniff_size (int): The number of bytes to sniff at the start of a file, 0 to disable sniffing.
+        """
+        self._deny_extensions = frozenset(e.lower() for e in deny_extensions)
+        self._allow_extensions = None if allow_extensions is None else frozenset(e.lower() for e in allow_extensions)
+        self._sniff_size = sniff_size
+        self.rejections = collections.Counter()
+
+    def get_settings(self):
+        return {
+            'deny_extensions': sorted(self._deny_extensions),
+            'allow_extensions': None if self._allow_extensions is None else sorted(self._allow_extensions),
+            'sniff_size': self._sniff_size,
+        }
+
+    def check(self, file_path, opener=None):
+        """
+        Check if the file at the given path could be a JSON file.
+
+        Args:
+            file_path (str): The path to the file.
+            opener (function): Optional function opening the file for binary reading, used in place of open.
+
+        Returns:
+            str: The reason the file is rejected, None if the file should be read.
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        if self._allow_extensions is not None and extension not in self._allow_extensions:
+            return 'extension not allowed'
+        if extension in self._deny_extensions:
+            return 'denied extension'
+
+        if self._sniff_size:
+            try:
+                with open(file_path, 'rb') if opener is None else opener(file_path) as f:
+                    head = f.read(self._sniff_size)
+            except IsADirectoryError:
+                return 'not a file'
+
+            stripped_head = head.lstrip(JSON_WHITESPACE)
+            if stripped_head and stripped_head[:1] not in JSON_LEADING_BYTES:
+                return 'content sniff'
+
+        return None
+
+    def record(self, rejection):
+        if rejection is not None:
+            self.rejections[rejection] += 1
+
+
+class PruneRules(object):
+    """
+    Patterns for the files and directories of a dataset that are not scanned.
+
+    The patterns follow the style of a .gitignore file.  A pattern ending in a
+    slash only matches directories.  A pattern containing any other slash is
+    matched against the path relative to the dataset directory, otherwise it is
+    matched against the name of the file or directory at any depth.  Patterns
+    are shell-style wildcards, blank lines and lines starting with a hash are
+    ignored.  A matching directory is not entered at all.
+    """
+
+    def __init__(self, patterns=None):
+        """
+        Initialize the PruneRules object.
+
+        Args:
+            patterns (iterable): The prune patterns.
+        """
+        self._name_patterns = []
+        self._path_patterns = []
+        self._patterns = []
+        for pattern in [] if patterns is None else patterns:
+            self.add_pattern(pattern)
+
+    @classmethod
+    def from_dataset(cls, dataset_dir, patterns=None):
+        """
+        Create the prune rules for a dataset from its .sparcignore file and the given patterns.
+
+        Args:
+            dataset_dir (str): The dataset directory path.
+            patterns (iterable): Additional prune patterns.
+
+        Returns:
+            PruneRules: The prune rules for the dataset.
+        """
+        prune_rules = cls()
+        ignore_file = os.path.join(dataset_dir, IGNORE_FILENAME)
+        if os.path.isfile(ignore_file):
+            with open(ignore_file) as f:
+                for line in f:
+                    prune_rules.add_pattern(line)
+
+        for pattern in [] if patterns is None else patterns:
+            prune_rules.add_pattern(pattern)
+
+        return prune_rules
+
+    def add_pattern(self, pattern):
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith('#'):
+            return
+
+        directory_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        if '/' in pattern:
+            self._path_patterns.append((pattern.lstrip('/'), directory_only))
+        else:
+            self._name_patterns.append((pattern, directory_only))
+        self._patterns.append(pattern + ('/' if directory_only else ''))
+
+    def get_patterns(self):
+        return list(self._patterns)
+
+    def is_pruned(self, relative_path, is_dir):
+        """
+        Check if a file or directory is pruned, its parent directories are not checked.
+
+        Args:
+            relative_path (str): The path relative to the dataset directory.
+            is_dir (bool): True if the path is a directory.
+
+        Returns:
+            bool: True if the path matches one of the patterns.
+        """
+        relative_path = relative_path.replace(os.sep, '/')
+        name = relative_path.rsplit('/', 1)[-1]
+        for pattern, directory_only in self._name_patterns:
+            if (is_dir or not directory_only) and fnmatch.fnmatchcase(name, pattern):
+                return True
+        for pattern, directory_only in self._path_patterns:
+            if (is_dir or not directory_only) and fnmatch.fnmatchcase(relative_path, pattern):
+                return True
+
+        return False
+
+    def is_path_pruned(self, relative_path, is_dir):
+        """
+        Check if a file or directory, or any of its parent directories, is pruned.
+
+        Args:
+            relative_path (str): The path relative to the dataset directory.
+            is_dir (bool): True if the path is a directory.
+
+        Returns:
+            bool: True if the path or one of its parent directories matches one of the patterns.
+        """
+        parts = os.path.normpath(relative_path).split(os.sep)
+        for index in range(1, len(parts)):
+            if self.is_pruned(os.sep.join(parts[:index]), True):
+                return True
+
+        return self.is_pruned(relative_path, is_dir)
+
+
+class ScanTimings(object):
+    """
+    The time spent scanning each directory of a dataset.
+
+    The time to list a directory and the time to classify each of its files are
+    added to the directory.  The totals for each directory's subtree show which
+    parts of the dataset are worth pruning.
+    """
+
+    def __init__(self):
+        self._seconds = collections.Counter()
+        self._file_counts = collections.Counter()
+
+    def add(self, dir_path, seconds, file_count=0):
+        self._seconds[dir_path] += seconds
+        self._file_counts[dir_path] += file_count
+
+    def merge(self, other):
+        self._seconds.update(other._seconds)
+        self._file_counts.update(other._file_counts)
+
+    def get_subtree_timings(self, dataset_dir):
+        """
+        Get the total time spent on each directory's subtree.
+
+        Args:
+            dataset_dir (str): The dataset directory path.
+
+        Returns:
+            list: Tuples of the directory path relative to the dataset directory, the seconds spent on the
+            subtree and the number of files classified in it, slowest first.
+        """
+        dataset_dir = str(Path(dataset_dir))
+        seconds = collections.Counter()
+        file_counts = collections.Counter()
+        for dir_path in self._seconds:
+            relative_path = os.path.relpath(dir_path, dataset_dir)
+            parts = [] if relative_path == os.curdir else relative_path.split(os.sep)
+            for index in range(len(parts) + 1):
+                subtree = os.sep.join(parts[:index]) if index else os.curdir
+                seconds[subtree] += self._seconds[dir_path]
+                file_counts[subtree] += self._file_counts[dir_path]
+
+        return sorted(((subtree, seconds[subtree], file_counts[subtree]) for subtree in seconds),
+                      key=lambda timing: (-timing[1], timing[0]))
+
+
+def classify_json_file(file_path, size, role_max_sizes):
+    """
+    Classify a JSON file by decoding it once and running every registered
+    predicate in JSON_FILE_CLASSIFIERS on that one parse.
+
+    Args:
+        file_path (str): The path to the file.
+        size (int): The size of the file.
+        role_max_sizes (dict): Maps the roles to test for to the maximum allowed file size for that role.
+
+    Returns:
+        tuple: A set of the roles the file matches and a list of the view URLs if the file is a metadata file.
+    """
+    candidate_roles = [role for role, max_size in role_max_sizes.items() if size < max_size]
+    if not candidate_roles:
+        return set(), []
+
+    return _classify_json_data(file_path, _read_json_data(file_path), candidate_roles)
+
+
+def _classify_json_data(file_path, json_data, candidate_roles):
+    if json_data is None:
+        return set(), []
+
+    roles = {role for role in candidate_roles if JSON_FILE_CLASSIFIERS[role](json_data)}
+    view_urls = _extract_view_urls(file_path, json_data) if 'metadata' in roles else []
+
+    return roles, view_urls
+
+
+def list_dataset_dir(current_dir, root_dir, prune_rules=None, timings=None):
+    """
+    List the files and the sub-directories of one directory of a dataset, in name order.
+
+    Args:
+        current_dir (str): The directory to list.
+        root_dir (str): The dataset directory path.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+        timings (ScanTimings): Optional timings the time spent listing the directory is added to.
+
+    Returns:
+        tuple: A list of os.DirEntry objects for the files and a list of the sub-directory paths.
+    """
+    start = time.perf_counter()
+    try:
+        with os.scandir(current_dir) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        entries = []
+    finally:
+        if timings is not None:
+            timings.add(current_dir, time.perf_counter() - start)
+
+    files = []
+    sub_dirs = []
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name != CACHE_DIRNAME and \
+                    (prune_rules is None or not prune_rules.is_pruned(os.path.relpath(entry.path, root_dir), True)):
+                sub_dirs.append(entry.path)
+        elif entry.is_file():
+            if prune_rules is None or not prune_rules.is_pruned(os.path.relpath(entry.path, root_dir), False):
+                files.append(entry)
+
+    return files, sub_dirs
+
+
+def walk_dataset_files(dataset_dir, prune_rules=None, timings=None, start_dir=None):
+    """
+    Walk the dataset directory in a single pass, yielding every file found.
+
+    The walk is made with os.scandir so the file type and stat information cached
+    on each os.DirEntry can be reused by the classifiers.  Like Path.rglob, symbolic
+    links to directories are not followed and the scan cache directory is skipped.
+    Directories matching the prune rules are not entered.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+        timings (ScanTimings): Optional timings the time spent listing each directory is added to.
+        start_dir (str): Optional directory within the dataset to walk instead of the whole dataset.
 
+    Returns:
+        generator: os.DirEntry objects for the files in the dataset directory.
+    """
+    root_dir = str(Path(dataset_dir))
+    pending_dirs = [root_dir if start_dir is None else str(Path(start_dir))]
+    while pending_dirs:
+        files, sub_dirs = list_dataset_dir(pending_dirs.pop(), root_dir, prune_rules, timings)
+        yield from files
+
+        # Visit sub-directories depth first, in name order.
+        pending_dirs.extend(reversed(sub_dirs))
+
+
+def _path_size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return None
+
+
+def _entry_size(entry):
+    try:
+        return entry.stat().st_size
+    except OSError:
+        return None
+
+
+def _entry_passes_prefilter(entry, prefilter):
+    if prefilter is None:
+        return True
+
+    rejection = prefilter.check(entry.path)
+    prefilter.record(rejection)
+    return rejection is None
+
+
+def _entry_is_json_of_type(entry, max_size, test_func, prefilter=None):
+    size = _entry_size(entry)
+    if size is not None and size < max_size and _entry_passes_prefilter(entry, prefilter):
+        data = _read_json_data(entry.path)
+        if data is not None:
+            return test_func(data)
+
+    return False
+
+
+def _entry_is_image(entry):
+    return entry.name.endswith(IMAGE_FILE_EXTENSIONS)
+
+
+def _entry_is_view(entry, max_size):
+    return entry.name.endswith(".json") and _entry_is_json_of_type(entry, max_size, represents_view)
+
+
+def _is_plot_file(file_path, opener=None):
+    file_name = os.path.basename(file_path)
+    if file_name.endswith(PLOT_FILE_SUFFIXES):
+        return True
 
-def search_for_metadata_files(dataset_dir, max_size):
+    return file_name.endswith("txt") and sniff_txt_plot(file_path, opener=opener) is not None
+
+
+def _entry_is_plot(entry):
+    return _is_plot_file(entry.path)
+
+
+def _entry_is_context_data(entry, max_size, prefilter=None):
+    return _entry_is_json_of_type(entry, max_size, is_context_data_file, prefilter)
+
+
+def classify_file(file_path, size, max_size, context_max_size, prefilter=None, opener=None):
+    """
+    Classify a single file of the dataset, running all the classifiers on it.
+
+    This is the unit of work handed to an executor when scanning a dataset,
+    so it only takes and returns plain picklable values.
+
+    Args:
+        file_path (str): The path to the file.
+        size (int): The size of the file, None if the size could not be determined.
+        max_size (int): The maximum allowed file size for metadata and view files.
+        context_max_size (int): The maximum allowed file size for context data files.
+        prefilter (FilePrefilter): Optional prefilter checked before the file is read.
+        opener (function): Optional function opening the file for binary reading, used in place of open
+            for files that are not on disk.
+
+    Returns:
+        tuple: A set of the roles the file matches, a list of the view URLs if the file is a metadata file
+        and the reason the file was not read, None if it was read or did not need to be.
+    """
+    file_name = os.path.basename(file_path)
+    roles = set()
+    view_urls = []
+    rejection = None
+
+    if file_name in MANIFEST_FILENAMES:
+        # A text manifest file would otherwise be taken for a plot or annotation file.
+        return roles, view_urls, rejection
+
+    if file_name.endswith(IMAGE_FILE_EXTENSIONS):
+        roles.add('image')
+
+    if size is not None:
+        role_max_sizes = {'metadata': max_size, 'context': context_max_size}
+        if file_name.endswith(".json"):
+            role_max_sizes['view'] = max_size
+        candidate_roles = [role for role, role_max_size in role_max_sizes.items() if size < role_max_size]
+
+        if not candidate_roles:
+            rejection = 'too large'
+        elif prefilter is not None:
+            rejection = prefilter.check(file_path, opener)
+
+        if rejection is None and candidate_roles:
+            file_data = _read_text_data(file_path, opener)
+            if file_data is None:
+                rejection = 'not text'
+            else:
+                json_roles, view_urls = _classify_json_data(file_path, _decode_json_data(file_data), candidate_roles)
+                roles.update(json_roles)
+
+    if _is_plot_file(file_path, opener):
+        roles.add('plot')
+
+    return roles, view_urls, rejection
+
+
+def walk_order_key(file_path):
+    """
+    Get a key that sorts file paths into the order walk_dataset_files visits them.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        tuple: The sort key for the file path.
+    """
+    parts = os.path.normpath(file_path).split(os.sep)
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+def _get_walk_order_ranges(path):
+    """
+    Get the ranges of walk order keys of a file, and of the files under a directory, at the given path.
+
+    Args:
+        path (str): The file or directory path.
+
+    Returns:
+        list: The lowest key and the key above each range, see walk_order_key.
+    """
+    file_key = walk_order_key(path)
+    dir_key = tuple((1, part) for part in os.path.normpath(path).split(os.sep))
+    return [(file_key, file_key + ((0, ''),)), (dir_key, dir_key + ((2, ''),))]
+
+
+def _classify_file_timed(file_path, size, max_size, context_max_size, prefilter, opener=None):
+    start = time.perf_counter()
+    classification = classify_file(file_path, size, max_size, context_max_size, prefilter, opener)
+    return classification, time.perf_counter() - start
+
+
+def _classify_batch(batch, max_size, context_max_size, executor, cache, prefilter, timings):
+    pending = [(file_path, stat_result) for file_path, stat_result, classification in batch if classification is None]
+    pending_paths = [file_path for file_path, _ in pending]
+    pending_sizes = [None if stat_result is None else stat_result.st_size for _, stat_result in pending]
+    count = len(pending)
+    if executor is None:
+        pending_classifications = map(_classify_file_timed, pending_paths, pending_sizes,
+                                      [max_size] * count, [context_max_size] * count, [prefilter] * count)
+    else:
+        pending_classifications = executor.map(_classify_file_timed, pending_paths, pending_sizes,
+                                               [max_size] * count, [context_max_size] * count, [prefilter] * count,
+                                               chunksize=CLASSIFY_CHUNK_SIZE)
+
+    for file_path, stat_result, classification in batch:
+        if classification is None:
+            (roles, view_urls, rejection), seconds = next(pending_classifications)
+            classification = roles, view_urls
+            prefilter.record(rejection)
+            if timings is not None:
+                timings.add(os.path.dirname(file_path), seconds, 1)
+            if cache is not None and stat_result is not None:
+                cache.set(file_path, file_cache_key(stat_result), roles, view_urls)
+
+        yield (file_path,) + tuple(classification)
+
+
+def _iter_classified_entries(entries, max_size, context_max_size, executor, cache, prefilter, timings, present_paths):
+    batch = []
+    for entry in entries:
+        try:
+            stat_result = entry.stat()
+        except OSError:
+            stat_result = None
+
+        classification = None
+        if cache is not None:
+            present_paths.add(entry.path)
+            if stat_result is not None:
+                classification = cache.get(entry.path, file_cache_key(stat_result))
+        batch.append((entry.path, stat_result, classification))
+
+        if len(batch) == CLASSIFY_BATCH_SIZE:
+            yield from _classify_batch(batch, max_size, context_max_size, executor, cache, prefilter, timings)
+            batch = []
+
+    yield from _classify_batch(batch, max_size, context_max_size, executor, cache, prefilter, timings)
+
+
+def iter_classified_files(dataset_dir, max_size, context_max_size=CONTEXT_MAX_SIZE, executor=None, cache=None,
+                          prefilter=None, prune_rules=None, timings=None):
+    """
+    Classify every file in the dataset directory, yielding each file as soon as it is classified.
+
+    The files are classified with classify_file.  The walk is consumed in
+    batches of CLASSIFY_BATCH_SIZE files, so only one batch is held in memory
+    and the first files are yielded before the walk finishes.  If an executor
+    from concurrent.futures is given the classification of each batch is spread
+    over its workers, the files are still yielded in the order they were walked.
+    If a ScanCache is given only the files that have changed since they were
+    cached are classified, the cache is saved once every file has been yielded.
+    Files are checked with the prefilter before they are read, the prefilter's
+    rejection counters are updated with the reasons files were not read.  Files
+    and directories matching the prune rules are skipped.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+        max_size (int): The maximum allowed file size for metadata and view files.
+        context_max_size (int): The maximum allowed file size for context data files.
+        executor (concurrent.futures.Executor): Optional executor to classify the files with.
+        cache (ScanCache): Optional cache of the classification results.
+        prefilter (FilePrefilter): Optional prefilter, a default FilePrefilter is used if not given.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+        timings (ScanTimings): Optional timings the time spent on each directory is added to.
+
+    Returns:
+        generator: Tuples of the file path, its set of roles and its list of view URLs, in walk order.
+    """
+    if prefilter is None:
+        prefilter = FilePrefilter()
+    if cache is not None:
+        cache.use_settings({'max_size': max_size, 'context_max_size': context_max_size,
+                            'prefilter': prefilter.get_settings()})
+
+    present_paths = set()
+    yield from _iter_classified_entries(walk_dataset_files(dataset_dir, prune_rules, timings), max_size,
+                                        context_max_size, executor, cache, prefilter, timings, present_paths)
+
+    if cache is not None:
+        cache.save(present_paths)
+
+
+def classify_dataset_files(dataset_dir, max_size, context_max_size, executor=None, cache=None, prefilter=None,
+                           prune_rules=None, timings=None):
+    """
+    Classify every file in the dataset directory, walking the directory once.
+
+    See iter_classified_files for how the files are classified.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+        max_size (int): The maximum allowed file size for metadata and view files.
+        context_max_size (int): The maximum allowed file size for context data files.
+        executor (concurrent.futures.Executor): Optional executor to classify the files with.
+        cache (ScanCache): Optional cache of the classification results.
+        prefilter (FilePrefilter): Optional prefilter, a default FilePrefilter is used if not given.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+        timings (ScanTimings): Optional timings the time spent on each directory is added to.
+
+    Returns:
+        dict: Maps each file path, in walk order, to a tuple of its set of roles and its list of view URLs.
+    """
+    return {file_path: (roles, view_urls) for file_path, roles, view_urls in
+            iter_classified_files(dataset_dir, max_size, context_max_size, executor, cache, prefilter,
+                                  prune_rules, timings)}
+
+
+def classify_archive_files(archive, max_size, context_max_size, prefilter=None, prune_rules=None, timings=None):
+    """
+    Classify every file held in a dataset archive, streaming each file from the archive.
+
+    The files are classified with classify_file in archive order, so that a
+    compressed archive is read through once, and are returned in the order
+    walk_dataset_files would visit them if the archive were extracted.
+
+    Args:
+        archive (DatasetArchive): The dataset archive.
+        max_size (int): The maximum allowed file size for metadata and view files.
+        context_max_size (int): The maximum allowed file size for context data files.
+        prefilter (FilePrefilter): Optional prefilter, a default FilePrefilter is used if not given.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+        timings (ScanTimings): Optional timings the time spent on each directory is added to.
+
+    Returns:
+        dict: Maps each file path, in walk order, to a tuple of its set of roles and its list of view URLs.
+    """
+    if prefilter is None:
+        prefilter = FilePrefilter()
+
+    classifications = []
+    for file_path, size in archive.get_files(prune_rules):
+        (roles, view_urls, rejection), seconds = _classify_file_timed(file_path, size, max_size, context_max_size,
+                                                                      prefilter, archive.open)
+        prefilter.record(rejection)
+        if timings is not None:
+            timings.add(os.path.dirname(file_path), seconds, 1)
+        classifications.append((file_path, roles, view_urls))
+
+    classifications.sort(key=lambda classification: walk_order_key(classification[0]))
+    return {file_path: (roles, view_urls) for file_path, roles, view_urls in classifications}
+
+
+def plan_shards(dataset_dir, strategy, shard_count=None, prune_rules=None):
+    """
+    Split the dataset directory into shards that can be scanned independently.
+
+    With the 'subdir' strategy each top-level subdirectory is a shard.  With the
+    'hash' strategy the directories two levels down are spread over shard_count
+    shards by a hash of their path relative to the dataset directory.  The files
+    above the shard directories are returned separately, they are few and are
+    scanned directly.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+        strategy (str): The sharding strategy, one of SHARD_STRATEGIES.
+        shard_count (int): The number of shards for the 'hash' strategy.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+
+    Returns:
+        tuple: A list of os.DirEntry objects for the files above the shards and a list of shards,
+        each a list of the directory paths to walk.
+    """
+    if strategy not in SHARD_DEPTHS:
+        raise ValueError(f"Unknown shard strategy '{strategy}', expected one of; {', '.join(SHARD_STRATEGIES)}.")
+
+    root_dir = str(Path(dataset_dir))
+    shallow_files = []
+    shard_dirs = [root_dir]
+    for _ in range(SHARD_DEPTHS[strategy]):
+        sub_dirs = []
+        for current_dir in shard_dirs:
+            files, current_sub_dirs = list_dataset_dir(current_dir, root_dir, prune_rules, None)
+            shallow_files.extend(files)
+            sub_dirs.extend(current_sub_dirs)
+        shard_dirs = sub_dirs
+
+    if strategy == 'subdir':
+        return shallow_files, [[shard_dir] for shard_dir in shard_dirs]
+
+    shard_count = max(1, shard_count or 1)
+    shards = [[] for _ in range(shard_count)]
+    for shard_dir in shard_dirs:
+        shards[zlib.crc32(os.path.relpath(shard_dir, root_dir).encode()) % shard_count].append(shard_dir)
+
+    return shallow_files, [shard for shard in shards if shard]
+
+
+def _scan_shard(dataset_dir, shard_dirs, max_size, context_max_size, cache, prefilter, prune_rules, with_timings):
+    timings = ScanTimings() if with_timings else None
+    present_paths = set()
+    entries = chain.from_iterable(walk_dataset_files(dataset_dir, prune_rules, timings, shard_dir)
+                                  for shard_dir in shard_dirs)
+    classifications = [(file_path, roles, view_urls) for file_path, roles, view_urls in
+                       _iter_classified_entries(entries, max_size, context_max_size, None, cache, prefilter,
+                                                timings, present_paths)
+                       if is_scan_relevant(file_path, roles)]
+
+    return (classifications, present_paths, None if cache is None else cache.get_updates(),
+            prefilter.rejections, timings)
+
+
+def classify_dataset_shards(dataset_dir, max_size, context_max_size, strategy, shard_count=None, executor=None,
+                            cache=None, prefilter=None, prune_rules=None, timings=None):
+    """
+    Classify the files of the dataset directory shard by shard, see plan_shards.
+
+    Each shard is walked and classified on its own, in a worker process if an
+    executor is given.  The results of the shards are merged into walk order, so
+    the result does not depend on the strategy, the number of shards or the
+    order the shards finish in.  Only the files that contribute to the scan
+    result are returned, see is_scan_relevant.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+        max_size (int): The maximum allowed file size for metadata and view files.
+        context_max_size (int): The maximum allowed file size for context data files.
+        strategy (str): The sharding strategy, one of SHARD_STRATEGIES.
+        shard_count (int): The number of shards for the 'hash' strategy.
+        executor (concurrent.futures.Executor): Optional executor to scan the shards with.
+        cache (ScanCache): Optional cache of the classification results.
+        prefilter (FilePrefilter): Optional prefilter, a default FilePrefilter is used if not given.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+        timings (ScanTimings): Optional timings the time spent on each directory is added to.
+
+    Returns:
+        dict: Maps each relevant file path, in walk order, to a tuple of its set of roles and its list of view URLs.
+    """
+    if prefilter is None:
+        prefilter = FilePrefilter()
+    if cache is not None:
+        cache.use_settings({'max_size': max_size, 'context_max_size': context_max_size,
+                            'prefilter': prefilter.get_settings()})
+
+    shallow_files, shards = plan_shards(dataset_dir, strategy, shard_count, prune_rules)
+    present_paths = set()
+    classifications = [(file_path, roles, view_urls) for file_path, roles, view_urls in
+                       _iter_classified_entries(shallow_files, max_size, context_max_size, None, cache, prefilter,
+                                                timings, present_paths)
+                       if is_scan_relevant(file_path, roles)]
+
+    count = len(shards)
+    shard_caches = [None if cache is None else cache.get_shard(shard) for shard in shards]
+    shard_prefilters = [FilePrefilter(**prefilter.get_settings()) for _ in shards]
+    arguments = ([dataset_dir] * count, shards, [max_size] * count, [context_max_size] * count, shard_caches,
+                 shard_prefilters, [prune_rules] * count, [timings is not None] * count)
+    shard_results = map(_scan_shard, *arguments) if executor is None else executor.map(_scan_shard, *arguments)
+    for shard_classifications, shard_present_paths, cache_updates, rejections, shard_timings in shard_results:
+        classifications.extend(shard_classifications)
+        present_paths.update(shard_present_paths)
+        prefilter.rejections.update(rejections)
+        if cache is not None:
+            cache.merge_updates(cache_updates)
+        if timings is not None:
+            timings.merge(shard_timings)
+
+    if cache is not None:
+        cache.save(present_paths)
+
+    classifications.sort(key=lambda classification: walk_order_key(classification[0]))
+    return {file_path: (roles, view_urls) for file_path, roles, view_urls in classifications}
+
+
+def is_scan_relevant(file_path, roles):
+    """
+    Check if a classified file contributes to the scan result.
+
+    Files without a role are only needed if they are alternative forms of a scaffold.
+
+    Args:
+        file_path (str): The path to the file.
+        roles (set): The roles of the file.
+
+    Returns:
+        bool: True if collect_scan_result makes use of the file.
+    """
+    return bool(roles) or _get_alt_form_extension(os.path.basename(file_path)) is not None
+
+
+def collect_scan_result(classifications):
+    """
+    Collect the classified files into lists of files by role.
+
+    Args:
+        classifications (dict): Maps each file path, in walk order, to a tuple of its set of roles and its list of view URLs.
+
+    Returns:
+        dict: The image, metadata, metadata views, view, plot and context data files found,
+        with the image files indexed by directory and the sorted names of alternative form files by directory.
+    """
+    result = {
+        'image': [],
+        'image_by_dirname': {},
+        'alt_form_names_by_dirname': {},
+        'metadata': [],
+        'metadata_views': {},
+        'view': [],
+        'plot': [],
+        'context': [],
+    }
+
+    for file_path, (roles, view_urls) in classifications.items():
+        file_name = os.path.basename(file_path)
+        if _get_alt_form_extension(file_name) is not None:
+            result['alt_form_names_by_dirname'].setdefault(os.path.dirname(file_path), []).append(file_name)
+        if 'image' in roles:
+            image_path = Path(file_path)
+            result['image'].append(image_path)
+            result['image_by_dirname'].setdefault(os.path.dirname(file_path), []).append(image_path)
+        if 'metadata' in roles:
+            result['metadata'].append(file_path)
+            result['metadata_views'][file_path] = view_urls
+        if 'view' in roles:
+            result['view'].append(file_path)
+        if 'plot' in roles:
+            result['plot'].append(Path(file_path))
+        if 'context' in roles:
+            result['context'].append(Path(file_path))
+
+    return result
+
+
+def scan_dataset(dataset_dir, max_size, context_max_size, executor=None, cache=None, prefilter=None,
+                 prune_rules=None, timings=None):
+    """
+    Scan the dataset directory once, passing every file to all the classifiers.
+
+    See classify_dataset_files for how the files are classified.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+        max_size (int): The maximum allowed file size for metadata and view files.
+        context_max_size (int): The maximum allowed file size for context data files.
+        executor (concurrent.futures.Executor): Optional executor to classify the files with.
+        cache (ScanCache): Optional cache of the classification results.
+        prefilter (FilePrefilter): Optional prefilter, a default FilePrefilter is used if not given.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+        timings (ScanTimings): Optional timings the time spent on each directory is added to.
+
+    Returns:
+        dict: The image, metadata, metadata views, view, plot and context data files found,
+        with the image files indexed by directory and the sorted names of alternative form files by directory.
+    """
+    classifications = classify_dataset_files(dataset_dir, max_size, context_max_size, executor, cache, prefilter,
+                                             prune_rules, timings)
+    return collect_scan_result(classifications)
+
+
+def search_for_metadata_files(dataset_dir, max_size, prefilter=None):
     """
     Search for metadata files in the dataset directory.
 
     Args:
         dataset_dir (str): The dataset directory path.
         max_size (int): The maximum allowed file size.
+        prefilter (FilePrefilter): Optional prefilter, a default FilePrefilter is used if not given.
 
     Returns:
         tuple: A tuple containing a list of metadata file paths and a dictionary mapping metadata file paths to view URLs.
     """
     metadata = []
     metadata_views = {}
-    result = list(Path(dataset_dir).rglob("*"))
-
-    for r in result:
-        meta = is_json_of_type(r, max_size, contains_metadata)
+    prefilter = FilePrefilter() if prefilter is None else prefilter
 
-        if meta:
-            metadata.append(str(r))
-            view_urls = get_view_urls(str(r))
-            metadata_views[str(r)] = view_urls
+    for entry in walk_dataset_files(dataset_dir):
+        size = _entry_size(entry)
+        if size is not None and size < max_size and _entry_passes_prefilter(entry, prefilter):
+            roles, view_urls = classify_json_file(entry.path, size, {'metadata': max_size})
+            if 'metadata' in roles:
+                metadata.append(entry.path)
+                metadata_views[entry.path] = view_urls
 
     return metadata, metadata_views
 
@@ -272,44 +1171,70 @@ def search_for_image_files(dataset_dir):
     Returns:
         list: A list of thumbnail file paths.
     """
-    image_file_paths = list(Path(dataset_dir).rglob("*.png"))
-    image_file_paths += list(Path(dataset_dir).rglob("*.jpeg"))
-    image_file_paths += list(Path(dataset_dir).rglob("*.jpg"))
-    image_file_paths = list(set(image_file_paths))
+    return [Path(entry.path) for entry in walk_dataset_files(dataset_dir) if _entry_is_image(entry)]
 
-    return image_file_paths
 
+def _filter_alt_forms_by_thumbnail(thumbnail_files, alt_form_names_by_dirname):
+    """
+    Find the alternative forms of the scaffold views that have the given thumbnails.
 
-def _add_file(mime_type_list, potential_file, thumbnail_file):
-    common_path = os.path.commonprefix([potential_file, thumbnail_file])
-    if not os.path.isdir(common_path):
-        common_prefix = os.path.basename(common_path)
-        thumbnail_file_name = os.path.basename(thumbnail_file)
-        potential_file_name = os.path.basename(potential_file)
-        if thumbnail_file_name.startswith(common_prefix) and potential_file_name.startswith(common_prefix):
-            mime_type_list.append(potential_file)
+    An alternative form is a file with one of the extensions registered in
+    ALT_FORM_EXTENSION_TO_MIMETYPE_MAP that is in the same directory as a
+    thumbnail and whose name shares a common prefix with the thumbnail's name.
+    The candidates are looked up in the directory listings gathered by the scan.
 
+    Args:
+        thumbnail_files (list): List of thumbnail file paths.
+        alt_form_names_by_dirname (dict): Maps each directory to the sorted names of the alternative form files in it.
 
-def _filter_alt_forms_by_thumbnail(thumbnail_files):
-    alt_forms_files = {
-        STL_MODEL_MIME: [],
-        VTK_MODEL_MIME: [],
-    }
+    Returns:
+        dict: Maps each alternative form MIME type to a list of file paths.
+    """
+    alt_forms_files = {mime: [] for mime in ALT_FORM_MIMES}
     for thumbnail_file in thumbnail_files:
         target_dir = os.path.dirname(thumbnail_file)
-        files = os.listdir(os.path.dirname(thumbnail_file))
-        for f in files:
-            potential_file = os.path.join(target_dir, f)
-            if os.path.isfile(potential_file) and potential_file is not thumbnail_file:
-                if potential_file.endswith(".vtk"):
-                    _add_file(alt_forms_files[VTK_MODEL_MIME], potential_file, thumbnail_file)
-                if potential_file.endswith(".stl"):
-                    _add_file(alt_forms_files[STL_MODEL_MIME], potential_file, thumbnail_file)
+        thumbnail_file_name = os.path.basename(thumbnail_file)
+        if not thumbnail_file_name:
+            continue
+
+        # Names sharing a common prefix with the thumbnail name all start with its first character.
+        first_character = thumbnail_file_name[0]
+        names = alt_form_names_by_dirname.get(target_dir, [])
+        start = bisect.bisect_left(names, first_character)
+        end = bisect.bisect_left(names, chr(ord(first_character) + 1))
+        for name in names[start:end]:
+            mime = ALT_FORM_EXTENSION_TO_MIMETYPE_MAP[_get_alt_form_extension(name)]
+            alt_forms_files[mime].append(os.path.join(target_dir, name))
 
     return alt_forms_files
 
 
-def filter_thumbnail_files_by_parent(image_file_paths, parent_files):
+def _get_alt_form_extension(file_name):
+    for extension in ALT_FORM_EXTENSION_TO_MIMETYPE_MAP:
+        if file_name.endswith(extension):
+            return extension
+
+    return None
+
+
+def index_files_by_dirname(file_paths):
+    """
+    Index a list of file paths by the directory they are in.
+
+    Args:
+        file_paths (list): List of file paths.
+
+    Returns:
+        dict: Maps each directory path to the list of file paths in that directory.
+    """
+    files_by_dirname = {}
+    for file_path in file_paths:
+        files_by_dirname.setdefault(os.path.dirname(file_path), []).append(file_path)
+
+    return files_by_dirname
+
+
+def filter_thumbnail_files_by_parent(image_file_paths, parent_files, images_by_dirname=None):
     """
     Filter a list of image file paths to include only those whose in the same folder
     of any parent file in the given parent_files.
@@ -317,19 +1242,20 @@ def filter_thumbnail_files_by_parent(image_file_paths, parent_files):
     Args:
         image_file_paths (list): List of image file paths.
         parent_files (list): List of parent files paths.
+        images_by_dirname (dict): Optional index of the image file paths by directory, see index_files_by_dirname.
 
     Returns:
         list: Filtered list of image file paths.
     """
-    filtered_files = []
+    if images_by_dirname is None:
+        images_by_dirname = index_files_by_dirname(image_file_paths)
 
+    filtered_files = {}
     for parent_file in parent_files:
-        parent_dir = os.path.dirname(parent_file)
-        filtered_files.extend(
-            [image_file for image_file in image_file_paths if os.path.dirname(image_file) == parent_dir]
-        )
+        for image_file in images_by_dirname.get(os.path.dirname(parent_file), []):
+            filtered_files[image_file] = None
 
-    return list(set(filtered_files))
+    return list(filtered_files)
 
 
 def search_for_view_files(dataset_dir, max_size):
@@ -343,15 +1269,7 @@ def search_for_view_files(dataset_dir, max_size):
     Returns:
         list: A list of view file paths.
     """
-    metadata = []
-    result = list(Path(dataset_dir).rglob("*.json"))
-
-    for r in result:
-        meta = is_json_of_type(r, max_size, represents_view)
-        if meta:
-            metadata.append(str(r))
-
-    return metadata
+    return [entry.path for entry in walk_dataset_files(dataset_dir) if _entry_is_view(entry, max_size)]
 
 
 def search_for_plot_files(dataset_dir):
@@ -364,30 +1282,13 @@ def search_for_plot_files(dataset_dir):
     Returns:
         list: A list containing CSV and TSV plot file paths.
     """
-    plot_files = []
-    csv_files = list(Path(dataset_dir).rglob("*csv"))
-    plot_files += csv_files
-
-    tsv_files = list(Path(dataset_dir).rglob("*tsv"))
-    plot_files += tsv_files
-
-    txt_files = list(Path(dataset_dir).rglob("*txt"))
-    for txt_file in txt_files:
-        if generate_dataframe_from_txt(txt_file) is not None:
-            plot_files.append(txt_file)
+    return [Path(entry.path) for entry in walk_dataset_files(dataset_dir) if _entry_is_plot(entry)]
 
-    return plot_files
 
-
-def search_for_context_data_files(dataset_dir, max_size):
-    context_data_files = []
-    result = list(Path(dataset_dir).rglob("*"))
-    for r in result:
-        _is_context_data_file = is_json_of_type(r, max_size, is_context_data_file)
-        if _is_context_data_file:
-            context_data_files.append(r)
-
-    return context_data_files
+def search_for_context_data_files(dataset_dir, max_size, prefilter=None):
+    prefilter = FilePrefilter() if prefilter is None else prefilter
+    return [Path(entry.path) for entry in walk_dataset_files(dataset_dir)
+            if _entry_is_context_data(entry, max_size, prefilter)]
 
 
 class OnDiskFiles(metaclass=Singleton):
@@ -398,61 +1299,210 @@ class OnDiskFiles(metaclass=Singleton):
     and plot files from a dataset directory. It also provides a method for setting up the
     dataset by searching for the required files.
 
+    The files found are kept in a PathStore, the getters return read-only
+    views of its lists that are only built once per scan.  The lists of the
+    classified files are kept in walk order, so files can be added and removed
+    as they change on disk without rebuilding the store.  Until the dataset is
+    set up there is no store, and getting any of the files raises a
+    DatasetNotDefinedError.
+
     Attributes:
-        _plot_files (dict): Dictionary containing lists of CSV and TSV plot file paths.
-        _scaffold_files (dict): Dictionary containing lists of metadata, view, and thumbnail file paths.
+        _store (PathStore): The metadata, view, thumbnail, alternative form, plot, context info and image files
+            found, with the roles of the files and the view URLs of the metadata files.
     """
 
     _dataset_dir = None
-    _image_paths = []
-    _plot_files = {
-        'plot': [],
-        'thumbnail': [],
-    }
-    _scaffold_files = {
-        'metadata': [],
-        'view': [],
-        'thumbnail': [],
-        'alt_forms': {},
-    }
-    _context_info_files = []
+    _store = None
+    _max_size = None
+    _context_max_size = None
+    _prefilter = None
+    _prune_rules = None
+    _archive = None
 
     def is_defined(self):
         return self._dataset_dir is not None
 
-    def setup_dataset(self, dataset_dir, max_size):
+    def setup_dataset(self, dataset_dir, max_size, executor=None, cache=None, prefilter=None, prune_rules=None,
+                      timings=None, shard_strategy=None, shard_count=None):
         """
         Set up the dataset by searching for the required files.
 
+        The dataset may also be a zip or tar archive, see DatasetArchive.  The
+        files of an archive are classified in this process as they are streamed
+        from the archive, the executor, cache and shard strategy are not used.
+
         Args:
             dataset_dir (str): The dataset directory path.
             max_size (int): The maximum allowed file size.
+            executor (concurrent.futures.Executor): Optional executor to classify the files with.
+            cache (ScanCache): Optional cache, only files changed since the last cached scan are re-examined.
+            prefilter (FilePrefilter): Optional prefilter for the files read, a default FilePrefilter is used if not given.
+            prune_rules (PruneRules): Optional rules for the files and directories to skip.
+            timings (ScanTimings): Optional timings the time spent on each directory is added to.
+            shard_strategy (str): Optional strategy to split the dataset into shards scanned separately,
+                one of SHARD_STRATEGIES.  The executor then scans whole shards instead of single files.
+            shard_count (int): The number of shards for the 'hash' shard strategy.
 
         Returns:
             OnDiskFiles: The instance of the class.
         """
+        if self._archive is not None:
+            self._archive.close()
+        self._archive = DatasetArchive(dataset_dir) if is_dataset_archive(dataset_dir) else None
         self._dataset_dir = dataset_dir
-        self._image_paths = search_for_image_files(dataset_dir)
+        self._max_size = max_size
+        self._context_max_size = CONTEXT_MAX_SIZE
+        self._prefilter = FilePrefilter() if prefilter is None else prefilter
+        self._prune_rules = prune_rules
+        if self._archive is not None:
+            classifications = ((file_path, roles, view_urls) for file_path, (roles, view_urls) in
+                               classify_archive_files(self._archive, max_size, self._context_max_size,
+                                                      self._prefilter, prune_rules, timings).items())
+        elif shard_strategy is None:
+            # The files are added to the store as they stream in.
+            classifications = iter_classified_files(dataset_dir, max_size, self._context_max_size, executor, cache,
+                                                    self._prefilter, prune_rules, timings)
+        else:
+            classifications = ((file_path, roles, view_urls) for file_path, (roles, view_urls) in
+                               classify_dataset_shards(dataset_dir, max_size, self._context_max_size, shard_strategy,
+                                                       shard_count, executor, cache, self._prefilter, prune_rules,
+                                                       timings).items())
+
+        self._store = PathStore(dataset_dir)
+        for file_path, roles, view_urls in classifications:
+            if is_scan_relevant(file_path, roles):
+                self._add_classification(file_path, roles, view_urls)
+        self._set_derived_lists()
 
-        metadata_file, metadata_views = search_for_metadata_files(dataset_dir, max_size)
-        self.set_metadata_files(metadata_file, metadata_views)
+        return self
 
-        self._scaffold_files["view"] = search_for_view_files(dataset_dir, max_size)
-        self._scaffold_files["thumbnail"] = filter_thumbnail_files_by_parent(self._image_paths,
-                                                                             self._scaffold_files["view"])
-        self._scaffold_files["alt_forms"] = _filter_alt_forms_by_thumbnail(self._scaffold_files["thumbnail"])
+    def _get_store(self):
+        if self._store is None:
+            raise DatasetNotDefinedError("The dataset files have not been found, call OnDiskFiles.setup_dataset first.")
 
-        self._plot_files["plot"] = search_for_plot_files(self._dataset_dir)
-        self._plot_files["thumbnail"] = filter_thumbnail_files_by_parent(self._image_paths,
-                                                                         self._plot_files["plot"])
+        return self._store
 
-        self._context_info_files = search_for_context_data_files(self._dataset_dir, convert_to_bytes("2MiB"))
+    def _add_classification(self, file_path, roles, view_urls, key=None):
+        """
+        Add a classified file to the lists of the store for its roles.
+
+        Args:
+            file_path (str): The path to the file.
+            roles (set): The roles of the file.
+            view_urls (list): The view URLs of the file, kept for a metadata file.
+            key (callable): Optional sort key to insert the file in order, the file is appended if not given.
+        """
+        store = self._get_store()
+        for role in SCAN_ROLES:
+            if role in roles:
+                store.add_to_list(role, file_path, role, key)
+        if 'metadata' in roles:
+            store.set_view_urls(file_path, view_urls)
+        if _get_alt_form_extension(os.path.basename(file_path)) is not None:
+            store.add_to_list(ALT_FORM_CANDIDATES_LIST, file_path, key=key)
+
+    def _remove_classifications(self, path):
+        """
+        Remove the file at the given path, or all the files under the directory at the given path, from the store.
+
+        Args:
+            path (str): The file or directory path.
+        """
+        store = self._get_store()
+        for low, high in _get_walk_order_ranges(path):
+            for role in SCAN_ROLES:
+                removed_paths = store.remove_from_list(role, low, high, walk_order_key, role)
+                if role == 'metadata':
+                    for file_path in removed_paths:
+                        store.set_view_urls(file_path, None)
+            store.remove_from_list(ALT_FORM_CANDIDATES_LIST, low, high, walk_order_key)
+
+    def _set_derived_lists(self):
+        """
+        Set the thumbnail, plot thumbnail and alternative form lists of the store from its lists of classified files.
+        """
+        store = self._get_store()
+        image_files = store.get_list('image')
+        image_by_dirname = index_files_by_dirname(image_files)
+        thumbnails = filter_thumbnail_files_by_parent(image_files, store.get_list('view'), image_by_dirname)
+        store.set_list('thumbnail', thumbnails, 'thumbnail')
+        alt_form_names_by_dirname = {}
+        for file_path in store.get_list(ALT_FORM_CANDIDATES_LIST):
+            alt_form_names_by_dirname.setdefault(os.path.dirname(file_path), []).append(os.path.basename(file_path))
+        for mime, alt_forms in _filter_alt_forms_by_thumbnail(thumbnails, alt_form_names_by_dirname).items():
+            store.set_list(ALT_FORMS_LIST_PREFIX + mime, alt_forms, 'alt_form')
+        store.set_list('plot_thumbnail', filter_thumbnail_files_by_parent(image_files, store.get_list('plot'),
+                                                                          image_by_dirname), 'plot_thumbnail')
+
+    def update_files(self, changed_paths):
+        """
+        Update the dataset files after the given paths have changed on disk.
+
+        Only the changed files are re-examined and added to, or removed from,
+        the store in place.  A changed directory has all the files under it
+        re-examined, a path that no longer exists is removed along with any
+        files that were under it.
+
+        Args:
+            changed_paths (list): List of the file and directory paths that have changed.
+
+        Returns:
+            OnDiskFiles: The instance of the class.
+
+        Raises:
+            DatasetNotDefinedError: If the dataset has not been set up.
+        """
+        self._get_store()
+        dataset_dir = str(Path(self._dataset_dir))
+        for changed_path in changed_paths:
+            changed_path = str(Path(changed_path))
+            relative_path = os.path.relpath(changed_path, dataset_dir)
+            if relative_path.startswith(os.pardir) or CACHE_DIRNAME in relative_path.split(os.sep):
+                continue
+            if self._prune_rules is not None and \
+                    self._prune_rules.is_path_pruned(relative_path, os.path.isdir(changed_path)):
+                continue
+
+            self._remove_classifications(changed_path)
+            if os.path.isfile(changed_path):
+                file_paths = [changed_path]
+            else:
+                file_paths = [entry.path for entry in walk_dataset_files(dataset_dir, self._prune_rules,
+                                                                         start_dir=changed_path)] \
+                    if os.path.isdir(changed_path) and not os.path.islink(changed_path) else []
+
+            for file_path in file_paths:
+                roles, view_urls, rejection = classify_file(file_path, _path_size(file_path), self._max_size,
+                                                            self._context_max_size, self._prefilter)
+                self._prefilter.record(rejection)
+                if is_scan_relevant(file_path, roles):
+                    self._add_classification(file_path, roles, view_urls, walk_order_key)
+
+        self._set_derived_lists()
 
         return self
 
     def get_dataset_dir(self):
         return self._dataset_dir
 
+    def get_archive(self):
+        return self._archive
+
+    def is_file(self, file_path):
+        """
+        Check if the given path is a file of the dataset, which may be held in a dataset archive.
+
+        Args:
+            file_path (str): The path to the file.
+
+        Returns:
+            bool: True if the file exists.
+        """
+        if self._archive is not None:
+            return self._archive.is_file(file_path)
+
+        return os.path.isfile(file_path)
+
     def set_metadata_files(self, files, metadata_views):
         """
         Set the metadata files and metadata views.
@@ -461,70 +1511,106 @@ class OnDiskFiles(metaclass=Singleton):
             files (list): List of metadata file paths.
             metadata_views (dict): Dictionary containing metadata view file paths.
         """
-        self._scaffold_files['metadata'] = files
+        store = self._get_store()
+        store.set_list('metadata', files, 'metadata')
+        for file_path, view_urls in metadata_views.items():
+            store.set_view_urls(file_path, view_urls)
 
     def get_metadata_files(self):
         """
         Get the metadata file paths.
 
         Returns:
-            list: List of metadata file paths.
+            PathListView: Read-only list of metadata file paths.
         """
-        return [str(i) for i in self._scaffold_files['metadata']]
+        return self._get_store().get_list('metadata')
 
     def get_view_files(self):
         """
         Get the view file paths.
 
         Returns:
-            list: List of view file paths.
+            PathListView: Read-only list of view file paths.
         """
-        return [str(i) for i in self._scaffold_files['view']]
+        return self._get_store().get_list('view')
 
     def get_alt_forms_files(self):
         """
         Get the alternative forms file paths.
 
         Returns:
-            list: List of alternative forms file paths.
+            MappingProxyType: Maps each alternative form MIME type to a read-only list of file paths.
         """
-        return self._scaffold_files['alt_forms']
+        return self._get_store().get_lists_with_prefix(ALT_FORMS_LIST_PREFIX)
 
     def get_thumbnail_files(self):
         """
         Get the thumbnail file paths.
 
         Returns:
-            list: List of thumbnail file paths.
+            PathListView: Read-only list of thumbnail file paths.
         """
-        return [str(i) for i in self._scaffold_files['thumbnail']]
+        return self._get_store().get_list('thumbnail')
 
     def get_plot_files(self):
         """
         Get the plot file paths.
 
         Returns:
-            list: Lists of CSV and TSV plot file paths.
+            PathListView: Read-only list of CSV, TSV and text plot file paths.
         """
-        return [str(i) for i in self._plot_files['plot']]
+        return self._get_store().get_list('plot')
 
     def get_plot_thumbnails(self):
         """
         Get the plot thumbnail paths.
 
         Returns:
-            list: Lists of plot thumbnail paths.
+            PathListView: Read-only list of plot thumbnail paths.
         """
-        return [str(i) for i in self._plot_files['thumbnail']]
+        return self._get_store().get_list('plot_thumbnail')
 
     def get_all_image_files(self):
         """
         Get all the image file paths.
 
         Returns:
-            list: List of all image file paths.
+            PathListView: Read-only list of all image file paths.
         """
-        return [str(i) for i in self._image_paths]
+        return self._get_store().get_list('image')
 
     def get_context_info_files(self):
-        return [str(i) for i in self._context_info_files]
+        return self._get_store().get_list('context')
+
+    def get_view_urls(self, metadata_file):
+        """
+        Get the view URLs found in a metadata file.
+
+        Args:
+            metadata_file (str): The path to the metadata file.
+
+        Returns:
+            tuple: The view URLs of the metadata file.
+        """
+        return self._get_store().get_view_urls(metadata_file)
+
+    def get_file_roles(self, file_path):
+        """
+        Get the roles a file was found to have.
+
+        Args:
+            file_path (str): The path to the file.
+
+        Returns:
+            frozenset: The names of the roles of the file, see ROLE_FLAGS.
+        """
+        return self._get_store().get_roles(file_path)
+
+    def get_prefilter_rejections(self):
+        """
+        Get the number of files that were not read during the scan, by reason.
+
+        Returns:
+            dict: The number of files rejected for each reason.
+        """
+        return {} if self._prefilter is None else dict(self._prefilter.rejections)
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import sqlite3
+
+from sparc.curation.tools.helpers.cache_helper import file_cache_key
+
+FINGERPRINT_CHUNK_SIZE = 64 * 1024
+FINGERPRINT_FILENAME = 'fingerprints.sqlite'
+FINGERPRINT_MAP_CHUNK_SIZE = 16
+
+
+def compute_fingerprint(file_path, chunk_size=FINGERPRINT_CHUNK_SIZE):
+    """
+    Compute a fingerprint of the content of a file.
+
+    The fingerprint is made from the size of the file and a hash of its first
+    and last chunks, so it is cheap to compute for large files.
+
+    Args:
+        file_path (str): The path to the file.
+        chunk_size (int): The number of bytes hashed from the start and the end of the file.
+
+    Returns:
+        str: The fingerprint of the file, None if the file could not be read.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(f.read(chunk_size))
+            if size > chunk_size:
+                f.seek(max(chunk_size, size - chunk_size))
+                digest.update(f.read(chunk_size))
+    except OSError:
+        return None
+
+    return f"{size}:{digest.hexdigest()}"
+
+
+class FingerprintIndex(object):
+    """
+    Index of the content fingerprints of dataset files, kept between runs.
+
+    The fingerprint recorded for a file is kept after the file is moved or
+    removed, so a file annotated in a manifest that no longer exists can be
+    matched to a file found elsewhere with the same content.  Fingerprints are
+    only recomputed for files whose size, modification time or inode has
+    changed.  The index is held in a SQLite database in the cache directory.
+    """
+
+    def __init__(self, cache_dir):
+        self._cache_dir = cache_dir
+        self._connection = None
+        self._entries = None
+        self._updated = {}
+        self._forgotten = set()
+        self._current_paths_by_fingerprint = {}
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            self._connection = sqlite3.connect(os.path.join(self._cache_dir, FINGERPRINT_FILENAME))
+            self._connection.execute('CREATE TABLE IF NOT EXISTS fingerprints (path TEXT PRIMARY KEY, size INTEGER, '
+                                     'mtime_ns INTEGER, inode INTEGER, fingerprint TEXT)')
+
+        return self._connection
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            for path, size, mtime_ns, inode, fingerprint in self._connect().execute('SELECT * FROM fingerprints'):
+                self._entries[path] = ((size, mtime_ns, inode), fingerprint)
+
+        return self._entries
+
+    def update(self, file_paths, executor=None):
+        """
+        Index the current fingerprints of the given files.
+
+        Args:
+            file_paths (iterable): The paths of the files currently in the dataset.
+            executor (concurrent.futures.Executor): Optional executor to compute the fingerprints with.
+        """
+        entries = self._load()
+        current_paths = []
+        pending = []
+        for file_path in file_paths:
+            try:
+                key = file_cache_key(os.stat(file_path))
+            except OSError:
+                continue
+
+            entry = entries.get(file_path)
+            if entry is not None and entry[0] == key:
+                current_paths.append(file_path)
+            else:
+                pending.append((file_path, key))
+
+        pending_paths = [file_path for file_path, _ in pending]
+        if executor is None:
+            fingerprints = map(compute_fingerprint, pending_paths)
+        else:
+            fingerprints = executor.map(compute_fingerprint, pending_paths, chunksize=FINGERPRINT_MAP_CHUNK_SIZE)
+
+        for (file_path, key), fingerprint in zip(pending, fingerprints):
+            if fingerprint is not None:
+                entries[file_path] = (key, fingerprint)
+                self._updated[file_path] = (key, fingerprint)
+                self._forgotten.discard(file_path)
+                current_paths.append(file_path)
+
+        self._current_paths_by_fingerprint = {}
+        for file_path in current_paths:
+            self._current_paths_by_fingerprint.setdefault(entries[file_path][1], []).append(file_path)
+
+    def get_fingerprint(self, file_path):
+        """
+        Get the fingerprint last recorded for a file, which may no longer exist.
+
+        Args:
+            file_path (str): The path to the file.
+
+        Returns:
+            str: The fingerprint of the file, None if the file has not been indexed.
+        """
+        entry = self._load().get(file_path)
+        return None if entry is None else entry[1]
+
+    def find_current_paths(self, fingerprint):
+        """
+        Find the files indexed by the last update that have the given fingerprint.
+
+        Args:
+            fingerprint (str): The fingerprint to look for.
+
+        Returns:
+            list: The paths of the files with the fingerprint.
+        """
+        return list(self._current_paths_by_fingerprint.get(fingerprint, []))
+
+    def forget(self, file_path):
+        if self._load().pop(file_path, None) is not None:
+            self._updated.pop(file_path, None)
+            self._forgotten.add(file_path)
+
+    def save(self):
+        connection = self._connect()
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?)',
+                                   [(path,) + tuple(key) + (fingerprint,)
+                                    for path, (key, fingerprint) in self._updated.items()])
+            connection.executemany('DELETE FROM fingerprints WHERE path = ?', [(path,) for path in self._forgotten])
+
+        self._updated = {}
+        self._forgotten = set()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
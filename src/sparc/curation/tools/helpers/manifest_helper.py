@@ -1,74 +1,783 @@
+import contextlib
+import io
+import json
 import os
 import pathlib
+import time
+import zipfile
 from pathlib import Path
 import pandas as pd
+from openpyxl.utils.exceptions import InvalidFileException
 
 from sparc.curation.tools.errors import BadManifestError, AnnotationDirectoryNoWriteAccess
+from sparc.curation.tools.helpers.archive_helper import DatasetArchive, is_dataset_archive
 from sparc.curation.tools.helpers.base import Singleton
+from sparc.curation.tools.helpers.cache_helper import file_cache_key
+from sparc.curation.tools.helpers.workbook_helper import patch_workbook, write_atomically
 from sparc.curation.tools.definitions import (
     FILE_LOCATION_COLUMN, FILENAME_COLUMN, SUPPLEMENTAL_JSON_COLUMN,
     ADDITIONAL_TYPES_COLUMN, ANATOMICAL_ENTITY_COLUMN,
     SCAFFOLD_META_MIME, SCAFFOLD_THUMBNAIL_MIME,
     PLOT_CSV_MIME, PLOT_TSV_MIME, DERIVED_FROM_COLUMN,
-    SOURCE_OF_COLUMN, MANIFEST_DIR_COLUMN, MANIFEST_FILENAME, SHEET_NAME_COLUMN
+    SOURCE_OF_COLUMN, MANIFEST_DIR_COLUMN, MANIFEST_FILENAME, MANIFEST_FILENAMES, MANIFEST_PATH_COLUMN, SHEET_NAME_COLUMN,
+    DEFAULT_SHEET_NAME
 )
 from sparc.curation.tools.utilities import is_same_file
 
+MANIFEST_DELIMITERS = {
+    '.csv': ',',
+    '.tsv': '\t',
+}
+# Columns holding few distinct values, stored as categoricals in the manifest data frame.
+CATEGORICAL_COLUMNS = [MANIFEST_DIR_COLUMN, MANIFEST_PATH_COLUMN, SHEET_NAME_COLUMN, ADDITIONAL_TYPES_COLUMN]
+# Columns whose misspelt headings are corrected, see ManifestDataFrame._sanitise_dataframe.
+SANITISED_COLUMNS = [DERIVED_FROM_COLUMN, SOURCE_OF_COLUMN, ANATOMICAL_ENTITY_COLUMN]
+# The exceptions raised reading a manifest file that can not be parsed, see _load_manifest_workbook.
+# pandas raises ParserError, and json raises JSONDecodeError, both subclasses of ValueError, and openpyxl
+# raises KeyError for a workbook missing one of its parts.
+MANIFEST_LOAD_ERRORS = (OSError, ValueError, KeyError, zipfile.BadZipFile, InvalidFileException)
+
+
+def _get_manifest_extension(manifest_path):
+    return os.path.splitext(str(manifest_path))[1].lower()
+
+
+def _parse_manifest_workbook(manifest_path, opener=None):
+    """
+    Parse every sheet of a manifest file.
+
+    A manifest file may be a workbook or a CSV, TSV or JSON file, see
+    MANIFEST_FILENAMES.  A text manifest file holds a single sheet, named
+    DEFAULT_SHEET_NAME, and a JSON manifest file holds a list of rows, each an
+    object mapping the column headings to the cells of the row.  As for a
+    workbook, empty cells are parsed as NaN and every other cell as a string.
+
+    Args:
+        manifest_path (str): The path to the manifest file.
+        opener (function): Optional function opening the file for binary reading, used in place of open.
+
+    Returns:
+        dict: Maps each sheet name to the data frame of the sheet.
+
+    Raises:
+        ValueError: If the manifest file can not be parsed.
+    """
+    extension = _get_manifest_extension(manifest_path)
+    if extension in MANIFEST_DELIMITERS:
+        with (opener or _open_binary)(manifest_path) as f:
+            return {DEFAULT_SHEET_NAME: pd.read_csv(f, sep=MANIFEST_DELIMITERS[extension], dtype=str)}
+
+    if extension == '.json':
+        with (opener or _open_binary)(manifest_path) as f:
+            rows = json.load(f)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError(f"JSON manifest file '{manifest_path}' does not hold a list of rows.")
+        return {DEFAULT_SHEET_NAME: _as_read_back(pd.DataFrame(rows))}
+
+    manifest_file = manifest_path
+    if opener is not None:
+        with opener(manifest_path) as f:
+            manifest_file = io.BytesIO(f.read())
+
+    with pd.ExcelFile(manifest_file) as xl_file:
+        return {sheet_name: pd.read_excel(xl_file, sheet_name=sheet_name, dtype=str)
+                for sheet_name in xl_file.sheet_names}
+
+
+def _open_binary(file_path):
+    return open(file_path, 'rb')
+
+
+def _write_manifest_workbook(manifest_path, sheets, original_sheets=None):
+    """
+    Write every sheet of a manifest file, in the format given by its extension.
+
+    An existing workbook is patched from its original sheets, so only the
+    changed cells are written, see patch_workbook.  Every other manifest file is
+    written in full.  Either way the manifest file is replaced atomically.
+
+    Args:
+        manifest_path (str): The path to the manifest file.
+        sheets (dict): Maps each sheet name to the data frame of the sheet.
+        original_sheets (dict): Optional sheets of the manifest file as they were read.
+
+    Raises:
+        ValueError: If more than one sheet is written to a text manifest file.
+    """
+    extension = _get_manifest_extension(manifest_path)
+    if extension not in MANIFEST_DELIMITERS and extension != '.json':
+        if original_sheets and os.path.isfile(manifest_path):
+            patch_workbook(manifest_path, sheets, original_sheets)
+        else:
+            write_atomically(manifest_path, lambda file_path: _write_excel_workbook(file_path, sheets))
+        return
+
+    if len(sheets) != 1:
+        raise ValueError(f"Text manifest file '{manifest_path}' can only hold a single sheet.")
+
+    sheetDataFrame = next(iter(sheets.values()))
+    if extension == '.json':
+        write_atomically(manifest_path, lambda file_path: _write_json_sheet(file_path, sheetDataFrame))
+    else:
+        write_atomically(manifest_path, lambda file_path: sheetDataFrame.to_csv(
+            file_path, sep=MANIFEST_DELIMITERS[extension], index=False, header=True))
+
+
+def _write_excel_workbook(workbook_path, sheets):
+    with pd.ExcelWriter(workbook_path) as writer:
+        for sheet_name, sheetDataFrame in sheets.items():
+            sheetDataFrame.to_excel(writer, sheet_name=sheet_name, index=False, header=True)
+
+
+def _write_json_sheet(file_path, sheetDataFrame):
+    rows = sheetDataFrame.astype(object).where(sheetDataFrame.notnull(), None).to_dict(orient='records')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2, ensure_ascii=False, default=str)
+
+
+def _load_manifest_workbook(manifest_path, opener=None):
+    """
+    Parse every sheet of a manifest file, catching a failure to read or parse it, see MANIFEST_LOAD_ERRORS.
+
+    This is run by the worker processes when manifest files are loaded in
+    parallel, so a manifest file that can not be parsed does not stop the others
+    from being loaded.  Any other exception is a programming error and is raised.
+
+    Args:
+        manifest_path (str): The path to the manifest file.
+        opener (function): Optional function opening the file for binary reading, used in place of open.
+
+    Returns:
+        tuple: The sheets of the manifest file, see _parse_manifest_workbook, or None if it could not be parsed,
+            the reason it could not be parsed or None, and the seconds spent.
+    """
+    start = time.perf_counter()
+    try:
+        sheets, error = _parse_manifest_workbook(manifest_path, opener), None
+    except MANIFEST_LOAD_ERRORS as e:
+        sheets, error = None, f"{type(e).__name__}: {e}"
+
+    return sheets, error, time.perf_counter() - start
+
+
+def _tag_manifest_workbook(sheets, manifest_path, usecols=None):
+    """
+    Tag the sheets of a manifest file with their sheet name, manifest directory and manifest path.
+
+    Args:
+        sheets (dict): Maps each sheet name to the data frame of the sheet.
+        manifest_path (str): The path to the manifest file.
+        usecols (list): Optional columns to keep, see _tag_manifest_sheet.
+
+    Returns:
+        list: A data frame for each sheet, tagged with the sheet name, manifest directory and manifest path.
+    """
+    return [_tag_manifest_sheet(sheetDataFrame, sheet_name, manifest_path, usecols)
+            for sheet_name, sheetDataFrame in sheets.items()]
+
+
+def _tag_manifest_sheet(sheetDataFrame, sheet_name, manifest_path, usecols=None):
+    """
+    Tag a sheet of a manifest file with its sheet name, manifest directory and manifest path.
+
+    A directory may hold manifest files of more than one format, so the rows
+    are tied to the manifest file they were read from by the manifest path.
+
+    Only the given columns are kept from the sheet, matched whatever their
+    case so that misspelt headings can still be sanitised.  The filename column
+    and the columns that are sanitised are always kept.
+
+    Args:
+        sheetDataFrame (DataFrame): The content of the sheet.
+        sheet_name (str): The name of the sheet.
+        manifest_path (str): The path to the manifest file.
+        usecols (list): Optional columns to keep, None to keep every column.
+
+    Returns:
+        DataFrame: The content of the sheet, tagged with the sheet name, manifest directory and manifest path.
+    """
+    if usecols is not None:
+        kept_columns = {column_name.lower() for column_name in [FILENAME_COLUMN, *usecols, *SANITISED_COLUMNS]}
+        sheetDataFrame = sheetDataFrame[[column_name for column_name in sheetDataFrame.columns
+                                         if str(column_name).lower() in kept_columns]]
+    manifest_path = os.path.normpath(str(manifest_path))
+    currentDataFrame = sheetDataFrame.assign(**{SHEET_NAME_COLUMN: sheet_name,
+                                                MANIFEST_DIR_COLUMN: os.path.dirname(manifest_path),
+                                                MANIFEST_PATH_COLUMN: manifest_path})
+    return currentDataFrame
+
+
+def _compact_dataframe(manifestDataFrame):
+    """
+    Store the columns of the manifest data frame that hold few distinct values as categoricals.
+
+    Every row of a manifest file repeats its manifest directory and sheet name,
+    and most rows share one of a handful of additional types, so each distinct
+    value is held once and the rows only hold codes.
+
+    Args:
+        manifestDataFrame (DataFrame): The manifest data frame.
+
+    Returns:
+        DataFrame: The manifest data frame with CATEGORICAL_COLUMNS stored as categoricals.
+    """
+    dtypes = {column_name: 'category' for column_name in CATEGORICAL_COLUMNS
+              if column_name in manifestDataFrame.columns and manifestDataFrame[column_name].dtype != 'category'}
+    return manifestDataFrame.astype(dtypes) if dtypes else manifestDataFrame
+
+
+def _as_read_back(sheetDataFrame):
+    """
+    Get a sheet as it would be read back from a manifest file it was written to.
+
+    Empty cells are read as NaN and every other cell as a string.
+
+    Args:
+        sheetDataFrame (DataFrame): The content of the sheet.
+
+    Returns:
+        DataFrame: The content of the sheet as read back.
+    """
+    sheetDataFrame = sheetDataFrame.reset_index(drop=True).astype(object)
+    return sheetDataFrame.apply(lambda column: column.map(
+        lambda x: None if pd.isnull(x) or x == '' else str(x))).fillna(value=float('nan'))
+
+
+def _get_manifest_path(manifest_dir):
+    """
+    Get the path to the manifest file in the given directory.
+
+    Args:
+        manifest_dir (str): The directory of the manifest file.
+
+    Returns:
+        str: The path to the first of MANIFEST_FILENAMES in the directory, to a new workbook if there is none.
+    """
+    for manifest_filename in MANIFEST_FILENAMES:
+        manifest_path = os.path.join(manifest_dir, manifest_filename)
+        if os.path.isfile(manifest_path):
+            return manifest_path
+
+    return os.path.join(manifest_dir, MANIFEST_FILENAME)
+
+
+def _get_reference_location(manifest_dir, reference):
+    return os.path.normpath(os.path.join(manifest_dir, reference))
+
+
+def _as_reference(location, manifest_dir):
+    return pathlib.PureWindowsPath(os.path.relpath(location, manifest_dir)).as_posix()
+
+
+def _rewrite_references(value, rewrite):
+    """
+    Rewrite each of the newline separated references of a derived from or source of cell.
+
+    Args:
+        value (str): The content of the cell, anything else is returned as it is.
+        rewrite (function): Maps each reference to the reference to write in its place.
+
+    Returns:
+        str: The rewritten content of the cell.
+    """
+    if not isinstance(value, str):
+        return value
+
+    return "\n".join(rewrite(reference) if reference else reference for reference in value.split("\n"))
+
+
+def _find_segments(manifestDataFrame):
+    """
+    Find the segments of the manifest data frame holding the rows of each manifest file.
+
+    The rows of a manifest file are kept together in the manifest data frame.
+    A segment is keyed by the manifest path and the number of segments with
+    the same manifest path before it, which is 0 unless the rows of a manifest
+    file have been split.
+
+    Args:
+        manifestDataFrame (DataFrame): The manifest data frame.
+
+    Returns:
+        dict: Maps the key of each segment to the positions of its first row and of the row after its last row,
+        in the order of the manifest data frame.
+    """
+    segments = {}
+    if manifestDataFrame.empty or MANIFEST_PATH_COLUMN not in manifestDataFrame.columns:
+        return segments
+
+    manifest_paths = manifestDataFrame[MANIFEST_PATH_COLUMN]
+    codes = pd.factorize(manifest_paths)[0]
+    starts = [0] + list((codes[1:] != codes[:-1]).nonzero()[0] + 1)
+    for start, end in zip(starts, starts[1:] + [len(codes)]):
+        manifest_path = manifest_paths.iat[start]
+        manifest_path = None if pd.isnull(manifest_path) else manifest_path
+        occurrence = 0
+        while (manifest_path, occurrence) in segments:
+            occurrence += 1
+        segments[(manifest_path, occurrence)] = int(start), int(end)
+
+    return segments
+
+
+def _get_file_locations(manifestDataFrame):
+    """
+    Get the location of the file each row of the manifest data frame refers to.
+
+    Args:
+        manifestDataFrame (DataFrame): The manifest data frame.
+
+    Returns:
+        Series: The manifest directory joined with the filename of each row, None for rows without a filename.
+    """
+    if manifestDataFrame.empty:
+        return pd.Series(None, index=manifestDataFrame.index, dtype=object)
+
+    manifest_dirs = manifestDataFrame[MANIFEST_DIR_COLUMN].astype(str)
+    filenames = manifestDataFrame[FILENAME_COLUMN]
+    has_filename = filenames.notnull()
+    file_locations = (manifest_dirs + os.sep + filenames.astype(str)).astype(object)
+    # Where os.path.join would not simply add a separator the location is joined row by row.
+    irregular = has_filename & (manifest_dirs.str.endswith(os.sep) |
+                                filenames.map(os.path.isabs, na_action='ignore').fillna(False).astype(bool))
+    if irregular.any():
+        file_locations[irregular] = [os.path.join(manifest_dir, filename) for manifest_dir, filename in
+                                     zip(manifest_dirs[irregular], filenames[irregular])]
+    return file_locations.where(has_filename, None)
+
 
 class ManifestDataFrame(metaclass=Singleton):
     """
     A singleton class for managing manifest data frames.
 
     This class provides methods to manipulate and access data in the manifest data frame.
+    When this class writes a manifest file the rows of that file in the manifest
+    data frame are patched from what was written, the manifest files are only
+    read again if one of them has been changed by something else.
+
+    Lookups are answered from indexes of the manifest data frame that are built
+    the first time a column is looked up.  The indexes are kept for the rows of
+    each manifest file, so when the rows of some manifest files are patched only
+    the entries of those manifest files are rebuilt.  The file_location column is not stored in the manifest
+    data frame, it is derived from the manifest directory and filename of each
+    row the first time it is looked up and kept with the indexes.
     """
 
     _manifestDataFrame = None
     _dataset_dir = None
-
-    def setup_dataframe(self, dataset_dir):
+    _archive = None
+    _pending_workbooks = None
+    _pending_originals = None
+    _recent_workbook = None
+    _written_workbooks = None
+    _manifest_keys = None
+    _indexed_dataframe = None
+    _segments = None
+    _segment_indexes = None
+    _stale_manifests = None
+    _indexes = None
+    _lookups = None
+    _load_times = None
+    _load_errors = None
+    _manifest_cache = None
+    _usecols = None
+    _prune_rules = None
+
+    def setup_dataframe(self, dataset_dir, cache=None, executor=None, usecols=None, prune_rules=None):
         """
         Set up the manifest data frame.
 
+        The dataset may be a zip or tar archive, see DatasetArchive.  The manifest
+        files are then read from the archive and can not be changed.
+
         Args:
             dataset_dir (str): The directory containing the dataset.
+            cache (ManifestCache): Optional cache of the parsed manifest files, only manifest files changed
+                since they were cached are parsed.  Manifest files written by this class are cached as written.
+            executor (concurrent.futures.Executor): Optional executor to parse the manifest files with.
+            usecols (list): Optional columns to keep in the manifest data frame, such as
+                MANIFEST_VALIDATION_COLUMNS, see _tag_manifest_sheet.  The manifest files are still written
+                with all their columns.
+            prune_rules (PruneRules): Optional rules for the files and directories skipped by the dataset scan.
+                The rows of the skipped files are left out of the manifest data frame, so they are neither
+                checked nor fixed, the manifest files are still written with them.
 
         Returns:
             ManifestDataFrame: The instance of the ManifestDataFrame class.
         """
+        if self._archive is not None:
+            self._archive.close()
+        self._archive = DatasetArchive(dataset_dir) if is_dataset_archive(dataset_dir) else None
+        self._manifest_cache = None if self._archive is not None else cache
         self._dataset_dir = dataset_dir
-        self._read_manifests()
+        self._usecols = None if usecols is None else list(usecols)
+        self._prune_rules = prune_rules
+        self._recent_workbook = None
+        self._segments = {}
+        self._segment_indexes = {}
+        self._indexes = {}
+        self._lookups = {}
+        self._read_manifests(executor=executor)
         return self
 
-    def _read_manifests(self, depth=0):
+    def _read_manifests(self, depth=0, executor=None):
         """
         Recursively read the manifest files in the dataset directory.
 
+        The manifest files that are not in the manifest cache are parsed with the
+        executor if one is given.  The sheets are merged in the order the manifest
+        files are found, whatever order they are parsed in.  A manifest file that
+        can not be parsed is left out and recorded, see get_load_errors.
+
         Args:
             depth (int): The current depth of recursive manifest reading.
+            executor (concurrent.futures.Executor): Optional executor to parse the manifest files with.
 
         Raises:
             BadManifestError: If a manifest sanitization error is found.
         """
-        self._manifestDataFrame = pd.DataFrame()
-        for r in Path(self._dataset_dir).rglob(MANIFEST_FILENAME):
-            with pd.ExcelFile(r) as xl_file:
-                for sheet_name in xl_file.sheet_names:
-                    currentDataFrame = pd.read_excel(xl_file, sheet_name=sheet_name, dtype=str)
-                    currentDataFrame[SHEET_NAME_COLUMN] = sheet_name
-                    currentDataFrame[MANIFEST_DIR_COLUMN] = os.path.dirname(r)
-                    self._manifestDataFrame = pd.concat([currentDataFrame, self._manifestDataFrame])
+        self._manifest_keys = {}
+        self._written_workbooks = {}
+        self._load_times = {}
+        self._load_errors = {}
+        if self._archive is None:
+            manifest_files = [(r, None) for r in Path(self._dataset_dir).rglob('manifest.*')
+                              if r.name in MANIFEST_FILENAMES and r.is_file()]
+        else:
+            manifest_files = [(r, self._archive.open) for r in sorted(self._archive.get_manifest_paths())]
+        keys = {}
+        workbooks = {}
+        pending = []
+        for r, opener in manifest_files:
+            start = time.perf_counter()
+            if opener is None:
+                keys[r], workbooks[r] = self._get_cached_workbook(r)
+            if workbooks.get(r) is None:
+                pending.append((r, opener))
+            else:
+                self._load_times[str(r)] = time.perf_counter() - start
+
+        pending_paths = [r for r, _ in pending]
+        if executor is None or self._archive is not None:
+            results = map(_load_manifest_workbook, pending_paths, [opener for _, opener in pending])
+        else:
+            results = executor.map(_load_manifest_workbook, pending_paths)
+        for r, (workbook, error, seconds) in zip(pending_paths, results):
+            self._load_times[str(r)] = seconds
+            workbooks[r] = workbook
+            if error is None:
+                self._cache_workbook(r, keys.get(r), workbook)
+            else:
+                self._load_errors[str(r)] = error
 
-        if not self._manifestDataFrame.empty:
-            self._manifestDataFrame[FILE_LOCATION_COLUMN] = self._manifestDataFrame.apply(
-                lambda row: os.path.join(row[MANIFEST_DIR_COLUMN], row[FILENAME_COLUMN]) if pd.notnull(
-                    row[FILENAME_COLUMN]) else None, axis=1)
+        sheets = []
+        for r, _ in manifest_files:
+            if workbooks[r] is not None:
+                sheets.extend(_tag_manifest_workbook(workbooks[r], r, self._usecols))
+
+        # The sheets read last come first in the manifest data frame.
+        self._manifestDataFrame = _compact_dataframe(self._drop_pruned_rows(pd.concat(sheets[::-1]))) \
+            if sheets else pd.DataFrame()
+        self._invalidate_indexes()
 
         sanitised = self._sanitise_dataframe()
         if sanitised and depth == 0:
-            self._read_manifests(depth + 1)
+            self._read_manifests(depth + 1, executor)
         elif sanitised and depth > 0:
             raise BadManifestError('Manifest sanitization error found.')
 
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Defer writing the manifest files until the end of the block.
+
+        Within the block the updates are applied to an in-memory copy of each
+        manifest file they touch and the manifest data frame is patched from those
+        copies, so no manifest file is read or written again.  At the end of the
+        block each touched manifest file is written exactly once, with all of its
+        sheets.  Nested blocks are part of the outermost block.
+
+        Usage:
+            with ManifestDataFrame().batch():
+                ManifestDataFrame().update_plot_annotation(...)
+        """
+        if self._pending_workbooks is not None:
+            yield self
+            return
+
+        self._pending_workbooks = {}
+        self._pending_originals = {}
+        try:
+            yield self
+        finally:
+            pending_workbooks = self._pending_workbooks
+            self._pending_workbooks = None
+            changed_externally = self._is_changed_externally()
+            for manifest_path, (_, sheets) in pending_workbooks.items():
+                _write_manifest_workbook(manifest_path, sheets, self._pending_originals.get(manifest_path))
+                self._remember_workbook(manifest_path, self._record_manifest_key(manifest_path), sheets)
+            self._pending_originals = {}
+            if changed_externally:
+                self._read_manifests()
+
+    def _get_pending_workbook(self, manifest_path):
+        real_path = os.path.realpath(manifest_path)
+        pending_workbook = self._pending_workbooks.get(real_path)
+        if pending_workbook is None:
+            original_sheets = self._load_workbook(real_path, record_key=False) \
+                if os.path.isfile(real_path) else {}
+            self._pending_originals[real_path] = original_sheets
+            pending_workbook = manifest_path, dict(original_sheets)
+            self._pending_workbooks[real_path] = pending_workbook
+
+        return pending_workbook[1]
+
+    def _is_manifest_file(self, manifest_path):
+        if self._pending_workbooks is not None and os.path.realpath(manifest_path) in self._pending_workbooks:
+            return True
+
+        return os.path.isfile(manifest_path)
+
+    def _read_sheet(self, manifest_path, sheet_name=None):
+        """
+        Read a sheet of a manifest file.
+
+        Args:
+            manifest_path (str): The path to the manifest file, see MANIFEST_PATH_COLUMN.
+            sheet_name (str): The name of the sheet, None for the first sheet.
+
+        Returns:
+            DataFrame: The content of the sheet.
+        """
+        if self._pending_workbooks is None:
+            sheets = self._load_workbook(os.path.realpath(manifest_path), record_key=False)
+            return sheets[next(iter(sheets)) if sheet_name is None else sheet_name].copy()
+
+        sheets = self._get_pending_workbook(manifest_path)
+        if sheet_name is None:
+            sheet_name = next(iter(sheets))
+
+        return sheets[sheet_name].copy()
+
+    def _write_sheet(self, manifest_path, sheetDataFrame, sheet_name=None):
+        """
+        Write a sheet of a manifest file, creating the manifest file if needed.
+
+        Outside of a batch only the cells of the sheet that have changed are
+        written, the other sheets of the manifest file are kept.  Within a batch the
+        sheet is only written at the end of the batch.
+
+        Args:
+            manifest_path (str): The path to the manifest file, see MANIFEST_PATH_COLUMN.
+            sheetDataFrame (DataFrame): The content of the sheet.
+            sheet_name (str): The name of the sheet, None for the first sheet.
+        """
+        if self._pending_workbooks is None:
+            real_path = os.path.realpath(manifest_path)
+            original_sheets = self._load_workbook(real_path, record_key=False) \
+                if os.path.isfile(real_path) else {}
+            if sheet_name is None:
+                sheet_name = next(iter(original_sheets), DEFAULT_SHEET_NAME)
+            sheets = dict(original_sheets)
+            sheets[sheet_name] = _as_read_back(sheetDataFrame)
+            _write_manifest_workbook(real_path, sheets, original_sheets)
+            self._written_workbooks[real_path] = manifest_path, sheets
+            self._remember_workbook(real_path, self._record_manifest_key(real_path), sheets)
+            return
+
+        sheets = self._get_pending_workbook(manifest_path)
+        if sheet_name is None:
+            sheet_name = next(iter(sheets), DEFAULT_SHEET_NAME)
+        sheets[sheet_name] = _as_read_back(sheetDataFrame)
+
+    def _load_workbook(self, manifest_path, opener=None, record_key=True):
+        """
+        Load every sheet of a manifest file, from the manifest cache if it holds the file unchanged.
+
+        Args:
+            manifest_path (str): The path to the manifest file.
+            opener (function): Optional function opening the file for binary reading, used in place of open.
+            record_key (bool): Record the manifest file as read, see _is_changed_externally.
+
+        Returns:
+            dict: Maps each sheet name to the data frame of the sheet.
+        """
+        if opener is not None:
+            return _parse_manifest_workbook(manifest_path, opener)
+
+        key, sheets = self._get_cached_workbook(manifest_path, record_key)
+        if sheets is None:
+            sheets = _parse_manifest_workbook(manifest_path)
+            self._cache_workbook(manifest_path, key, sheets)
+        if not record_key:
+            self._recent_workbook = (os.path.realpath(manifest_path), key), sheets
+
+        return sheets
+
+    def _get_cached_workbook(self, manifest_path, record_key=True):
+        """
+        Get the sheets of a manifest file from the manifest cache.
+
+        Args:
+            manifest_path (str): The path to the manifest file.
+            record_key (bool): Record the manifest file as read, see _is_changed_externally.
+
+        Returns:
+            tuple: The cache key of the manifest file, None if it can not be read, and its cached sheets, None
+                if the manifest cache does not hold the file unchanged.
+        """
+        if record_key:
+            key = self._record_manifest_key(manifest_path)
+        else:
+            try:
+                key = file_cache_key(os.stat(manifest_path))
+            except OSError:
+                key = None
+        if self._recent_workbook is not None and self._recent_workbook[0] == (os.path.realpath(manifest_path), key):
+            return key, self._recent_workbook[1]
+        if self._manifest_cache is None or key is None:
+            return key, None
+
+        return key, self._manifest_cache.get(manifest_path, key)
+
+    def _cache_workbook(self, manifest_path, key, sheets):
+        if self._manifest_cache is not None and key is not None:
+            self._manifest_cache.set(manifest_path, key, sheets)
+
+    def _remember_workbook(self, manifest_path, key, sheets):
+        """
+        Keep the sheets just written to a manifest file, so they are not read back from it.
+
+        The sheets are kept in memory for the next read of the manifest file, and
+        in the manifest cache.
+
+        Args:
+            manifest_path (str): The path to the manifest file.
+            key (tuple): The cache key of the manifest file as written, see file_cache_key.
+            sheets (dict): Maps each sheet name to the data frame of the sheet.
+        """
+        self._recent_workbook = (os.path.realpath(manifest_path), key), sheets
+        self._cache_workbook(manifest_path, key, sheets)
+
+    def _record_manifest_key(self, manifest_path):
+        manifest_path = os.path.realpath(manifest_path)
+        try:
+            self._manifest_keys[manifest_path] = file_cache_key(os.stat(manifest_path))
+        except OSError:
+            self._manifest_keys.pop(manifest_path, None)
+
+        return self._manifest_keys.get(manifest_path)
+
+    def _is_unchanged(self, manifest_path):
+        try:
+            return self._manifest_keys.get(manifest_path) == file_cache_key(os.stat(manifest_path))
+        except OSError:
+            return False
+
+    def _is_changed_externally(self):
+        """
+        Check if any manifest file read or written by this class has since been changed by something else.
+
+        Returns:
+            bool: True if a manifest file's size, modification time or inode has changed.
+        """
+        return not all(self._is_unchanged(manifest_path) for manifest_path in self._manifest_keys)
+
+    def _refresh(self):
+        """
+        Bring the manifest data frame up to date after the manifest files have been written.
+
+        The rows of the written manifest files are replaced with what was written,
+        within a batch from the in-memory copies of the touched manifest files.
+        All the manifest files are read again only if one of them has been
+        changed by something else.
+        """
+        if self._pending_workbooks is None:
+            written_workbooks = self._written_workbooks
+            self._written_workbooks = {}
+            if self._is_changed_externally():
+                self._read_manifests()
+            else:
+                self._patch_workbooks(written_workbooks)
+        else:
+            self._patch_workbooks(self._pending_workbooks)
+
+    def _patch_workbooks(self, workbooks):
+        """
+        Replace the rows of the given manifest files in the manifest data frame.
+
+        Args:
+            workbooks (dict): Maps the real path of each manifest file to its path, see MANIFEST_PATH_COLUMN,
+                and a dict of its sheets.
+        """
+        manifestDataFrame = self._manifestDataFrame
+        manifest_paths = {os.path.normpath(manifest_path) for manifest_path, _ in workbooks.values()}
+        if MANIFEST_PATH_COLUMN in manifestDataFrame.columns:
+            manifestDataFrame = manifestDataFrame[~manifestDataFrame[MANIFEST_PATH_COLUMN].isin(manifest_paths)]
+
+        for manifest_path, sheets in workbooks.values():
+            for sheet_name, sheetDataFrame in sheets.items():
+                currentDataFrame = _tag_manifest_sheet(sheetDataFrame, sheet_name, manifest_path, self._usecols)
+                manifestDataFrame = pd.concat([currentDataFrame, manifestDataFrame])
+
+        self._manifestDataFrame = _compact_dataframe(self._drop_pruned_rows(manifestDataFrame))
+        self._mark_stale(manifest_paths)
+
+    def _drop_pruned_rows(self, manifestDataFrame):
+        """
+        Drop the rows of the files that the dataset scan skips, see setup_dataframe.
+
+        Args:
+            manifestDataFrame (DataFrame): The manifest rows.
+
+        Returns:
+            DataFrame: The manifest rows of the files that are not pruned.
+        """
+        column_names = manifestDataFrame.columns
+        if self._prune_rules is None or not self._prune_rules.get_patterns() or \
+                MANIFEST_DIR_COLUMN not in column_names or FILENAME_COLUMN not in column_names:
+            return manifestDataFrame
+
+        dataset_dir = str(Path(self._dataset_dir))
+        kept = []
+        for file_location in _get_file_locations(manifestDataFrame):
+            relative_path = None if file_location is None else os.path.relpath(file_location, dataset_dir)
+            kept.append(relative_path is None or relative_path.startswith(os.pardir) or
+                        not self._prune_rules.is_path_pruned(relative_path, False))
+
+        return manifestDataFrame[kept]
+
+    def update_manifests(self, manifest_paths):
+        """
+        Reload the given manifest files after they have changed on disk.
+
+        The rows from the given manifest files are replaced with the current content
+        of those files, the rows from all the other manifest files are kept as they are.
+        A manifest file that no longer exists has its rows removed.
+
+        Args:
+            manifest_paths (list): List of the changed manifest file paths.
+
+        Raises:
+            BadManifestError: If a manifest sanitization error is found.
+        """
+        manifest_paths = [os.path.normpath(manifest_path) for manifest_path in manifest_paths]
+        manifestDataFrame = self._manifestDataFrame
+        if MANIFEST_PATH_COLUMN in manifestDataFrame.columns:
+            manifestDataFrame = manifestDataFrame[~manifestDataFrame[MANIFEST_PATH_COLUMN].isin(manifest_paths)]
+
+        for manifest_path in manifest_paths:
+            self._record_manifest_key(manifest_path)
+            if os.path.isfile(manifest_path):
+                for currentDataFrame in _tag_manifest_workbook(self._load_workbook(manifest_path), manifest_path,
+                                                               self._usecols):
+                    manifestDataFrame = pd.concat([currentDataFrame, manifestDataFrame])
+
+        self._manifestDataFrame = _compact_dataframe(self._drop_pruned_rows(manifestDataFrame))
+        self._mark_stale(manifest_paths)
+        if self._sanitise_dataframe():
+            self._read_manifests(1)
+
     def create_manifest(self, manifest_dir):
         """
         Create a new manifest file.
@@ -77,12 +786,76 @@ class ManifestDataFrame(metaclass=Singleton):
             manifest_dir (str): The directory for the new manifest file.
         """
         self._manifestDataFrame[FILENAME_COLUMN] = ''
-        self._manifestDataFrame[FILE_LOCATION_COLUMN] = ''
         self._manifestDataFrame[MANIFEST_DIR_COLUMN] = manifest_dir
+        self._manifestDataFrame[MANIFEST_PATH_COLUMN] = _get_manifest_path(manifest_dir)
+        self._invalidate_indexes()
 
     def is_defined(self):
         return self._manifestDataFrame is not None
 
+    def get_cache(self):
+        return self._manifest_cache
+
+    def get_usecols(self):
+        return self._usecols
+
+    def get_manifest_paths(self):
+        """
+        Get the paths of the manifest files read into the manifest data frame.
+
+        Returns:
+            list: The sorted manifest file paths, as tagged on the rows and as last read or written.
+        """
+        manifest_paths = set(self._manifest_keys)
+        if self._manifestDataFrame is not None and MANIFEST_PATH_COLUMN in self._manifestDataFrame.columns:
+            manifest_paths.update(self._manifestDataFrame[MANIFEST_PATH_COLUMN].dropna().unique())
+        return sorted(manifest_paths)
+
+    def is_read_only(self):
+        return self._archive is not None
+
+    def get_load_times(self):
+        """
+        Get the time spent loading each manifest file when the manifest files were last read.
+
+        Returns:
+            list: Tuples of the manifest file path and the seconds spent loading it, slowest first.
+        """
+        return sorted(self._load_times.items(), key=lambda load_time: (-load_time[1], load_time[0]))
+
+    def get_load_errors(self):
+        """
+        Get the manifest files that could not be loaded when the manifest files were last read.
+
+        Returns:
+            list: Tuples of the manifest file path and the reason it could not be loaded, by path.
+        """
+        return sorted(self._load_errors.items())
+
+    def get_memory_usage(self):
+        """
+        Get the memory used by each column of the manifest data frame.
+
+        The file locations are counted as the file_location column once they
+        have been derived for the rows of any manifest file, see _get_segment_values.
+
+        Returns:
+            list: Tuples of the column name and the bytes it uses, largest first.
+        """
+        if self._manifestDataFrame is None:
+            return []
+
+        memory_usage = {str(column_name): int(nbytes) for column_name, nbytes in
+                        self._manifestDataFrame.memory_usage(index=True, deep=True).items()}
+        self._get_indexes()
+        file_locations = [location for segment_index in self._segment_indexes.values()
+                          for location in segment_index.get(('values', FILE_LOCATION_COLUMN), [])]
+        if file_locations:
+            memory_usage[FILE_LOCATION_COLUMN] = int(pd.Series(file_locations, dtype=object).memory_usage(index=False,
+                                                                                                          deep=True))
+
+        return sorted(memory_usage.items(), key=lambda column_usage: (-column_usage[1], column_usage[0]))
+
     def is_empty(self):
         return self._manifestDataFrame.empty
 
@@ -99,6 +872,9 @@ class ManifestDataFrame(metaclass=Singleton):
         Returns:
             None
         """
+        if self._archive is not None:
+            raise AnnotationDirectoryNoWriteAccess(f"Cannot write to the manifests in archive {self._dataset_dir}.")
+
         # List to keep track of checked directories to avoid duplicate checks
         checked_directories = []
 
@@ -127,28 +903,37 @@ class ManifestDataFrame(metaclass=Singleton):
                     bad_column_name = column_name
                 break
 
-        if bad_column_name:
-            manifests = [row[MANIFEST_DIR_COLUMN] for i, row in
+        if bad_column_name and self._archive is not None:
+            # The manifests in an archive can not be changed, the heading is only corrected in memory.
+            if sanitised_heading in column_names:
+                self._manifestDataFrame[sanitised_heading] = \
+                    self._manifestDataFrame[sanitised_heading].fillna(self._manifestDataFrame[bad_column_name])
+                self._manifestDataFrame.drop(columns=[bad_column_name], inplace=True)
+            else:
+                self._manifestDataFrame.rename(columns={bad_column_name: sanitised_heading}, inplace=True)
+            self._invalidate_indexes()
+        elif bad_column_name:
+            manifests = [row[MANIFEST_PATH_COLUMN] for i, row in
                          self._manifestDataFrame[self._manifestDataFrame[bad_column_name].notnull()].iterrows()]
             unique_manifests = list(set(manifests))
-            for manifest_dir in unique_manifests:
-                current_manifest = os.path.realpath(os.path.join(manifest_dir, MANIFEST_FILENAME))
-                mDF = pd.read_excel(current_manifest, dtype=str)
-                mDF.rename(columns={bad_column_name: sanitised_heading}, inplace=True)
-                mDF.to_excel(current_manifest, index=False, header=True)
+            for current_manifest in unique_manifests:
+                original_sheets = _parse_manifest_workbook(current_manifest)
+                sheets = {sheet_name: sheetDataFrame.rename(columns={bad_column_name: sanitised_heading})
+                          for sheet_name, sheetDataFrame in original_sheets.items()}
+                _write_manifest_workbook(current_manifest, sheets, original_sheets)
                 sanitised = True
 
             if not unique_manifests:
                 manifests_to_sanitise = []
-                for manifest_dir in self._manifestDataFrame[MANIFEST_DIR_COLUMN]:
-                    current_manifest = os.path.realpath(os.path.join(manifest_dir, MANIFEST_FILENAME))
+                for current_manifest in self._manifestDataFrame[MANIFEST_PATH_COLUMN]:
                     if current_manifest not in manifests_to_sanitise:
                         manifests_to_sanitise.append(current_manifest)
 
                 for manifest in manifests_to_sanitise:
-                    mDF = pd.read_excel(manifest, dtype=str)
-                    mDF.drop(columns=[bad_column_name], inplace=True)
-                    mDF.to_excel(manifest, index=False, header=True)
+                    original_sheets = _parse_manifest_workbook(manifest)
+                    sheets = {sheet_name: sheetDataFrame.drop(columns=[bad_column_name], errors='ignore')
+                              for sheet_name, sheetDataFrame in original_sheets.items()}
+                    _write_manifest_workbook(manifest, sheets, original_sheets)
 
                 self._manifestDataFrame.drop(columns=[bad_column_name])
                 sanitised = True
@@ -157,20 +942,237 @@ class ManifestDataFrame(metaclass=Singleton):
 
     def _sanitise_dataframe(self):
         column_names = self._manifestDataFrame.columns
-        sanitised = self._sanitise_column_heading(column_names, DERIVED_FROM_COLUMN)
-        sanitised = self._sanitise_column_heading(column_names, SOURCE_OF_COLUMN) or sanitised
-        sanitised = self._sanitise_column_heading(column_names, ANATOMICAL_ENTITY_COLUMN) or sanitised
+        sanitised = False
+        for sanitised_heading in SANITISED_COLUMNS:
+            sanitised = self._sanitise_column_heading(column_names, sanitised_heading) or sanitised
         return sanitised
 
     # region -----Get-----
+    def _get_identity_index(self):
+        """
+        Get the index of the files the manifest rows refer to, built once for the rows of each manifest file.
+
+        Returns:
+            tuple: A dict mapping the device and inode of each existing file, and a dict mapping each location,
+            to the positions of their rows, see _get_column_index.
+        """
+        indexes = self._get_indexes()
+        if 'identity' not in indexes:
+            indexes['identity'] = {}, {}
+            for segment in self._segments:
+                self._merge_segment_index(segment, 'identity')
+
+        return indexes['identity']
+
     def _get_matching_dataframe(self, file_location):
-        same_file = []
+        """
+        Get the manifest rows that refer to the same file as the given file location, see is_same_file.
+
+        The candidate rows are found from the identity index, the rows of the
+        existing files with the same device and inode as the file, or the rows
+        with the same location.  Only the candidates are checked with is_same_file.
+
+        Args:
+            file_location (str): The file location.
+
+        Returns:
+            DataFrame: The matching rows of the manifest data frame.
+        """
+        identity_index, location_index = self._get_identity_index()
+        try:
+            stat_result = os.stat(file_location)
+            candidates = [identity_index.get((stat_result.st_dev, stat_result.st_ino), {})]
+        except OSError:
+            candidates = []
+        # Files created since the index was built are found by their location.
+        candidates.append(location_index.get(file_location, {}))
+
+        same_file = set()
+        for segment_positions in candidates:
+            for segment, positions in segment_positions.items():
+                start = self._segments[segment][0]
+                locations = self._get_segment_values(segment, FILE_LOCATION_COLUMN)
+                same_file.update(start + position for position in positions
+                                 if is_same_file(file_location, locations[position]))
+        return self._manifestDataFrame.iloc[sorted(same_file)]
+
+    def _invalidate_indexes(self):
+        self._indexed_dataframe = None
+        self._stale_manifests = None
+
+    def _mark_stale(self, manifest_paths):
+        """
+        Record that only the rows of the given manifest files have changed since the indexes were built.
+
+        Args:
+            manifest_paths (iterable): The manifest file paths, see MANIFEST_PATH_COLUMN.
+        """
+        if self._stale_manifests is not None:
+            self._stale_manifests.update(manifest_paths)
+
+    def _get_indexes(self):
+        """
+        Get the indexes of the manifest data frame, bringing them up to date with it first.
+
+        After the rows of some manifest files have been patched, see _mark_stale,
+        the entries of the rows of those manifest files are replaced.  After any
+        other change to the manifest data frame the indexes are dropped.
+
+        Returns:
+            dict: The indexes, built as they are needed.
+        """
+        if self._indexed_dataframe is not self._manifestDataFrame:
+            segments = _find_segments(self._manifestDataFrame)
+            if self._indexed_dataframe is None or self._stale_manifests is None:
+                self._indexes = {}
+                self._segment_indexes = {}
+                self._segments = segments
+            else:
+                for segment in list(self._segment_indexes):
+                    if segment[0] in self._stale_manifests or segment not in segments or \
+                            segments[segment][1] - segments[segment][0] != \
+                            self._segments[segment][1] - self._segments[segment][0]:
+                        self._drop_segment_index(segment)
+                self._segments = segments
+                self._indexes = {key: index for key, index in self._indexes.items() if key != FILE_LOCATION_COLUMN}
+                for segment in segments:
+                    if segment not in self._segment_indexes:
+                        for key in self._indexes:
+                            self._merge_segment_index(segment, key)
+            self._indexed_dataframe = self._manifestDataFrame
+            self._stale_manifests = set()
+            self._lookups = {}
+
+        return self._indexes
+
+    def _get_segment_values(self, segment, column_heading):
+        """
+        Get the values of a column for the rows of a manifest file, see _find_segments.
+
+        Args:
+            segment (tuple): The segment of the manifest data frame holding the rows.
+            column_heading (str): The column, see _has_column.
+
+        Returns:
+            list: The value of the column in each row of the segment.
+        """
+        segment_index = self._segment_indexes.setdefault(segment, {})
+        key = ('values', column_heading)
+        if key not in segment_index:
+            start, end = self._segments[segment]
+            rows = self._manifestDataFrame.iloc[start:end]
+            if column_heading == FILE_LOCATION_COLUMN:
+                segment_index[key] = list(_get_file_locations(rows))
+            else:
+                segment_index[key] = list(rows[column_heading])
+
+        return segment_index[key]
+
+    def _get_segment_index(self, segment, key):
+        """
+        Get an index of the rows of a manifest file, built the first time it is needed.
 
-        for index, row in self._manifestDataFrame.iterrows():
-            location = os.path.join(row[MANIFEST_DIR_COLUMN], row[FILENAME_COLUMN])
-            same_file.append(is_same_file(file_location, location))
+        Args:
+            segment (tuple): The segment of the manifest data frame holding the rows, see _find_segments.
+            key: 'identity' for the identity index, or ('index', column_heading) for the index of a column.
+
+        Returns:
+            tuple: One or more dicts mapping a value to the list of the positions within the segment of the
+            rows holding it.
+        """
+        segment_index = self._segment_indexes.setdefault(segment, {})
+        if key not in segment_index:
+            if key == 'identity':
+                identity_index = {}
+                location_index = {}
+                for position, location in enumerate(self._get_segment_values(segment, FILE_LOCATION_COLUMN)):
+                    if location is None:
+                        continue
+                    location_index.setdefault(location, []).append(position)
+                    try:
+                        stat_result = os.stat(location)
+                    except OSError:
+                        continue
+                    identity_index.setdefault((stat_result.st_dev, stat_result.st_ino), []).append(position)
+                segment_index[key] = identity_index, location_index
+            else:
+                index = {}
+                if self._has_column(key[1]):
+                    for position, value in enumerate(self._get_segment_values(segment, key[1])):
+                        if not pd.isnull(value):
+                            index.setdefault(value, []).append(position)
+                segment_index[key] = (index,)
+
+        return segment_index[key]
+
+    def _merge_segment_index(self, segment, key):
+        if key == FILE_LOCATION_COLUMN:
+            return
+
+        for index, segment_index in zip(self._indexes[key], self._get_segment_index(segment, key)):
+            for value, positions in segment_index.items():
+                index.setdefault(value, {})[segment] = positions
+
+    def _drop_segment_index(self, segment):
+        segment_indexes = self._segment_indexes.pop(segment)
+        for key, indexes in self._indexes.items():
+            if key not in segment_indexes:
+                continue
+
+            for index, segment_index in zip(indexes, segment_indexes[key]):
+                for value in segment_index:
+                    segment_positions = index[value]
+                    del segment_positions[segment]
+                    if not segment_positions:
+                        del index[value]
+
+    def _has_column(self, column_heading):
+        column_names = self._manifestDataFrame.columns
+        if column_heading == FILE_LOCATION_COLUMN:
+            return MANIFEST_DIR_COLUMN in column_names and FILENAME_COLUMN in column_names
+
+        return column_heading in column_names
+
+    def _get_column(self, column_heading):
+        """
+        Get a column of the manifest data frame, deriving the file_location column the first time it is needed.
+
+        Args:
+            column_heading (str): The column to get, see _has_column.
+
+        Returns:
+            Series: The column, with the same index as the manifest data frame.
+        """
+        if column_heading != FILE_LOCATION_COLUMN:
+            return self._manifestDataFrame[column_heading]
+
+        indexes = self._get_indexes()
+        if FILE_LOCATION_COLUMN not in indexes:
+            file_locations = [location for segment in self._segments
+                              for location in self._get_segment_values(segment, FILE_LOCATION_COLUMN)]
+            indexes[FILE_LOCATION_COLUMN] = pd.Series(file_locations, index=self._manifestDataFrame.index, dtype=object)
+
+        return indexes[FILE_LOCATION_COLUMN]
+
+    def _get_column_index(self, column_heading):
+        """
+        Get the index of a column of the manifest data frame, built once for the rows of each manifest file.
 
-        return self._manifestDataFrame[same_file]
+        Args:
+            column_heading (str): The column to index.
+
+        Returns:
+            dict: Maps each value in the column to a dict mapping each segment of the manifest data frame
+            holding it, see _find_segments, to the list of the positions within the segment of the rows holding it.
+        """
+        indexes = self._get_indexes()
+        key = ('index', column_heading)
+        if key not in indexes:
+            indexes[key] = ({},)
+            for segment in self._segments:
+                self._merge_segment_index(segment, key)
+
+        return indexes[key][0]
 
     def get_matching_entry(self, column_heading, value, out_column_heading=FILENAME_COLUMN):
         """
@@ -187,9 +1189,15 @@ class ManifestDataFrame(metaclass=Singleton):
         matching_files = []
 
         # Check if the specified columns exist in the manifest DataFrame
-        if column_heading in self._manifestDataFrame.columns and out_column_heading in self._manifestDataFrame.columns:
-            condition = self._manifestDataFrame[column_heading] == value
-            matching_files = list(self._manifestDataFrame[out_column_heading][condition])
+        if self._has_column(column_heading) and self._has_column(out_column_heading):
+            try:
+                segment_positions = self._get_column_index(column_heading).get(value, {})
+            except TypeError:
+                # An unhashable value can not match any entry.
+                segment_positions = {}
+            for segment in sorted(segment_positions, key=lambda s: self._segments[s][0]):
+                out_values = self._get_segment_values(segment, out_column_heading)
+                matching_files.extend(out_values[position] for position in segment_positions[segment])
         return matching_files
 
     def get_entry_that_includes(self, column_heading, value, out_column_heading=FILENAME_COLUMN):
@@ -207,9 +1215,13 @@ class ManifestDataFrame(metaclass=Singleton):
         matching_files = []
 
         # Check if the specified columns exist in the manifest DataFrame
-        if column_heading in self._manifestDataFrame.columns and out_column_heading in self._manifestDataFrame.columns:
-            condition = self._manifestDataFrame[column_heading].str.contains(value, na=False, regex=False)
-            matching_files = list(self._manifestDataFrame[out_column_heading][condition])
+        if self._has_column(column_heading) and self._has_column(out_column_heading):
+            self._get_indexes()
+            key = (column_heading, value, out_column_heading)
+            if key not in self._lookups:
+                condition = self._get_column(column_heading).str.contains(value, na=False, regex=False)
+                self._lookups[key] = list(self._get_column(out_column_heading)[condition.to_numpy()])
+            matching_files = list(self._lookups[key])
         return matching_files
 
     def get_filepath_on_disk(self, file_location):
@@ -257,15 +1269,15 @@ class ManifestDataFrame(metaclass=Singleton):
             newRow = pd.DataFrame({FILENAME_COLUMN: file_name}, index=[1])
             # Check if there's manifest file under same Scaffold File Dir. If yes get data from it.
             # If no manifest file create new manifest file. Add file to the manifest.
+            manifest_path = _get_manifest_path(manifest_dir)
             if not manifestDataFrame[manifestDataFrame[MANIFEST_DIR_COLUMN] == manifest_dir].empty:
-                mDF = pd.read_excel(os.path.join(manifest_dir, MANIFEST_FILENAME), dtype=str)
+                mDF = self._read_sheet(manifest_path)
                 newRow = pd.concat([mDF, newRow], ignore_index=True)
 
-            manifest_absolute_path = os.path.realpath(os.path.join(manifest_dir, MANIFEST_FILENAME))
-            newRow.to_excel(manifest_absolute_path, index=False, header=True)
+            self._write_sheet(manifest_path, newRow)
 
-            # Re-read manifests to find dataframe for newly added entry.
-            self._read_manifests()
+            # Refresh manifests to find dataframe for newly added entry.
+            self._refresh()
             fileDF = self._get_matching_dataframe(file_location)
             # fileDF = newRow
         return fileDF
@@ -302,6 +1314,98 @@ class ManifestDataFrame(metaclass=Singleton):
         """
         self.update_column_content(file_location, ANATOMICAL_ENTITY_COLUMN, annotation_data)
 
+    def relocate_entry(self, file_location, new_location):
+        """
+        Carry the manifest entry of a moved file over to the file's new location.
+
+        If the new location is within the directory of the manifest holding the
+        entry only the filename of the entry is changed.  Otherwise the row is
+        moved to the manifest in the new location's directory, which is created if
+        it does not exist, and the derived from and source of references of the
+        row are rewritten relative to that directory.  Every reference in the
+        manifests to the moved file is rewritten to its new location.  The touched
+        manifest files are each written once.
+
+        Args:
+            file_location (str): The file location in the manifest.
+            new_location (str): The location the file has been moved to.
+        """
+        fileDF = self._get_matching_dataframe(file_location)
+        old_locations = {os.path.normpath(file_location)}
+        old_locations.update(os.path.normpath(os.path.join(row[MANIFEST_DIR_COLUMN], row[FILENAME_COLUMN]))
+                             for _, row in fileDF.iterrows())
+        referring_sheets = self._find_referring_sheets(old_locations)
+
+        with self.batch():
+            for index, row in fileDF.iterrows():
+                manifest_dir = row[MANIFEST_DIR_COLUMN]
+                manifest_path = row[MANIFEST_PATH_COLUMN]
+                mDF = self._read_sheet(manifest_path, row[SHEET_NAME_COLUMN])
+                matching_rows = mDF[FILENAME_COLUMN] == row[FILENAME_COLUMN]
+
+                relative_location = os.path.relpath(new_location, manifest_dir)
+                if not relative_location.startswith(os.pardir):
+                    mDF.loc[matching_rows, FILENAME_COLUMN] = _as_reference(new_location, manifest_dir)
+                    self._write_sheet(manifest_path, mDF, row[SHEET_NAME_COLUMN])
+                else:
+                    new_manifest_dir = os.path.dirname(new_location)
+                    movedDF = mDF[matching_rows].copy()
+                    movedDF[FILENAME_COLUMN] = os.path.basename(new_location)
+                    for column_name in [DERIVED_FROM_COLUMN, SOURCE_OF_COLUMN]:
+                        if column_name in movedDF.columns:
+                            movedDF[column_name] = movedDF[column_name].apply(_rewrite_references, args=(
+                                lambda reference: _as_reference(_get_reference_location(manifest_dir, reference),
+                                                                new_manifest_dir),))
+                    self._write_sheet(manifest_path, mDF[~matching_rows], row[SHEET_NAME_COLUMN])
+
+                    new_manifest_path = _get_manifest_path(new_manifest_dir)
+                    if self._is_manifest_file(new_manifest_path):
+                        movedDF = pd.concat([self._read_sheet(new_manifest_path), movedDF], ignore_index=True)
+                    self._write_sheet(new_manifest_path, movedDF)
+
+            for manifest_path, sheet_name, manifest_dir in referring_sheets:
+                def _relocate(reference):
+                    if _get_reference_location(manifest_dir, reference) in old_locations:
+                        return _as_reference(new_location, manifest_dir)
+                    return reference
+
+                mDF = self._read_sheet(manifest_path, sheet_name)
+                for column_name in [DERIVED_FROM_COLUMN, SOURCE_OF_COLUMN]:
+                    if column_name in mDF.columns:
+                        mDF[column_name] = mDF[column_name].apply(_rewrite_references, args=(_relocate,))
+                self._write_sheet(manifest_path, mDF, sheet_name)
+
+            self._refresh()
+
+    def _find_referring_sheets(self, locations):
+        """
+        Find the manifest sheets with derived from or source of references to any of the given locations.
+
+        Args:
+            locations (set): The normalised file locations.
+
+        Returns:
+            list: Tuples of the manifest path, sheet name and manifest directory of each sheet.
+        """
+        referring_sheets = []
+        for column_name in [DERIVED_FROM_COLUMN, SOURCE_OF_COLUMN]:
+            if not self._has_column(column_name):
+                continue
+
+            referringDataFrame = self._manifestDataFrame[self._manifestDataFrame[column_name].notnull()]
+            for manifest_path, sheet_name, manifest_dir, value in zip(referringDataFrame[MANIFEST_PATH_COLUMN],
+                                                                      referringDataFrame[SHEET_NAME_COLUMN],
+                                                                      referringDataFrame[MANIFEST_DIR_COLUMN],
+                                                                      referringDataFrame[column_name]):
+                if isinstance(value, str) and \
+                        any(_get_reference_location(manifest_dir, reference) in locations
+                            for reference in value.split("\n")):
+                    sheet = manifest_path, sheet_name, manifest_dir
+                    if sheet not in referring_sheets:
+                        referring_sheets.append(sheet)
+
+        return referring_sheets
+
     def update_column_content(self, file_location, column_name, content, append=False):
         """
         Update the content of a specified column for a given file location.
@@ -318,8 +1422,7 @@ class ManifestDataFrame(metaclass=Singleton):
         # Update the cells with row: file_location, column: column_name to content
         fileDF = self.get_file_dataframe(file_location)
         for index, row in fileDF.iterrows():
-            mDF = pd.read_excel(os.path.join(row[MANIFEST_DIR_COLUMN], MANIFEST_FILENAME),
-                                sheet_name=row[SHEET_NAME_COLUMN], dtype=str)
+            mDF = self._read_sheet(row[MANIFEST_PATH_COLUMN], row[SHEET_NAME_COLUMN])
 
             if content and os.path.isabs(content):
                 content = pathlib.PureWindowsPath(os.path.relpath(content, row[MANIFEST_DIR_COLUMN])).as_posix()
@@ -345,10 +1448,8 @@ class ManifestDataFrame(metaclass=Singleton):
                     content = ""
                 mDF.loc[mDF[FILENAME_COLUMN] == row[FILENAME_COLUMN], column_name] = content
 
-            manifest_absolute_path = os.path.realpath(os.path.join(row[MANIFEST_DIR_COLUMN], MANIFEST_FILENAME))
-            mDF.to_excel(manifest_absolute_path, sheet_name=row[SHEET_NAME_COLUMN],
-                         index=False, header=True)
+            self._write_sheet(row[MANIFEST_PATH_COLUMN], mDF, row[SHEET_NAME_COLUMN])
 
-        self._read_manifests()
+        self._refresh()
 
     # endregion
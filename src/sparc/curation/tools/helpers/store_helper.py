@@ -0,0 +1,320 @@
+import collections.abc
+import os
+import sys
+from array import array
+from pathlib import Path
+from types import MappingProxyType
+
+ROLE_FLAGS = {
+    'image': 1 << 0,
+    'metadata': 1 << 1,
+    'view': 1 << 2,
+    'context': 1 << 3,
+    'plot': 1 << 4,
+    'thumbnail': 1 << 5,
+    'plot_thumbnail': 1 << 6,
+    'alt_form': 1 << 7,
+}
+
+
+class PathListView(collections.abc.Sequence):
+    """
+    Read-only view of a list of paths held in a PathStore.
+
+    The path strings are only built the first time the view is read and are
+    then kept, as is the frozenset used to test membership.  A view compares
+    equal to a list or tuple holding the same paths, adding a view to a list or
+    another view gives a new list.
+    """
+
+    def __init__(self, store, path_ids):
+        self._store = store
+        self._path_ids = path_ids
+        self._paths = None
+        self._path_set = None
+
+    def _get_paths(self):
+        if self._paths is None:
+            self._paths = tuple(self._store.get_path(path_id) for path_id in self._path_ids)
+
+        return self._paths
+
+    def __len__(self):
+        return len(self._path_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._get_paths()[index])
+
+        return self._get_paths()[index]
+
+    def __iter__(self):
+        return iter(self._get_paths())
+
+    def __contains__(self, path):
+        return path in self.as_frozenset()
+
+    def __add__(self, other):
+        return list(self._get_paths()) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self._get_paths())
+
+    def __eq__(self, other):
+        if isinstance(other, (PathListView, list, tuple)):
+            return list(self._get_paths()) == list(other)
+
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self._get_paths()))
+
+    def as_frozenset(self):
+        """
+        Get the paths of the view as a frozenset.
+
+        Returns:
+            frozenset: The paths of the view.
+        """
+        if self._path_set is None:
+            self._path_set = frozenset(self._get_paths())
+
+        return self._path_set
+
+
+class PathStore(object):
+    """
+    Compact store of the classified files of a dataset.
+
+    Every path is interned once, relative to the root directory, and given an
+    integer ID.  The roles of each path are kept as a bitmask, see ROLE_FLAGS,
+    the view URLs of a metadata file by its ID, and each named list of paths is
+    an array of IDs.  A list kept in the order of a sort key can have paths
+    inserted and removed without being rebuilt.  Lists are handed out as
+    read-only PathListView objects that are built once per list.  A path
+    outside the root directory is held as it is given.
+    """
+
+    def __init__(self, root_dir):
+        """
+        Initialize the PathStore object.
+
+        Args:
+            root_dir (str): The directory the stored paths are within.
+        """
+        self._prefix = os.path.join(str(Path(root_dir)), '')
+        self._ids = {}
+        self._relative_paths = []
+        self._outside_ids = set()
+        self._roles = array('H')
+        self._view_urls = {}
+        self._lists = {}
+        self._views = {}
+
+    def __len__(self):
+        return len(self._relative_paths)
+
+    def intern(self, file_path):
+        """
+        Get the ID of a path, adding the path to the store if it is not already held.
+
+        Args:
+            file_path (str|Path): The path to intern.
+
+        Returns:
+            int: The ID of the path.
+        """
+        file_path = str(file_path)
+        inside = file_path.startswith(self._prefix)
+        relative_path = file_path[len(self._prefix):] if inside else file_path
+        path_id = self._ids.get(relative_path)
+        if path_id is None:
+            relative_path = sys.intern(relative_path)
+            path_id = len(self._relative_paths)
+            self._ids[relative_path] = path_id
+            self._relative_paths.append(relative_path)
+            self._roles.append(0)
+            if not inside:
+                self._outside_ids.add(path_id)
+
+        return path_id
+
+    def get_path(self, path_id):
+        if path_id in self._outside_ids:
+            return self._relative_paths[path_id]
+
+        return self._prefix + self._relative_paths[path_id]
+
+    def _get_id(self, file_path):
+        relative_path = str(file_path)
+        if relative_path.startswith(self._prefix):
+            relative_path = relative_path[len(self._prefix):]
+
+        return self._ids.get(relative_path)
+
+    def _bisect(self, path_ids, path_key, key):
+        low = 0
+        high = len(path_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if key(self.get_path(path_ids[middle])) < path_key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def set_list(self, name, file_paths, role=None):
+        """
+        Set a named list of paths, optionally adding a role to every path in it.
+
+        The role is taken from the paths that were in the list before.
+
+        Args:
+            name (str): The name of the list.
+            file_paths (iterable): The paths in the list.
+            role (str): Optional role from ROLE_FLAGS to add to the paths.
+        """
+        path_ids = array('L', (self.intern(file_path) for file_path in file_paths))
+        if role is not None:
+            flag = ROLE_FLAGS[role]
+            for path_id in self._lists.get(name, ()):
+                self._roles[path_id] &= ~flag
+            for path_id in path_ids:
+                self._roles[path_id] |= flag
+
+        self._lists[name] = path_ids
+        self._views.pop(name, None)
+
+    def add_to_list(self, name, file_path, role=None, key=None):
+        """
+        Add a path to a named list, optionally adding a role to the path.
+
+        Args:
+            name (str): The name of the list.
+            file_path (str|Path): The path to add.
+            role (str): Optional role from ROLE_FLAGS to add to the path.
+            key (callable): Optional sort key of the paths in the list, the path is inserted in order
+                if given and appended otherwise.
+        """
+        path_id = self.intern(file_path)
+        path_ids = self._lists.setdefault(name, array('L'))
+        if key is None:
+            path_ids.append(path_id)
+        else:
+            path_ids.insert(self._bisect(path_ids, key(self.get_path(path_id)), key), path_id)
+        if role is not None:
+            self._roles[path_id] |= ROLE_FLAGS[role]
+
+        self._views.pop(name, None)
+
+    def remove_from_list(self, name, low, high, key, role=None):
+        """
+        Remove the paths with a sort key from low up to, but not including, high from a named list.
+
+        Args:
+            name (str): The name of the list, kept in the order of the sort key.
+            low: The lowest sort key of the paths to remove.
+            high: The sort key above the paths to remove.
+            key (callable): The sort key of the paths in the list.
+            role (str): Optional role from ROLE_FLAGS to take from the removed paths.
+
+        Returns:
+            list: The removed paths.
+        """
+        path_ids = self._lists.get(name)
+        if not path_ids:
+            return []
+
+        start = self._bisect(path_ids, low, key)
+        end = self._bisect(path_ids, high, key)
+        if start == end:
+            return []
+
+        removed_ids = path_ids[start:end]
+        del path_ids[start:end]
+        if role is not None:
+            flag = ROLE_FLAGS[role]
+            for path_id in removed_ids:
+                self._roles[path_id] &= ~flag
+
+        self._views.pop(name, None)
+        return [self.get_path(path_id) for path_id in removed_ids]
+
+    def get_list(self, name):
+        """
+        Get a read-only view of a named list of paths.
+
+        Args:
+            name (str): The name of the list.
+
+        Returns:
+            PathListView: The paths in the list, empty if the list has not been set.
+        """
+        view = self._views.get(name)
+        if view is None:
+            view = PathListView(self, self._lists.get(name, array('L')))
+            self._views[name] = view
+
+        return view
+
+    def get_list_names(self, prefix=''):
+        return [name for name in self._lists if name.startswith(prefix)]
+
+    def get_lists_with_prefix(self, prefix):
+        """
+        Get read-only views of the named lists starting with the given prefix.
+
+        Args:
+            prefix (str): The prefix of the list names.
+
+        Returns:
+            MappingProxyType: Maps the rest of each list name after the prefix to a view of the list.
+        """
+        return MappingProxyType({name[len(prefix):]: self.get_list(name) for name in self.get_list_names(prefix)})
+
+    def set_view_urls(self, file_path, view_urls):
+        """
+        Set the view URLs of a metadata file, or remove them if view_urls is None.
+
+        Args:
+            file_path (str|Path): The path of the metadata file.
+            view_urls (list): The view URLs of the metadata file.
+        """
+        if view_urls is None:
+            path_id = self._get_id(file_path)
+            if path_id is not None:
+                self._view_urls.pop(path_id, None)
+        else:
+            self._view_urls[self.intern(file_path)] = tuple(view_urls)
+
+    def get_view_urls(self, file_path):
+        """
+        Get the view URLs of a metadata file.
+
+        Args:
+            file_path (str|Path): The path of the metadata file.
+
+        Returns:
+            tuple: The view URLs of the metadata file, empty if none are held.
+        """
+        return self._view_urls.get(self._get_id(file_path), ())
+
+    def get_roles(self, file_path):
+        """
+        Get the roles of a path.
+
+        Args:
+            file_path (str|Path): The path.
+
+        Returns:
+            frozenset: The names of the roles of the path, empty if the path is not in the store.
+        """
+        path_id = self._get_id(file_path)
+        if path_id is None:
+            return frozenset()
+
+        mask = self._roles[path_id]
+        return frozenset(role for role, flag in ROLE_FLAGS.items() if mask & flag)
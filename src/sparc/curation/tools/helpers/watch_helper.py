@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from sparc.curation.tools.definitions import CACHE_DIRNAME
+from sparc.curation.tools.helpers.cache_helper import file_cache_key
+from sparc.curation.tools.helpers.file_helper import list_dataset_dir
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+DEFAULT_POLL_INTERVAL = 1.0
+FULL_POLL_COUNT = 10
+SETTLE_INTERVAL = 0.2
+
+
+def _snapshot(dataset_dir, prune_rules, previous=None):
+    """
+    Take a snapshot of the files in the dataset directory, listing again only the directories that have changed.
+
+    A directory whose size, modification time and inode are the same as in the
+    previous snapshot has its files and sub-directories taken from the previous
+    snapshot without being listed or having its files stat'ed.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+        prune_rules (PruneRules): Optional rules for the files and directories to skip.
+        previous (dict): Optional previous snapshot, None to list every directory.
+
+    Returns:
+        tuple: The snapshot, mapping each directory path to its key, see file_cache_key, a dict mapping the path
+        of each of its files to the key of the file and the list of its sub-directory paths, and the set of the
+        paths of the files added, changed or removed in the directories listed again.
+    """
+    root_dir = str(Path(dataset_dir))
+    previous = {} if previous is None else previous
+    snapshot = {}
+    changed_paths = set()
+    pending_dirs = [root_dir]
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        try:
+            dir_key = file_cache_key(os.stat(current_dir))
+        except OSError:
+            continue
+
+        previous_dir = previous.get(current_dir)
+        if previous_dir is not None and previous_dir[0] == dir_key:
+            snapshot[current_dir] = previous_dir
+        else:
+            entries, sub_dirs = list_dataset_dir(current_dir, root_dir, prune_rules)
+            files = {}
+            for entry in entries:
+                try:
+                    files[entry.path] = file_cache_key(entry.stat())
+                except OSError:
+                    pass
+            snapshot[current_dir] = dir_key, files, sub_dirs
+            previous_files = {} if previous_dir is None else previous_dir[1]
+            changed_paths.update(path for path, key in files.items() if previous_files.get(path) != key)
+            changed_paths.update(path for path in previous_files if path not in files)
+
+        pending_dirs.extend(reversed(snapshot[current_dir][2]))
+
+    for current_dir, (_, files, _) in previous.items():
+        if current_dir not in snapshot:
+            changed_paths.update(files)
+
+    return snapshot, changed_paths
+
+
+def _get_changed_files(previous, snapshot):
+    previous_files = {path: key for _, files, _ in previous.values() for path, key in files.items()}
+    files = {path: key for _, files, _ in snapshot.values() for path, key in files.items()}
+    changed_paths = {path for path, key in files.items() if previous_files.get(path) != key}
+    changed_paths.update(path for path in previous_files if path not in files)
+    return changed_paths
+
+
+class _ChangeCollector(FileSystemEventHandler):
+
+    def __init__(self):
+        super(_ChangeCollector, self).__init__()
+        self._lock = threading.Lock()
+        self._changed_paths = set()
+
+    def on_any_event(self, event):
+        # A directory is modified whenever a file in it is, the file has its own event.
+        if event.is_directory and event.event_type == 'modified':
+            return
+
+        with self._lock:
+            self._changed_paths.add(event.src_path)
+            dest_path = getattr(event, 'dest_path', '')
+            if dest_path:
+                self._changed_paths.add(dest_path)
+
+    def take(self):
+        with self._lock:
+            changed_paths = self._changed_paths
+            self._changed_paths = set()
+
+        return changed_paths
+
+
+class DatasetWatcher(object):
+    """
+    Watch a dataset directory for changes to its files.
+
+    The watchdog package is used to follow the changes with the platform's
+    file system notifications (inotify on Linux) when it is installed.  Otherwise
+    the dataset is polled.  Each poll stats every directory, but only the
+    directories whose size, modification time or inode have changed are listed
+    again and have the size, modification time and inode of their files compared
+    with the previous poll.  A file rewritten in place does not change its
+    directory, so every FULL_POLL_COUNT polls every file is compared.
+    """
+
+    def __init__(self, dataset_dir, interval=DEFAULT_POLL_INTERVAL, use_notifications=True, prune_rules=None):
+        """
+        Initialize the DatasetWatcher object.
+
+        Args:
+            dataset_dir (str): The dataset directory path.
+            interval (float): The time in seconds between checks for changes.
+            use_notifications (bool): Use file system notifications if they are available.
+            prune_rules (PruneRules): Optional rules for the files and directories that are not watched.
+        """
+        self._dataset_dir = str(Path(dataset_dir))
+        self._interval = interval
+        self._use_notifications = use_notifications and Observer is not None
+        self._observer = None
+        self._collector = None
+        self._snapshot = None
+        self._poll_count = 0
+        self._prune_rules = prune_rules
+
+    def uses_notifications(self):
+        return self._use_notifications
+
+    def start(self):
+        if self._use_notifications:
+            self._collector = _ChangeCollector()
+            self._observer = Observer()
+            self._observer.schedule(self._collector, self._dataset_dir, recursive=True)
+            self._observer.start()
+        else:
+            self._snapshot = _snapshot(self._dataset_dir, self._prune_rules)[0]
+            self._poll_count = 0
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def get_changes(self):
+        """
+        Get the paths that have changed since the last call.
+
+        Returns:
+            list: Sorted list of the changed file and directory paths.
+        """
+        if self._use_notifications:
+            changed_paths = self._collector.take()
+        else:
+            self._poll_count += 1
+            if self._poll_count % FULL_POLL_COUNT:
+                self._snapshot, changed_paths = _snapshot(self._dataset_dir, self._prune_rules, self._snapshot)
+            else:
+                snapshot = _snapshot(self._dataset_dir, self._prune_rules)[0]
+                changed_paths = _get_changed_files(self._snapshot, snapshot)
+                self._snapshot = snapshot
+
+        return sorted(path for path in changed_paths if not self._is_ignored(path))
+
+    def _is_ignored(self, path):
+        relative_path = os.path.relpath(path, self._dataset_dir)
+        if CACHE_DIRNAME in relative_path.split(os.sep):
+            return True
+
+        return self._prune_rules is not None and self._prune_rules.is_path_pruned(relative_path, os.path.isdir(path))
+
+    def wait_for_changes(self):
+        """
+        Block until some paths in the dataset have changed.
+
+        When following notifications, once a change is seen changes are collected
+        until the dataset has settled so that a burst of writes is reported together.
+
+        Returns:
+            list: Sorted list of the changed file and directory paths.
+        """
+        changed_paths = []
+        while not changed_paths:
+            time.sleep(self._interval)
+            changed_paths = self.get_changes()
+
+        while self._use_notifications:
+            time.sleep(SETTLE_INTERVAL)
+            more_changed_paths = self.get_changes()
+            if not more_changed_paths:
+                break
+            changed_paths = sorted(set(changed_paths).union(more_changed_paths))
+
+        return changed_paths
@@ -0,0 +1,186 @@
+import difflib
+import os
+import shutil
+import tempfile
+
+import openpyxl
+import pandas as pd
+
+
+def write_atomically(file_path, write):
+    """
+    Write a file by way of a temporary file in the same directory that then replaces it.
+
+    A reader never sees a partly written file and the file is left as it was
+    if the write fails.  The permissions of the replaced file are kept.
+
+    Args:
+        file_path (str): The path to the file.
+        write (function): Function writing the content of the file to the path it is given.
+    """
+    directory, file_name = os.path.split(file_path)
+    fd, temp_path = tempfile.mkstemp(dir=directory or None, prefix=f".{file_name}.",
+                                     suffix=os.path.splitext(file_name)[1])
+    os.close(fd)
+    try:
+        write(temp_path)
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temp_path)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _is_blank(value):
+    return value is None or value == ''
+
+
+def _find_sheet_extent(worksheet):
+    """
+    Find the extent of a worksheet as pandas reads it.
+
+    Pandas reads the first row as the header and every row after it up to the
+    last filled row as data, and the sheet is as wide as the rightmost filled
+    cell of any row.
+
+    Args:
+        worksheet (Worksheet): The worksheet.
+
+    Returns:
+        tuple: The number of data rows and the number of columns.
+    """
+    last_row = 1
+    width = 0
+    for row in worksheet.iter_rows():
+        filled_columns = [cell.column for cell in row if not _is_blank(cell.value)]
+        if filled_columns:
+            last_row = row[0].row
+            width = max(width, filled_columns[-1])
+
+    return last_row - 1, width
+
+
+def _get_rows(sheetDataFrame, columns):
+    values = sheetDataFrame.reindex(columns=columns)
+    return [tuple(None if pd.isnull(value) or value == '' else str(value) for value in row)
+            for row in values.itertuples(index=False, name=None)]
+
+
+def _write_worksheet(worksheet, sheetDataFrame):
+    worksheet.delete_rows(1, worksheet.max_row)
+    columns = list(sheetDataFrame.columns)
+    for column_number, column_name in enumerate(columns, start=1):
+        worksheet.cell(row=1, column=column_number, value=column_name)
+    for row_number, row in enumerate(_get_rows(sheetDataFrame, columns), start=2):
+        for column_number, value in enumerate(row, start=1):
+            if value is not None:
+                worksheet.cell(row=row_number, column=column_number, value=value)
+
+
+def _patch_worksheet(worksheet, originalDataFrame, sheetDataFrame):
+    """
+    Patch a worksheet from its original content to the given content.
+
+    The rows of the original and new content are matched up, the cells of
+    matched rows that differ are written and unmatched rows are inserted or
+    deleted.  A column renamed in place has its heading rewritten, other new
+    columns are added after the last column and columns no longer present are
+    deleted.
+
+    Args:
+        worksheet (Worksheet): The worksheet.
+        originalDataFrame (DataFrame): The content of the worksheet as pandas read it.
+        sheetDataFrame (DataFrame): The new content of the worksheet.
+
+    Returns:
+        bool: False if the worksheet does not hold the original content, in which case it is not changed.
+    """
+    row_count, width = _find_sheet_extent(worksheet)
+    if width != len(originalDataFrame.columns) or row_count != len(originalDataFrame):
+        return False
+
+    original_columns = list(originalDataFrame.columns)
+    columns = list(sheetDataFrame.columns)
+    column_numbers = {column_name: column_number for column_number, column_name in enumerate(original_columns, start=1)}
+    renamed_columns = {}
+    for index, column_name in enumerate(columns):
+        if column_name in column_numbers:
+            continue
+
+        if index < len(original_columns) and original_columns[index] not in columns:
+            renamed_columns[original_columns[index]] = column_name
+            column_number = index + 1
+        else:
+            width += 1
+            column_number = width
+        column_numbers[column_name] = column_number
+        worksheet.cell(row=1, column=column_number, value=column_name)
+
+    original_rows = _get_rows(originalDataFrame.rename(columns=renamed_columns), columns)
+    rows = _get_rows(sheetDataFrame, columns)
+    matcher = difflib.SequenceMatcher(None, original_rows, rows, autojunk=False)
+    # Data row i is worksheet row i + 2.  Working from the bottom up leaves the
+    # row numbers of the rows above unchanged.
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == 'equal':
+            continue
+
+        common = min(i2 - i1, j2 - j1)
+        for offset in range(common):
+            for column_name, original_value, value in zip(columns, original_rows[i1 + offset], rows[j1 + offset]):
+                if original_value != value:
+                    # Worksheet.cell ignores a value of None, so the value is set on the cell.
+                    worksheet.cell(row=i1 + offset + 2, column=column_numbers[column_name]).value = value
+        if i2 - i1 > common:
+            worksheet.delete_rows(i1 + common + 2, i2 - i1 - common)
+
+        inserted_rows = rows[j1 + common:j2]
+        if inserted_rows:
+            row_number = i1 + common + 2
+            if i1 + common < row_count:
+                worksheet.insert_rows(row_number, len(inserted_rows))
+            for offset, row in enumerate(inserted_rows):
+                for column_name, value in zip(columns, row):
+                    if value is not None:
+                        worksheet.cell(row=row_number + offset, column=column_numbers[column_name], value=value)
+
+    kept_column_numbers = {column_numbers[column_name] for column_name in columns}
+    for column_number in range(len(original_columns), 0, -1):
+        if column_number not in kept_column_numbers:
+            worksheet.delete_cols(column_number)
+
+    return True
+
+
+def patch_workbook(workbook_path, sheets, original_sheets):
+    """
+    Patch the sheets of a workbook to hold the given content, and save it atomically.
+
+    Only the cells that differ from the original content are written, so the
+    formatting and layout of the workbook and any sheets not given are kept.  A
+    sheet that does not hold its original content, as when the workbook has
+    been changed since it was read, is written in full.
+
+    Args:
+        workbook_path (str): The path to the workbook.
+        sheets (dict): Maps each sheet name to the data frame of the new content of the sheet.
+        original_sheets (dict): Maps each sheet name to the data frame of the sheet as it was read.
+    """
+    workbook = openpyxl.load_workbook(workbook_path)
+    for sheet_name, sheetDataFrame in sheets.items():
+        if sheet_name not in workbook.sheetnames:
+            _write_worksheet(workbook.create_sheet(sheet_name), sheetDataFrame)
+            continue
+
+        originalDataFrame = original_sheets.get(sheet_name)
+        if originalDataFrame is None or \
+                not _patch_worksheet(workbook[sheet_name], originalDataFrame, sheetDataFrame):
+            _write_worksheet(workbook[sheet_name], sheetDataFrame)
+
+    write_atomically(workbook_path, workbook.save)
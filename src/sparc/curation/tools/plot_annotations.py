@@ -3,10 +3,13 @@ import re
 import argparse
 import json
 
-from sparc.curation.tools.definitions import FILE_LOCATION_COLUMN
+from sparc.curation.tools.definitions import FILE_LOCATION_COLUMN, IGNORE_FILENAME
 from sparc.curation.tools.helpers.manifest_helper import ManifestDataFrame
-from sparc.curation.tools.helpers.file_helper import OnDiskFiles
-from sparc.curation.tools.utilities import convert_to_bytes
+from sparc.curation.tools.helpers.archive_helper import is_dataset_archive
+from sparc.curation.tools.helpers.cache_helper import ManifestCache, ScanCache, get_cache_dir
+from sparc.curation.tools.helpers.file_helper import OnDiskFiles, PruneRules, ScanTimings, SHARD_STRATEGIES
+from sparc.curation.tools.utilities import EXECUTOR_KINDS, convert_to_bytes, convert_to_jobs, create_executor, \
+    print_scan_timings, print_manifest_load_errors, print_manifest_load_times, print_manifest_memory_usage
 
 import sparc.curation.tools.plot_utilities as plot_utilities
 
@@ -39,10 +42,11 @@ def flatten_nested_list(nested_list):
 
 
 def annotate_plot_from_plot_paths(plot_paths):
-    for plot_path in plot_paths:
-        plot = plot_utilities.create_plot_from_plot_path(plot_path)
-        if plot:
-            annotate_one_plot(plot)
+    with ManifestDataFrame().batch():
+        for plot_path in plot_paths:
+            plot = plot_utilities.create_plot_from_plot_path(plot_path)
+            if plot:
+                annotate_one_plot(plot)
 
 
 def annotate_one_plot(plot):
@@ -183,12 +187,51 @@ def main():
     parser.add_argument("-d", "--delimiter", help="The type of delimiter used, must be one of; " + ", ".join(
         AVAILABLE_DELIMITERS) + ". Default is comma.",
                         default='comma', choices=AVAILABLE_DELIMITERS)
+    parser.add_argument("-j", "--jobs", help="Set the number of workers used to classify the dataset files and parse "
+                                             "the manifest files. Default is 1.",
+                        default=1, type=convert_to_jobs)
+    parser.add_argument("--executor", help="Use worker processes or threads for the jobs. Threads suit datasets "
+                                           "on slow or network storage. Default is process.",
+                        default='process', choices=EXECUTOR_KINDS)
+    parser.add_argument("-c", "--cache", help="Cache the classification of the dataset files and the parsed manifest "
+                                              "files, so that only files changed since the last run are re-examined.",
+                        action='store_true')
+    parser.add_argument("-e", "--exclude", help="Skip files and directories matching the pattern, as in a "
+                                                f"{IGNORE_FILENAME} file. Can be used multiple times.",
+                        default=[], action='append')
+    parser.add_argument("-s", "--shard", help="Split the dataset into shards that are scanned by separate processes, "
+                                              "one shard per top-level directory ('subdir') or one shard per job "
+                                              "by a hash of the second-level directories ('hash').",
+                        choices=SHARD_STRATEGIES)
+    parser.add_argument("-t", "--timings", help="Report the time spent scanning each directory of the dataset "
+                                                "and loading each manifest file, and the memory used by "
+                                                "the manifests.", action='store_true')
 
     args = parser.parse_args()
     dataset_dir = args.dataset_dir
+    if is_dataset_archive(dataset_dir):
+        parser.error("argument dataset_dir: plots can not be annotated in a dataset archive, archives are read-only.")
     max_size = convert_to_bytes('3000MiB')
-    OnDiskFiles().setup_dataset(dataset_dir, max_size)
-    ManifestDataFrame().setup_dataframe(dataset_dir)
+    executor = create_executor(args.jobs, args.executor)
+    cache = ScanCache(get_cache_dir(dataset_dir)) if args.cache else None
+    manifest_cache = ManifestCache(get_cache_dir(dataset_dir)) if args.cache else None
+    prune_rules = PruneRules.from_dataset(dataset_dir, args.exclude)
+    timings = ScanTimings() if args.timings else None
+    try:
+        OnDiskFiles().setup_dataset(dataset_dir, max_size, executor, cache, prune_rules=prune_rules, timings=timings,
+                                    shard_strategy=args.shard, shard_count=args.jobs)
+        if timings is not None:
+            print_scan_timings(timings.get_subtree_timings(dataset_dir))
+        ManifestDataFrame().setup_dataframe(dataset_dir, manifest_cache, executor, prune_rules=prune_rules)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if cache is not None:
+            cache.close()
+    print_manifest_load_errors(ManifestDataFrame().get_load_errors())
+    if args.timings:
+        print_manifest_load_times(ManifestDataFrame().get_load_times())
+        print_manifest_memory_usage(ManifestDataFrame().get_memory_usage())
     annotate_plot_from_plot_paths(get_all_plots_path())
 
 
@@ -1,9 +1,14 @@
+import codecs
 import os
 import plotly.express as px
 import pandas as pd
 
 from sparc.curation.tools.models.plot import Plot
 
+EIT_START_MARKER = "EIT STARTING"
+EIT_FINISH_MARKER = "+Fin"
+TXT_SNIFF_SIZE = 8192
+
 
 def create_plot_from_plot_path(file_path):
     if file_path.endswith('.csv'):
@@ -36,7 +41,7 @@ def generate_dataframe_from_txt(file_path):
 
     with open(file_path) as f:
         for line in f:
-            if "+Fin" in line:
+            if EIT_FINISH_MARKER in line:
                 finish = True
             elif start and not finish:
                 line_data_list = line.split()
@@ -49,7 +54,7 @@ def generate_dataframe_from_txt(file_path):
                     line_data_list += clean_data
                     csv_rows.append(line_data_list)
             else:
-                if "EIT STARTING" in line:
+                if EIT_START_MARKER in line:
                     start = True
 
     if csv_rows:
@@ -61,6 +66,57 @@ def generate_dataframe_from_txt(file_path):
         return df
 
 
+def sniff_txt_plot(file_path, sniff_size=TXT_SNIFF_SIZE, opener=None):
+    """
+    Decide from the start of a text file whether it could be a plot.
+
+    Only the first sniff_size bytes are read, the file is fully parsed with
+    generate_dataframe_from_txt when the plot is created.  A file is taken to
+    be an EIT export if the EIT start marker appears in the prefix.  Otherwise
+    it is a tabular plot candidate if its first row has more than one tab
+    separated column, no later row has more columns and there is more than one row.
+
+    Args:
+        file_path (str): The path to the text file.
+        sniff_size (int): The number of bytes to read from the start of the file.
+        opener (function): Optional function opening the file for binary reading, used in place of open.
+
+    Returns:
+        str: 'eit' for an EIT export, 'tabular' for a tab separated plot candidate or None if the file is not a plot.
+    """
+    with open(file_path, 'rb') if opener is None else opener(file_path) as f:
+        data = f.read(sniff_size + 1)
+
+    truncated = len(data) > sniff_size
+    try:
+        text = codecs.getincrementaldecoder('utf-8')().decode(data[:sniff_size], final=not truncated)
+    except UnicodeDecodeError:
+        return None
+
+    if EIT_START_MARKER in text:
+        return 'eit'
+
+    lines = text.splitlines()
+    if truncated:
+        # The last line may continue past the prefix, only its first column count is known.
+        complete_rows = [line for line in lines[:-1] if line]
+        rows = complete_rows if complete_rows else lines[-1:]
+    else:
+        rows = [line for line in lines if line]
+
+    if not rows:
+        return None
+
+    column_count = len(rows[0].split('\t'))
+    if column_count < 2 or any(len(row.split('\t')) > column_count for row in rows[1:]):
+        return None
+
+    if len(rows) < 2 and not truncated:
+        return None
+
+    return 'tabular'
+
+
 def get_plot(plot, plot_df):
     # if plot_df only has one cell or has null, not valid
     if plot_df is None or plot_df.empty or plot_df.size == 1:
@@ -1,26 +1,35 @@
 import argparse
 import os
+from pathlib import Path
 
-from sparc.curation.tools.definitions import FILE_LOCATION_COLUMN
+from sparc.curation.tools.definitions import FILE_LOCATION_COLUMN, IGNORE_FILENAME, MANIFEST_FILENAMES, \
+    MANIFEST_VALIDATION_COLUMNS
+from sparc.curation.tools.helpers.archive_helper import is_dataset_archive
 from sparc.curation.tools.helpers.error_helper import ErrorManager, fix_error
-from sparc.curation.tools.helpers.file_helper import OnDiskFiles
+from sparc.curation.tools.helpers.cache_helper import ManifestCache, ScanCache, get_cache_dir
+from sparc.curation.tools.helpers.file_helper import OnDiskFiles, PruneRules, ScanTimings, SHARD_STRATEGIES
+from sparc.curation.tools.helpers.fingerprint_helper import FingerprintIndex
 from sparc.curation.tools.helpers.manifest_helper import ManifestDataFrame
-from sparc.curation.tools.utilities import convert_to_bytes
+from sparc.curation.tools.helpers.watch_helper import DatasetWatcher
+from sparc.curation.tools.utilities import EXECUTOR_KINDS, convert_to_bytes, convert_to_jobs, create_executor, \
+    print_scan_timings, print_manifest_load_errors, print_manifest_load_times, print_manifest_memory_usage
 
 
-def setup_data(dataset_dir, max_size):
+def setup_data(dataset_dir, max_size, executor=None):
     """
     Sets up the dataset by retrieving data from the on-disk files and initializing the manifest dataframe.
 
     Args:
         dataset_dir (str): The directory path where the dataset will be set up.
         max_size (str): The maximum size that the dataset should occupy.
+        executor (concurrent.futures.Executor): Optional executor to classify the on-disk files and parse the
+            manifest files with.
 
     Returns:
         None
     """
-    OnDiskFiles().setup_dataset(dataset_dir, convert_to_bytes(max_size))
-    ManifestDataFrame().setup_dataframe(dataset_dir)
+    OnDiskFiles().setup_dataset(dataset_dir, convert_to_bytes(max_size), executor)
+    ManifestDataFrame().setup_dataframe(dataset_dir, executor=executor)
 
 
 # OnDisk section
@@ -124,8 +133,13 @@ def check_additional_types_annotations():
         list: A list of errors related to additional types annotations.
     """
     errors = []
-    errors += ErrorManager().get_missing_annotations()
-    errors += ErrorManager().get_incorrect_annotations()
+    moved_errors = ErrorManager().get_moved_files()
+    # A moved file is reported once, rather than as an unannotated file and an incorrect annotation.
+    moved_locations = {error.get_location() for error in moved_errors}
+    moved_targets = {error.get_target() for error in moved_errors}
+    errors += moved_errors
+    errors += [error for error in ErrorManager().get_missing_annotations() if error.get_location() not in moved_targets]
+    errors += [error for error in ErrorManager().get_incorrect_annotations() if error.get_location() not in moved_locations]
     return errors
 
 
@@ -199,48 +213,188 @@ def get_confirmation_message(error=None):
 def fix_errors(errors):
     failed = False
     index = 0
-    while not failed and len(errors) > 0:
-        current_error = errors[index]
+    # The manifest files are written once, after all the fixes have been made.
+    with ManifestDataFrame().batch():
+        while not failed and len(errors) > 0:
+            current_error = errors[index]
 
-        fix_error(current_error)
+            fix_error(current_error)
 
-        new_errors = get_errors()
-        old_errors = errors[:]
-        errors = new_errors
+            new_errors = get_errors()
+            old_errors = errors[:]
+            errors = new_errors
 
-        if old_errors == new_errors:
-            index += 1
-            if index == len(errors):
-                failed = True
-        else:
-            index = 0
+            if old_errors == new_errors:
+                index += 1
+                if index == len(errors):
+                    failed = True
+            else:
+                index = 0
 
     return not failed
 
 
+def update_fingerprints(fingerprint_index, executor=None):
+    """
+    Update the fingerprint index with the on-disk files whose annotations can be relocated.
+
+    Args:
+        fingerprint_index (FingerprintIndex): The fingerprint index to update.
+        executor (concurrent.futures.Executor): Optional executor to compute the fingerprints with.
+
+    Returns:
+        None
+    """
+    on_disk = OnDiskFiles()
+    file_paths = on_disk.get_metadata_files() + on_disk.get_view_files() + on_disk.get_thumbnail_files()
+    for alt_form_files in on_disk.get_alt_forms_files().values():
+        file_paths += alt_form_files
+    fingerprint_index.update(file_paths, executor)
+
+
+def update_data(changed_paths):
+    """
+    Update the on-disk files and the manifest dataframe after the given paths have changed.
+
+    Args:
+        changed_paths (list): List of the file and directory paths that have changed.
+
+    Returns:
+        None
+    """
+    OnDiskFiles().update_files(changed_paths)
+    fingerprint_index = ErrorManager().get_fingerprint_index()
+    if fingerprint_index is not None:
+        update_fingerprints(fingerprint_index)
+
+    manifest_paths = []
+    known_manifest_paths = None
+    for p in changed_paths:
+        if os.path.basename(p) in MANIFEST_FILENAMES:
+            manifest_paths.append(p)
+        elif os.path.isdir(p):
+            # A directory has been added or moved here, it may hold manifest files.
+            manifest_paths.extend(str(r) for r in Path(p).rglob('manifest.*')
+                                  if r.name in MANIFEST_FILENAMES and r.is_file())
+        elif not os.path.exists(p):
+            # Only a removed directory that held manifest files changes the manifests, any other removed
+            # path, such as an editor's lock file or the source of a moved file, is ignored.
+            if known_manifest_paths is None:
+                known_manifest_paths = ManifestDataFrame().get_manifest_paths()
+            manifest_paths.extend(manifest_path for manifest_path in known_manifest_paths
+                                  if manifest_path.startswith(os.path.join(p, '')))
+
+    if manifest_paths:
+        ManifestDataFrame().update_manifests(list(dict.fromkeys(manifest_paths)))
+
+
+def watch_dataset(dataset_dir, prune_rules=None):
+    """
+    Watch the dataset for changes, reporting the errors again after each change.
+
+    Runs until interrupted.
+
+    Args:
+        dataset_dir (str): The dataset directory path.
+        prune_rules (PruneRules): Optional rules for the files and directories that are not watched.
+
+    Returns:
+        None
+    """
+    watcher = DatasetWatcher(dataset_dir, prune_rules=prune_rules)
+    watcher.start()
+    try:
+        while True:
+            changed_paths = watcher.wait_for_changes()
+            update_data(changed_paths)
+            print(f"--- {len(changed_paths)} change(s) detected ---")
+            for error in get_errors():
+                print(error.get_error_message())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+
+
 def main():
     parser = argparse.ArgumentParser(description='Check scaffold annotations for a SPARC dataset.')
-    parser.add_argument("dataset_dir", help='directory to check.')
+    parser.add_argument("dataset_dir", help='directory, or zip or tar archive, to check.')
     parser.add_argument("-m", "--max-size", help="Set the max size for metadata file. Default is 2MiB", default='2MiB',
                         type=convert_to_bytes)
     parser.add_argument("-r", "--report", help="Report any errors that were found.", action='store_true')
     parser.add_argument("-f", "--fix", help="Fix any errors that were found.", action='store_true')
+    parser.add_argument("-j", "--jobs", help="Set the number of workers used to classify the dataset files and parse "
+                                             "the manifest files. Default is 1.",
+                        default=1, type=convert_to_jobs)
+    parser.add_argument("--executor", help="Use worker processes or threads for the jobs. Threads suit datasets "
+                                           "on slow or network storage. Default is process.",
+                        default='process', choices=EXECUTOR_KINDS)
+    parser.add_argument("-c", "--cache", help="Cache the classification of the dataset files and the parsed manifest "
+                                              "files, so that only files changed since the last run are re-examined.",
+                        action='store_true')
+    parser.add_argument("-e", "--exclude", help="Skip files and directories matching the pattern, as in a "
+                                                f"{IGNORE_FILENAME} file. Can be used multiple times.",
+                        default=[], action='append')
+    parser.add_argument("-s", "--shard", help="Split the dataset into shards that are scanned by separate processes, "
+                                              "one shard per top-level directory ('subdir') or one shard per job "
+                                              "by a hash of the second-level directories ('hash').",
+                        choices=SHARD_STRATEGIES)
+    parser.add_argument("-t", "--timings", help="Report the time spent scanning each directory of the dataset "
+                                                "and loading each manifest file, and the memory used by "
+                                                "the manifests.", action='store_true')
+    parser.add_argument("-w", "--watch", help="Keep watching the dataset for changes and report the errors again "
+                                              "after each change. Without the watchdog package the dataset is "
+                                              "polled, only directories that changed are listed again.",
+                        action='store_true')
+    parser.add_argument("-p", "--fingerprints", help="Keep an index of the content fingerprints of the annotated "
+                                                     "files, so that a file moved since the last run is recognised "
+                                                     "and its annotation can be relocated.", action='store_true')
+    parser.add_argument("-u", "--usecols", help="Only keep the manifest columns needed to check the annotations in "
+                                                "memory, to use less memory with large manifests.", action='store_true')
 
     args = parser.parse_args()
     dataset_dir = args.dataset_dir
     max_size = args.max_size
+    if is_dataset_archive(dataset_dir):
+        for option, given in [("-f/--fix", args.fix), ("-c/--cache", args.cache), ("-w/--watch", args.watch),
+                              ("-p/--fingerprints", args.fingerprints)]:
+            if given:
+                parser.error(f"argument {option}: not allowed with a dataset archive, archives are read-only.")
 
     # Step 1: Look at all the files in the dataset
     #   - Try to find files that I think are scaffold metadata files.
     #   - Try to find files that I think are scaffold view files.
     #   - Try ...
-    OnDiskFiles().setup_dataset(dataset_dir, max_size)
-
-    # Step 2: Read all the manifest files in the dataset
-    #   - Get all the files annotated as scaffold metadata files.
-    #   - Get all the files annotated as scaffold view files.
-    #   - Get all the files annotated as scaffold view thumbnails.
-    ManifestDataFrame().setup_dataframe(dataset_dir)
+    executor = create_executor(args.jobs, args.executor)
+    cache = ScanCache(get_cache_dir(dataset_dir)) if args.cache else None
+    manifest_cache = ManifestCache(get_cache_dir(dataset_dir)) if args.cache else None
+    prune_rules = PruneRules.from_dataset(dataset_dir, args.exclude)
+    timings = ScanTimings() if args.timings else None
+    fingerprint_index = FingerprintIndex(get_cache_dir(dataset_dir)) if args.fingerprints else None
+    try:
+        OnDiskFiles().setup_dataset(dataset_dir, max_size, executor, cache, prune_rules=prune_rules, timings=timings,
+                                    shard_strategy=args.shard, shard_count=args.jobs)
+        if fingerprint_index is not None:
+            update_fingerprints(fingerprint_index, executor)
+        if timings is not None:
+            print_scan_timings(timings.get_subtree_timings(dataset_dir))
+
+        # Step 2: Read all the manifest files in the dataset
+        #   - Get all the files annotated as scaffold metadata files.
+        #   - Get all the files annotated as scaffold view files.
+        #   - Get all the files annotated as scaffold view thumbnails.
+        ManifestDataFrame().setup_dataframe(dataset_dir, manifest_cache, executor,
+                                            MANIFEST_VALIDATION_COLUMNS if args.usecols else None, prune_rules)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if cache is not None:
+            cache.close()
+    print_manifest_load_errors(ManifestDataFrame().get_load_errors())
+    ErrorManager().set_fingerprint_index(fingerprint_index)
+    if timings is not None:
+        print_manifest_load_times(ManifestDataFrame().get_load_times())
+        print_manifest_memory_usage(ManifestDataFrame().get_memory_usage())
 
     # Step 3:
     #   - Compare the results from steps 1 and 2 and determine if they have any differences.
@@ -262,6 +416,15 @@ def main():
     if args.fix:
         fix_errors(errors)
 
+    # Step 6:
+    #   - Watch for changes to the dataset, reporting any errors after each change.
+    if args.watch:
+        watch_dataset(dataset_dir, prune_rules)
+
+    if fingerprint_index is not None:
+        fingerprint_index.save()
+        fingerprint_index.close()
+
 
 if __name__ == "__main__":
     main()
@@ -2,12 +2,15 @@ import argparse
 import math
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import pandas as pd
 import tabulate
 
 from sparc.curation.tools.definitions import SIZE_NAME
 
+EXECUTOR_KINDS = ('process', 'thread')
+
 
 def convert_size(size_bytes):
     if size_bytes == 0:
@@ -27,12 +30,47 @@ def convert_to_bytes(size_string):
     return int(start) * math.pow(1024, SIZE_NAME.index(end))
 
 
+def convert_to_jobs(jobs_string):
+    m = re.match(r'^(\d+)$', jobs_string)
+    if not m or int(m.group(1)) < 1:
+        raise argparse.ArgumentTypeError("'" + jobs_string + "' is not a valid number of jobs. "
+                                         "Expected a whole number greater than zero.")
+    return int(m.group(1))
+
+
+def create_executor(jobs, kind='process'):
+    """
+    Create an executor for spreading work over the given number of jobs.
+
+    Worker processes are used by default, as classifying the files is mostly
+    parsing JSON and CSV data, which holds the GIL.  Worker threads avoid
+    starting processes and pickling the results, and overlap the reads of
+    datasets on slow or network storage, where the time is spent waiting on I/O.
+
+    Args:
+        jobs (int): The number of workers to use.
+        kind (str): The kind of workers, one of EXECUTOR_KINDS.
+
+    Returns:
+        Executor: An executor with the given number of workers, None if only one job is wanted.
+    """
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Unknown executor kind '{kind}', expected one of; {', '.join(EXECUTOR_KINDS)}.")
+    if jobs is None or jobs < 2:
+        return None
+
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=jobs)
+
+    return ProcessPoolExecutor(max_workers=jobs)
+
+
 def is_same_file(path1, path2):
     """Test if path1 is the same as path2.  If stat() on either fails and the paths
      are non-empty test if the strings are the same."""
     try:
         return os.path.samefile(path1, path2)
-    except FileNotFoundError:
+    except (FileNotFoundError, NotADirectoryError):
         if path1 and path2:
             return path1 == path2
 
@@ -60,6 +98,53 @@ def print_as_table(xlsx_file):
     print(tabulate.tabulate(df, headers=headers, tablefmt='simple'))
 
 
+def print_scan_timings(subtree_timings, limit=20):
+    """
+    Print the time spent scanning each directory subtree of a dataset, slowest first.
+
+    Args:
+        subtree_timings (list): Tuples of the subtree path, seconds spent and number of files, see ScanTimings.
+        limit (int): The maximum number of subtrees to print.
+    """
+    rows = [(subtree, f"{seconds:.3f}", file_count) for subtree, seconds, file_count in subtree_timings[:limit]]
+    print(tabulate.tabulate(rows, headers=['directory', 'seconds', 'files'], tablefmt='simple'))
+
+
+def print_manifest_load_times(load_times, limit=20):
+    """
+    Print the time spent loading each manifest file of a dataset, slowest first.
+
+    Args:
+        load_times (list): Tuples of the manifest file path and seconds spent, see ManifestDataFrame.get_load_times.
+        limit (int): The maximum number of manifest files to print.
+    """
+    rows = [(manifest_path, f"{seconds:.3f}") for manifest_path, seconds in load_times[:limit]]
+    print(tabulate.tabulate(rows, headers=['manifest', 'seconds'], tablefmt='simple'))
+
+
+def print_manifest_memory_usage(memory_usage):
+    """
+    Print the memory used by each column of the manifest data frame, largest first, and the total.
+
+    Args:
+        memory_usage (list): Tuples of the column name and bytes used, see ManifestDataFrame.get_memory_usage.
+    """
+    rows = [(column_name, convert_size(nbytes)) for column_name, nbytes in memory_usage]
+    rows.append(('total', convert_size(sum(nbytes for _, nbytes in memory_usage))))
+    print(tabulate.tabulate(rows, headers=['column', 'memory'], tablefmt='simple'))
+
+
+def print_manifest_load_errors(load_errors):
+    """
+    Print the manifest files of a dataset that could not be loaded.
+
+    Args:
+        load_errors (list): Tuples of the manifest file path and the reason, see ManifestDataFrame.get_load_errors.
+    """
+    for manifest_path, error in load_errors:
+        print(f"Could not load manifest file '{manifest_path}': {error}")
+
+
 def print_errors(errors):
     for i, e in enumerate(errors):
         print(i + 1, e.get_error_message())
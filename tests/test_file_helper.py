@@ -0,0 +1,520 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+
+from sparc.curation.tools.definitions import ADDITIONAL_TYPES_COLUMN, ALT_FORM_EXTENSION_TO_MIMETYPE_MAP, \
+    FILE_LOCATION_COLUMN, FILENAME_COLUMN, MANIFEST_FILENAME, SCAFFOLD_META_MIME, SCAFFOLD_THUMBNAIL_MIME, SCAFFOLD_VIEW_MIME
+from sparc.curation.tools.errors import DatasetNotDefinedError
+from sparc.curation.tools.helpers.archive_helper import DatasetArchive, is_dataset_archive
+from sparc.curation.tools.helpers.cache_helper import ScanCache, get_cache_dir
+from sparc.curation.tools.helpers.file_helper import walk_dataset_files, scan_dataset, classify_json_file, FilePrefilter, OnDiskFiles, \
+    PruneRules, ScanTimings, iter_classified_files, classify_dataset_files, classify_dataset_shards, is_scan_relevant, \
+    classify_archive_files, walk_order_key, filter_thumbnail_files_by_parent, index_files_by_dirname
+from sparc.curation.tools.helpers.error_helper import ErrorManager, fix_error
+from sparc.curation.tools.helpers.fingerprint_helper import FingerprintIndex, compute_fingerprint
+from sparc.curation.tools.helpers.manifest_helper import ManifestDataFrame
+from sparc.curation.tools.helpers.store_helper import PathStore, PathListView
+from sparc.curation.tools.helpers import watch_helper
+from sparc.curation.tools.helpers.watch_helper import DatasetWatcher
+from sparc.curation.tools.plot_utilities import sniff_txt_plot
+from sparc.curation.tools.scaffold_annotations import fix_errors, get_errors, update_data, update_fingerprints
+from sparc.curation.tools.utilities import convert_to_bytes, create_executor
+
+METADATA_CONTENT = [
+    {"URL": "mesh.exf", "Type": "Surfaces"},
+    {"URL": "scaffold_view.json", "Type": "View"},
+]
+VIEW_CONTENT = {
+    "farPlane": 1.0, "nearPlane": 0.1, "upVector": [0, 1, 0], "targetPosition": [0, 0, 0], "eyePosition": [1, 1, 1],
+}
+CONTEXT_CONTENT = {"version": "0.2.0", "id": "sparc.science.context_data"}
+
+
+def _scan_thumbnail_files(image_file_paths, parent_files):
+    # The scan of every image for every parent file that the directory index replaces.
+    filtered_files = []
+    for parent_file in parent_files:
+        parent_dir = os.path.dirname(parent_file)
+        filtered_files.extend([image_file for image_file in image_file_paths if os.path.dirname(image_file) == parent_dir])
+
+    return set(filtered_files)
+
+
+def _scan_alt_forms_files(thumbnail_files):
+    # The listing of each thumbnail's directory that the bisect over the scan's listings replaces.
+    alt_forms_files = {mime: [] for mime in ALT_FORM_EXTENSION_TO_MIMETYPE_MAP.values()}
+    for thumbnail_file in thumbnail_files:
+        target_dir = os.path.dirname(thumbnail_file)
+        for name in sorted(os.listdir(target_dir)):
+            for extension, mime in ALT_FORM_EXTENSION_TO_MIMETYPE_MAP.items():
+                if name.endswith(extension) and os.path.commonprefix([name, os.path.basename(thumbnail_file)]):
+                    alt_forms_files[mime].append(os.path.join(target_dir, name))
+
+    return alt_forms_files
+
+
+def _write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+class FileHelperTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dataset_dir = self._temp_dir.name
+        derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        _write_file(os.path.join(derivative_dir, "scaffold_metadata.json"), json.dumps(METADATA_CONTENT))
+        _write_file(os.path.join(derivative_dir, "scaffold_view.json"), json.dumps(VIEW_CONTENT))
+        _write_file(os.path.join(derivative_dir, "scaffold_thumbnail.jpeg"), "not really a jpeg")
+        _write_file(os.path.join(derivative_dir, "context_info.json"), json.dumps(CONTEXT_CONTENT))
+        _write_file(os.path.join(derivative_dir, "plot.csv"), "time,a\n0,1\n1,2\n")
+        _write_file(os.path.join(derivative_dir, "README.txt"), "A read me file.\n")
+        _write_file(os.path.join(self._dataset_dir, "primary", "sub-1", "image.png"), "not really a png")
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_walk_dataset_files(self):
+        walked = [entry.path for entry in walk_dataset_files(self._dataset_dir)]
+        expected = [str(p) for p in Path(self._dataset_dir).rglob("*") if p.is_file()]
+
+        self.assertEqual(sorted(expected), sorted(walked))
+        self.assertEqual(len(walked), len(set(walked)))
+
+    def test_scan_dataset(self):
+        scan = scan_dataset(self._dataset_dir, convert_to_bytes("2MiB"), convert_to_bytes("2MiB"))
+        derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        metadata_file = os.path.join(derivative_dir, "scaffold_metadata.json")
+
+        self.assertEqual([metadata_file], scan['metadata'])
+        self.assertEqual([os.path.join(derivative_dir, "scaffold_view.json")], scan['metadata_views'][metadata_file])
+        self.assertEqual([os.path.join(derivative_dir, "scaffold_view.json")], scan['view'])
+        self.assertEqual([os.path.join(derivative_dir, "context_info.json")], [str(p) for p in scan['context']])
+        self.assertEqual([os.path.join(derivative_dir, "plot.csv")], [str(p) for p in scan['plot']])
+        self.assertEqual(2, len(scan['image']))
+
+    def test_executor_scan(self):
+        _write_file(os.path.join(self._dataset_dir, "derivative", "scaffold_view.vtk"), "not really a vtk")
+        max_size = convert_to_bytes("2MiB")
+
+        def _get_files():
+            on_disk = OnDiskFiles()
+            return (list(on_disk.get_metadata_files()), list(on_disk.get_view_files()),
+                    list(on_disk.get_thumbnail_files()), list(on_disk.get_plot_files()),
+                    list(on_disk.get_context_info_files()), list(on_disk.get_all_image_files()),
+                    {mime: list(files) for mime, files in on_disk.get_alt_forms_files().items()})
+
+        OnDiskFiles().setup_dataset(self._dataset_dir, max_size)
+        expected = _get_files()
+        for kind in ["process", "thread"]:
+            executor = create_executor(2, kind)
+            try:
+                OnDiskFiles().setup_dataset(self._dataset_dir, max_size, executor)
+                self.assertEqual(expected, _get_files())
+                OnDiskFiles().setup_dataset(self._dataset_dir, max_size, executor, shard_strategy='subdir')
+                self.assertEqual(expected, _get_files())
+            finally:
+                executor.shutdown()
+
+    def test_iter_classified_files(self):
+        max_size = convert_to_bytes("2MiB")
+        classified_files = iter_classified_files(self._dataset_dir, max_size)
+        file_path, roles, view_urls = next(classified_files)
+
+        self.assertEqual(os.path.join(self._dataset_dir, "derivative", "README.txt"), file_path)
+        self.assertEqual(set(), roles)
+        self.assertEqual([], view_urls)
+
+        classifications = classify_dataset_files(self._dataset_dir, max_size, max_size)
+        self.assertEqual([(file_path, (roles, view_urls)) for file_path, roles, view_urls in
+                          iter_classified_files(self._dataset_dir, max_size, max_size)], list(classifications.items()))
+
+    def test_classify_dataset_shards(self):
+        max_size = convert_to_bytes("2MiB")
+        _write_file(os.path.join(self._dataset_dir, "primary", "sub-2", "view.json"), json.dumps(VIEW_CONTENT))
+        _write_file(os.path.join(self._dataset_dir, "top_view.json"), json.dumps(VIEW_CONTENT))
+        expected = {file_path: classification for file_path, classification in
+                    classify_dataset_files(self._dataset_dir, max_size, max_size).items()
+                    if is_scan_relevant(file_path, classification[0])}
+
+        for strategy, shard_count in [('subdir', None), ('hash', 1), ('hash', 3)]:
+            classifications = classify_dataset_shards(self._dataset_dir, max_size, max_size, strategy, shard_count)
+
+            self.assertEqual(list(expected.items()), list(classifications.items()))
+
+    def test_classify_json_file(self):
+        metadata_file = os.path.join(self._dataset_dir, "derivative", "scaffold_metadata.json")
+        size = os.path.getsize(metadata_file)
+        role_max_sizes = {'metadata': size + 1, 'view': size + 1, 'context': size + 1}
+
+        roles, view_urls = classify_json_file(metadata_file, size, role_max_sizes)
+
+        self.assertEqual({'metadata'}, roles)
+        self.assertEqual([os.path.join(os.path.dirname(metadata_file), "scaffold_view.json")], view_urls)
+
+        roles, view_urls = classify_json_file(metadata_file, size, {'metadata': size})
+
+        self.assertEqual(set(), roles)
+        self.assertEqual([], view_urls)
+
+    def test_scan_dataset_with_cache(self):
+        max_size = convert_to_bytes("2MiB")
+        cache = ScanCache(get_cache_dir(self._dataset_dir))
+        uncached_scan = scan_dataset(self._dataset_dir, max_size, max_size)
+        first_scan = scan_dataset(self._dataset_dir, max_size, max_size, cache=cache)
+        cache.close()
+
+        self.assertEqual(uncached_scan, first_scan)
+
+        view_file = os.path.join(self._dataset_dir, "derivative", "scaffold_view.json")
+        _write_file(view_file, json.dumps({"not": "a view"}))
+        cache = ScanCache(get_cache_dir(self._dataset_dir))
+        second_scan = scan_dataset(self._dataset_dir, max_size, max_size, cache=cache)
+        cache.close()
+
+        self.assertEqual([], second_scan['view'])
+        self.assertEqual(first_scan['metadata'], second_scan['metadata'])
+        self.assertEqual(first_scan['image'], second_scan['image'])
+
+    def test_prefilter(self):
+        derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        prefilter = FilePrefilter()
+
+        self.assertIsNone(prefilter.check(os.path.join(derivative_dir, "scaffold_metadata.json")))
+        self.assertIsNone(prefilter.check(os.path.join(derivative_dir, "scaffold_view.json")))
+        self.assertEqual('denied extension', prefilter.check(os.path.join(derivative_dir, "scaffold_thumbnail.jpeg")))
+        self.assertEqual('content sniff', prefilter.check(os.path.join(derivative_dir, "README.txt")))
+
+        max_size = convert_to_bytes("2MiB")
+        scan = scan_dataset(self._dataset_dir, max_size, max_size, prefilter=prefilter)
+
+        self.assertEqual(scan, scan_dataset(self._dataset_dir, max_size, max_size, prefilter=FilePrefilter([], sniff_size=0)))
+        self.assertEqual(2, prefilter.rejections['denied extension'])
+        self.assertEqual(2, prefilter.rejections['content sniff'])
+
+    def test_prune_rules(self):
+        _write_file(os.path.join(self._dataset_dir, ".git", "objects", "view.json"), json.dumps(VIEW_CONTENT))
+        _write_file(os.path.join(self._dataset_dir, ".sparcignore"), "# Raw data.\nprimary/\n")
+        prune_rules = PruneRules.from_dataset(self._dataset_dir, [".git/", "*.txt"])
+        timings = ScanTimings()
+
+        walked = [os.path.relpath(entry.path, self._dataset_dir)
+                  for entry in walk_dataset_files(self._dataset_dir, prune_rules, timings)]
+
+        self.assertEqual(["primary/", ".git/", "*.txt"], prune_rules.get_patterns())
+        self.assertEqual([".sparcignore"] + [os.path.join("derivative", name) for name in
+                                             ["context_info.json", "plot.csv", "scaffold_metadata.json",
+                                              "scaffold_thumbnail.jpeg", "scaffold_view.json"]], walked)
+        self.assertTrue(prune_rules.is_path_pruned(os.path.join("primary", "sub-1", "image.png"), False))
+        self.assertEqual({os.curdir, "derivative"}, {subtree for subtree, _, _ in timings.get_subtree_timings(self._dataset_dir)})
+
+    def test_sniff_txt_plot(self):
+        derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        eit_file = os.path.join(derivative_dir, "eit_log.txt")
+        tab_file = os.path.join(derivative_dir, "tab.txt")
+        _write_file(eit_file, "header\nEIT STARTING\n1.0s D1,2,3\n2.0s D4,5,6\n+Fin\n")
+        _write_file(tab_file, "time\tvalue\n" + "0\t1\n" * 10000)
+
+        self.assertIsNone(sniff_txt_plot(os.path.join(derivative_dir, "README.txt")))
+        self.assertEqual('eit', sniff_txt_plot(eit_file))
+        self.assertEqual('tabular', sniff_txt_plot(tab_file))
+        self.assertEqual('tabular', sniff_txt_plot(tab_file, sniff_size=16))
+
+        scan = scan_dataset(self._dataset_dir, convert_to_bytes("2MiB"), convert_to_bytes("2MiB"))
+
+        self.assertEqual([eit_file, os.path.join(derivative_dir, "plot.csv"), tab_file], [str(p) for p in scan['plot']])
+
+    def test_filter_thumbnail_files(self):
+        image_file_paths = [os.path.join("derivative", "scaffold_a", "thumbnail.png"),
+                            os.path.join("derivative", "scaffold_b", "thumbnail.png"),
+                            os.path.join("derivative", "scaffold_b", "other.jpeg"),
+                            os.path.join("derivative", "thumbnail.png"),
+                            os.path.join("derivative", "scaffold_c", "thumbnail.png")]
+        parent_sets = [
+            # Same-stem thumbnails in sibling directories are only matched to their own parent.
+            [os.path.join("derivative", "scaffold_a", "view.json")],
+            [os.path.join("derivative", "scaffold_b", "view.json")],
+            # Several parents in one directory give each of its images once.
+            [os.path.join("derivative", "scaffold_b", "view_1.json"),
+             os.path.join("derivative", "scaffold_b", "view_2.json"),
+             os.path.join("derivative", "scaffold_a", "view.json"),
+             os.path.join("derivative", "scaffold_b", "view_3.json")],
+            [os.path.join("derivative", "view.json"), os.path.join("primary", "view.json")],
+            [],
+        ]
+        for parent_files in parent_sets:
+            for images_by_dirname in [None, index_files_by_dirname(image_file_paths)]:
+                thumbnail_files = filter_thumbnail_files_by_parent(image_file_paths, parent_files, images_by_dirname)
+                self.assertEqual(len(set(thumbnail_files)), len(thumbnail_files))
+                self.assertEqual(_scan_thumbnail_files(image_file_paths, parent_files), set(thumbnail_files))
+
+        self.assertEqual([os.path.join("derivative", "scaffold_a", "thumbnail.png")],
+                         filter_thumbnail_files_by_parent(image_file_paths, parent_sets[0]))
+        self.assertEqual([os.path.join("derivative", "scaffold_b", "thumbnail.png"),
+                          os.path.join("derivative", "scaffold_b", "other.jpeg"),
+                          os.path.join("derivative", "scaffold_a", "thumbnail.png")],
+                         filter_thumbnail_files_by_parent(image_file_paths, parent_sets[2]))
+
+    def test_filter_alt_forms(self):
+        alt_dir = os.path.join(self._dataset_dir, "derivative", "alt")
+        _write_file(os.path.join(alt_dir, "view.json"), json.dumps(VIEW_CONTENT))
+        for name in ["b_view.png", "z.png", "lonely.png", "a_view.vtk", "azz.stl", "b.vtk", "b_view.stl",
+                     "b_view.STL", "B_view.vtk", "ba.VTK", "c.vtk", "z.vtk", "z~.stl", "{.vtk"]:
+            _write_file(os.path.join(alt_dir, name), "not really a model")
+
+        OnDiskFiles().setup_dataset(self._dataset_dir, convert_to_bytes("2MiB"))
+        alt_forms_files = {mime: list(files) for mime, files in OnDiskFiles().get_alt_forms_files().items()}
+
+        self.assertEqual(_scan_alt_forms_files(OnDiskFiles().get_thumbnail_files()), alt_forms_files)
+        # Names sharing a first character with a thumbnail, either side of the bisect boundaries, with a
+        # lower-case extension.  The thumbnail lonely.png has no alternative form.
+        self.assertEqual({os.path.join(alt_dir, name) for name in ["b.vtk", "b_view.stl", "z.vtk", "z~.stl"]},
+                         {file_path for files in alt_forms_files.values() for file_path in files})
+
+    def test_path_store(self):
+        derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        view_file = os.path.join(derivative_dir, "scaffold_view.json")
+        thumbnail_file = os.path.join(derivative_dir, "scaffold_thumbnail.jpeg")
+        store = PathStore(self._dataset_dir)
+        store.set_list('view', [Path(view_file)], 'view')
+        store.set_list('thumbnail', [thumbnail_file], 'thumbnail')
+        store.set_list('image', [thumbnail_file], 'image')
+
+        views = store.get_list('view')
+        self.assertIsInstance(views, PathListView)
+        self.assertIs(views, store.get_list('view'))
+        self.assertEqual([view_file], views)
+        self.assertIn(view_file, views)
+        self.assertEqual([view_file, thumbnail_file], views + store.get_list('thumbnail'))
+        self.assertEqual(["other", view_file], ["other"] + views)
+        self.assertEqual(2, len(store))
+        self.assertEqual({'thumbnail', 'image'}, store.get_roles(thumbnail_file))
+        self.assertEqual([], store.get_list('plot'))
+
+        other_view_file = os.path.join(derivative_dir, "other_view.json")
+        store.add_to_list('view', other_view_file, 'view', walk_order_key)
+        self.assertEqual([other_view_file, view_file], store.get_list('view'))
+        low = walk_order_key(view_file)
+        self.assertEqual([view_file], store.remove_from_list('view', low, low + ((0, ''),), walk_order_key, 'view'))
+        self.assertEqual([other_view_file], store.get_list('view'))
+        self.assertEqual(frozenset(), store.get_roles(view_file))
+        store.set_view_urls(view_file, [other_view_file])
+        self.assertEqual((other_view_file,), store.get_view_urls(view_file))
+
+        OnDiskFiles().setup_dataset(self._dataset_dir, convert_to_bytes("2MiB"))
+
+        self.assertIs(OnDiskFiles().get_view_files(), OnDiskFiles().get_view_files())
+        self.assertEqual([thumbnail_file], OnDiskFiles().get_thumbnail_files())
+        self.assertTrue({'image', 'thumbnail'}.issubset(OnDiskFiles().get_file_roles(thumbnail_file)))
+
+    def test_fix_with_prune_rules(self):
+        derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        manifest_file = os.path.join(derivative_dir, MANIFEST_FILENAME)
+        pd.DataFrame({
+            FILENAME_COLUMN: ["scaffold_metadata.json", "scaffold_view.json", "scaffold_thumbnail.jpeg"],
+            ADDITIONAL_TYPES_COLUMN: [SCAFFOLD_META_MIME, SCAFFOLD_VIEW_MIME, SCAFFOLD_THUMBNAIL_MIME],
+        }).to_excel(manifest_file, index=False)
+        with open(manifest_file, "rb") as f:
+            before = f.read()
+
+        prune_rules = PruneRules.from_dataset(self._dataset_dir, ["derivative/"])
+        OnDiskFiles().setup_dataset(self._dataset_dir, convert_to_bytes("2MiB"), prune_rules=prune_rules)
+        ManifestDataFrame().setup_dataframe(self._dataset_dir, prune_rules=prune_rules)
+
+        # The annotations of the excluded files are neither reported nor fixed.
+        self.assertEqual([], get_errors())
+        fix_errors(get_errors())
+        with open(manifest_file, "rb") as f:
+            self.assertEqual(before, f.read())
+
+    def test_dataset_not_defined(self):
+        on_disk = OnDiskFiles()
+        with mock.patch.object(on_disk, "_store", None), mock.patch.object(on_disk, "_dataset_dir", None):
+            with self.assertRaises(DatasetNotDefinedError):
+                on_disk.get_alt_forms_files()
+            with self.assertRaises(DatasetNotDefinedError):
+                on_disk.update_files([self._dataset_dir])
+
+    def test_update_files(self):
+        max_size = convert_to_bytes("2MiB")
+        watcher = DatasetWatcher(self._dataset_dir, use_notifications=False)
+        watcher.start()
+        OnDiskFiles().setup_dataset(self._dataset_dir, max_size)
+
+        new_view_file = os.path.join(self._dataset_dir, "primary", "new_view.json")
+        new_thumbnail_file = os.path.join(self._dataset_dir, "primary", "new_view.png")
+        view_file = os.path.join(self._dataset_dir, "derivative", "scaffold_view.json")
+        _write_file(new_view_file, json.dumps(VIEW_CONTENT))
+        _write_file(new_thumbnail_file, "not really a png")
+        os.remove(view_file)
+        os.rename(os.path.join(self._dataset_dir, "primary", "sub-1"), os.path.join(self._dataset_dir, "primary", "sub-2"))
+        changed_paths = watcher.get_changes()
+        watcher.stop()
+
+        def _get_files():
+            metadata_file = os.path.join(self._dataset_dir, "derivative", "scaffold_metadata.json")
+            return (OnDiskFiles().get_view_files(), OnDiskFiles().get_all_image_files(),
+                    OnDiskFiles().get_metadata_files(), OnDiskFiles().get_thumbnail_files(),
+                    OnDiskFiles().get_view_urls(metadata_file),
+                    [OnDiskFiles().get_file_roles(file_path) for file_path in [view_file, new_thumbnail_file]])
+
+        self.assertIn(new_view_file, changed_paths)
+        store = OnDiskFiles()._store
+        OnDiskFiles().update_files(changed_paths)
+        # The store is updated in place.
+        self.assertIs(store, OnDiskFiles()._store)
+        updated = _get_files()
+        OnDiskFiles().setup_dataset(self._dataset_dir, max_size)
+
+        self.assertEqual([new_view_file], updated[0])
+        self.assertEqual([new_thumbnail_file], updated[3])
+        self.assertEqual([frozenset(), {'image', 'thumbnail'}], updated[5])
+        self.assertEqual(_get_files(), updated)
+
+    def test_poll_changes(self):
+        watcher = DatasetWatcher(self._dataset_dir, use_notifications=False)
+        watcher.start()
+        primary_dir = os.path.join(self._dataset_dir, "primary")
+        new_file = os.path.join(primary_dir, "new_view.json")
+        readme_file = os.path.join(self._dataset_dir, "derivative", "README.txt")
+        _write_file(new_file, json.dumps(VIEW_CONTENT))
+
+        with mock.patch.object(watch_helper, "FULL_POLL_COUNT", 2), \
+                mock.patch.object(watch_helper, "list_dataset_dir", wraps=watch_helper.list_dataset_dir) as list_dir:
+            # Only the directory that changed is listed again.
+            self.assertEqual([new_file], watcher.get_changes())
+            self.assertEqual([primary_dir], [c.args[0] for c in list_dir.call_args_list])
+
+            # A file rewritten in place is found by the next full poll.
+            _write_file(readme_file, "A longer read me file.\n")
+            self.assertEqual([readme_file], watcher.get_changes())
+            self.assertEqual([], watcher.get_changes())
+
+    def test_update_data(self):
+        primary_dir = os.path.join(self._dataset_dir, "primary", "sub-1")
+        pd.DataFrame({FILENAME_COLUMN: ["image.png"]}).to_excel(os.path.join(primary_dir, MANIFEST_FILENAME), index=False)
+        lock_file = os.path.join(primary_dir, ".~lock.manifest.xlsx#")
+        _write_file(lock_file, "locked")
+        OnDiskFiles().setup_dataset(self._dataset_dir, convert_to_bytes("2MiB"))
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        image_file = os.path.join(primary_dir, "image.png")
+        self.assertEqual(["image.png"], manifest.get_matching_entry(FILE_LOCATION_COLUMN, image_file))
+
+        with mock.patch.object(manifest, "setup_dataframe") as setup_dataframe, \
+                mock.patch.object(manifest, "update_manifests", wraps=manifest.update_manifests) as update_manifests:
+            # Removed files are ignored.
+            os.remove(lock_file)
+            update_data([lock_file])
+            update_manifests.assert_not_called()
+
+            # A moved directory has the rows of its manifest moved with it.
+            moved_dir = os.path.join(self._dataset_dir, "primary", "sub-2")
+            os.rename(primary_dir, moved_dir)
+            update_data([primary_dir, moved_dir])
+            self.assertEqual([], manifest.get_matching_entry(FILE_LOCATION_COLUMN, image_file))
+            self.assertEqual(["image.png"], manifest.get_matching_entry(
+                FILE_LOCATION_COLUMN, os.path.join(moved_dir, "image.png")))
+
+            # A removed directory has the rows of its manifest removed.
+            shutil.rmtree(moved_dir)
+            update_data([moved_dir])
+            self.assertEqual([], manifest.get_matching_entry(FILE_LOCATION_COLUMN, os.path.join(moved_dir, "image.png")))
+            setup_dataframe.assert_not_called()
+
+    def test_fingerprint_index(self):
+        derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        view_file = os.path.join(derivative_dir, "scaffold_view.json")
+        metadata_file = os.path.join(derivative_dir, "scaffold_metadata.json")
+        self.assertNotEqual(compute_fingerprint(view_file), compute_fingerprint(metadata_file))
+        self.assertEqual(compute_fingerprint(view_file, 4), compute_fingerprint(view_file, 4))
+        self.assertIsNone(compute_fingerprint(os.path.join(derivative_dir, "missing.json")))
+
+        index = FingerprintIndex(get_cache_dir(self._dataset_dir))
+        index.update([view_file, metadata_file])
+        fingerprint = index.get_fingerprint(view_file)
+        index.save()
+        index.close()
+
+        moved_file = os.path.join(self._dataset_dir, "moved", "moved_view.json")
+        os.makedirs(os.path.dirname(moved_file))
+        os.rename(view_file, moved_file)
+
+        index = FingerprintIndex(get_cache_dir(self._dataset_dir))
+        index.update([moved_file, metadata_file])
+        self.assertEqual(fingerprint, index.get_fingerprint(view_file))
+        self.assertEqual([moved_file], index.find_current_paths(fingerprint))
+        index.forget(view_file)
+        index.save()
+        index.close()
+
+        index = FingerprintIndex(get_cache_dir(self._dataset_dir))
+        self.assertIsNone(index.get_fingerprint(view_file))
+        self.assertEqual(fingerprint, index.get_fingerprint(moved_file))
+        index.close()
+
+    def test_moved_file(self):
+        max_size = convert_to_bytes("2MiB")
+        derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        view_file = os.path.join(derivative_dir, "scaffold_view.json")
+        pd.DataFrame({
+            FILENAME_COLUMN: ["scaffold_metadata.json", "scaffold_view.json"],
+            ADDITIONAL_TYPES_COLUMN: [SCAFFOLD_META_MIME, SCAFFOLD_VIEW_MIME],
+        }).to_excel(os.path.join(derivative_dir, MANIFEST_FILENAME), index=False)
+        OnDiskFiles().setup_dataset(self._dataset_dir, max_size)
+        index = FingerprintIndex(get_cache_dir(self._dataset_dir))
+        update_fingerprints(index)
+
+        moved_file = os.path.join(self._dataset_dir, "moved", "moved_view.json")
+        os.makedirs(os.path.dirname(moved_file))
+        os.rename(view_file, moved_file)
+        OnDiskFiles().setup_dataset(self._dataset_dir, max_size)
+        ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        update_fingerprints(index)
+        ErrorManager().set_fingerprint_index(index)
+        try:
+            ErrorManager().update_content()
+            errors = ErrorManager().get_moved_files()
+            self.assertEqual([(view_file, SCAFFOLD_VIEW_MIME, moved_file)],
+                             [(error.get_location(), error.get_mime(), error.get_target()) for error in errors])
+
+            fix_error(errors[0])
+            self.assertEqual([SCAFFOLD_VIEW_MIME], ManifestDataFrame().get_matching_entry(
+                FILE_LOCATION_COLUMN, moved_file, ADDITIONAL_TYPES_COLUMN))
+            self.assertEqual([], ManifestDataFrame().get_matching_entry(FILE_LOCATION_COLUMN, view_file))
+            self.assertIsNone(index.get_fingerprint(view_file))
+            ErrorManager().update_content()
+            self.assertEqual([], ErrorManager().get_moved_files())
+
+            # Without a fingerprint index moved files are not looked for.
+            ErrorManager().set_fingerprint_index(None)
+            self.assertEqual([], ErrorManager().get_moved_files())
+        finally:
+            ErrorManager().set_fingerprint_index(None)
+            index.close()
+
+    def test_classify_archive_files(self):
+        expected = classify_dataset_files(self._dataset_dir, convert_to_bytes("2MiB"), convert_to_bytes("2MiB"))
+        with tempfile.TemporaryDirectory() as archive_dir:
+            for archive_format in ["zip", "gztar"]:
+                archive_path = shutil.make_archive(os.path.join(archive_dir, "dataset"), archive_format, self._dataset_dir)
+                self.assertTrue(is_dataset_archive(archive_path))
+                with DatasetArchive(archive_path) as archive:
+                    classifications = classify_archive_files(archive, convert_to_bytes("2MiB"), convert_to_bytes("2MiB"))
+                    self.assertEqual(list(expected), [f.replace(archive_path, self._dataset_dir, 1) for f in classifications])
+                    self.assertEqual([(roles, [u.replace(self._dataset_dir, archive_path, 1) for u in view_urls])
+                                      for roles, view_urls in expected.values()], list(classifications.values()))
+                    self.assertTrue(archive.is_file(os.path.join(archive_path, "derivative", "scaffold_view.json")))
+
+        self.assertFalse(is_dataset_archive(self._dataset_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,418 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import openpyxl
+import pandas as pd
+from openpyxl.styles import Font
+
+from sparc.curation.tools.definitions import ADDITIONAL_TYPES_COLUMN, DERIVED_FROM_COLUMN, FILE_LOCATION_COLUMN, \
+    FILENAME_COLUMN, MANIFEST_DIR_COLUMN, MANIFEST_FILENAME, MANIFEST_VALIDATION_COLUMNS, PLOT_CSV_MIME, \
+    SCAFFOLD_META_MIME, SCAFFOLD_VIEW_MIME, SOURCE_OF_COLUMN, SUPPLEMENTAL_JSON_COLUMN
+from sparc.curation.tools.helpers import manifest_helper
+from sparc.curation.tools.helpers.cache_helper import ManifestCache, get_cache_dir
+from sparc.curation.tools.helpers.file_helper import classify_file
+from sparc.curation.tools.helpers.manifest_helper import ManifestDataFrame
+from sparc.curation.tools.utilities import is_same_file
+
+
+def _write_manifest(manifest_dir, rows):
+    os.makedirs(manifest_dir, exist_ok=True)
+    pd.DataFrame(rows).to_excel(os.path.join(manifest_dir, MANIFEST_FILENAME), index=False, header=True)
+
+
+def _read_manifest(manifest_dir):
+    return pd.read_excel(os.path.join(manifest_dir, MANIFEST_FILENAME), sheet_name=None, dtype=str)
+
+
+class ManifestHelperTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._set_up_dataset(os.path.join(self._temp_dir.name, "dataset"))
+
+    def _set_up_dataset(self, dataset_dir):
+        self._dataset_dir = dataset_dir
+        self._derivative_dir = os.path.join(self._dataset_dir, "derivative")
+        _write_manifest(self._derivative_dir, {
+            FILENAME_COLUMN: ["scaffold_metadata.json", "scaffold_view.json"],
+            ADDITIONAL_TYPES_COLUMN: [SCAFFOLD_META_MIME, SCAFFOLD_VIEW_MIME],
+        })
+        self._primary_dir = os.path.join(self._dataset_dir, "primary")
+        _write_manifest(self._primary_dir, {FILENAME_COLUMN: ["data.csv"]})
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _update(self, manifest):
+        metadata_file = os.path.join(self._derivative_dir, "scaffold_metadata.json")
+        manifest.update_column_content(metadata_file, SOURCE_OF_COLUMN, "scaffold_view.json")
+        manifest.update_column_content(metadata_file, SOURCE_OF_COLUMN, "other_view.json", True)
+        manifest.update_supplemental_json(os.path.join(self._primary_dir, "data.csv"), '{"x": 1}')
+        manifest.update_additional_type(os.path.join(self._derivative_dir, "thumbnail.jpeg"), SCAFFOLD_VIEW_MIME)
+
+    def test_batch(self):
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        self._update(manifest)
+        expected = _read_manifest(self._derivative_dir), _read_manifest(self._primary_dir)
+        expected_source_of = manifest.get_source_of(os.path.join(self._derivative_dir, "scaffold_metadata.json"))
+
+        self._set_up_dataset(os.path.join(self._temp_dir.name, "batch_dataset"))
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        before = _read_manifest(self._derivative_dir)
+        with manifest.batch():
+            self._update(manifest)
+            # Nothing is written until the end of the batch, but the updates can be read.
+            self.assertEqual(list(before), list(_read_manifest(self._derivative_dir)))
+            self.assertTrue(before["Sheet1"].equals(_read_manifest(self._derivative_dir)["Sheet1"]))
+            self.assertEqual(expected_source_of,
+                             manifest.get_source_of(os.path.join(self._derivative_dir, "scaffold_metadata.json")))
+            self.assertEqual(['{"x": 1}'], manifest.get_matching_entry(FILENAME_COLUMN, "data.csv",
+                                                                      SUPPLEMENTAL_JSON_COLUMN))
+
+        for expected_sheets, manifest_dir in zip(expected, [self._derivative_dir, self._primary_dir]):
+            sheets = _read_manifest(manifest_dir)
+            self.assertEqual(list(expected_sheets), list(sheets))
+            for sheet_name in sheets:
+                self.assertTrue(expected_sheets[sheet_name].equals(sheets[sheet_name]))
+        self.assertEqual(expected_source_of,
+                         manifest.get_source_of(os.path.join(self._derivative_dir, "scaffold_metadata.json")))
+
+    def test_no_shared_class_state(self):
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        with manifest.batch():
+            self._update(manifest)
+        self._update(manifest)
+        manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, SCAFFOLD_VIEW_MIME, FILE_LOCATION_COLUMN)
+        for name in ["_pending_originals", "_written_workbooks", "_manifest_keys", "_segments", "_segment_indexes",
+                     "_indexes", "_lookups", "_load_times", "_load_errors"]:
+            self.assertIsNone(getattr(ManifestDataFrame, name), name)
+
+    def test_update_patches_dataframe(self):
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        metadata_file = os.path.join(self._derivative_dir, "scaffold_metadata.json")
+        with mock.patch.object(manifest, "_read_manifests", wraps=manifest._read_manifests) as read_manifests:
+            self._update(manifest)
+            read_manifests.assert_not_called()
+
+            self.assertEqual(["scaffold_view.json\nother_view.json"], manifest.get_source_of(metadata_file))
+            self.assertEqual([SCAFFOLD_VIEW_MIME], manifest.get_matching_entry(FILENAME_COLUMN, "thumbnail.jpeg",
+                                                                               ADDITIONAL_TYPES_COLUMN))
+
+            # A manifest changed by something else has all the manifests read again.
+            _write_manifest(self._primary_dir, {FILENAME_COLUMN: ["data.csv", "other_data.csv"]})
+            manifest.update_supplemental_json(os.path.join(self._derivative_dir, "scaffold_view.json"), '{"y": 2}')
+            read_manifests.assert_called()
+
+        self.assertEqual(["other_data.csv"], manifest.get_filename(os.path.join(self._primary_dir, "other_data.csv")))
+        self.assertEqual(['{"y": 2}'], manifest.get_matching_entry(FILENAME_COLUMN, "scaffold_view.json",
+                                                                   SUPPLEMENTAL_JSON_COLUMN))
+
+    def test_matching_entry_index(self):
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+
+        def _scan(column_heading, value, out_column_heading):
+            if not manifest._has_column(out_column_heading):
+                return []
+            return list(manifest._get_column(out_column_heading)[(manifest._get_column(column_heading) == value).to_numpy()])
+
+        for _ in range(2):
+            for column_heading, out_column_heading in [(FILENAME_COLUMN, ADDITIONAL_TYPES_COLUMN),
+                                                       (ADDITIONAL_TYPES_COLUMN, FILE_LOCATION_COLUMN),
+                                                       (FILE_LOCATION_COLUMN, SOURCE_OF_COLUMN)]:
+                for value in set(manifest._get_column(column_heading).dropna()) | {"missing", None}:
+                    self.assertEqual(_scan(column_heading, value, out_column_heading),
+                                     manifest.get_matching_entry(column_heading, value, out_column_heading))
+            # The indexes are rebuilt after an update.
+            self._update(manifest)
+
+        self.assertEqual([], manifest.get_matching_entry("no such column", "data.csv"))
+
+    def test_matching_dataframe(self):
+        open(os.path.join(self._derivative_dir, "scaffold_view.json"), "w").close()
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        linked_dir = os.path.join(self._temp_dir.name, "linked")
+        os.symlink(self._derivative_dir, linked_dir)
+
+        def _scan(file_location):
+            manifestDataFrame = manifest._manifestDataFrame
+            same_file = [is_same_file(file_location, os.path.join(row[MANIFEST_DIR_COLUMN], row[FILENAME_COLUMN]))
+                         for _, row in manifestDataFrame.iterrows()]
+            return list(manifestDataFrame[same_file][FILENAME_COLUMN])
+
+        file_locations = [os.path.join(self._derivative_dir, "scaffold_view.json"),
+                          os.path.join(linked_dir, "scaffold_view.json"),
+                          os.path.join(self._derivative_dir, "scaffold_metadata.json"),
+                          os.path.join(self._primary_dir, "data.csv"),
+                          os.path.join(self._primary_dir, "missing.csv")]
+        for file_location in file_locations:
+            self.assertEqual(_scan(file_location), list(manifest._get_matching_dataframe(file_location)[FILENAME_COLUMN]))
+        self.assertEqual(["scaffold_view.json"],
+                         list(manifest._get_matching_dataframe(file_locations[1])[FILENAME_COLUMN]))
+
+        # A file created after the index was built is still matched.
+        open(file_locations[2], "w").close()
+        self.assertEqual(["scaffold_metadata.json"],
+                         list(manifest._get_matching_dataframe(file_locations[2])[FILENAME_COLUMN]))
+
+    def test_incremental_indexes(self):
+        open(os.path.join(self._derivative_dir, "scaffold_view.json"), "w").close()
+        open(os.path.join(self._primary_dir, "data.csv"), "w").close()
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        data_file = os.path.join(self._primary_dir, "data.csv")
+        self.assertEqual(["data.csv"], list(manifest._get_matching_dataframe(data_file)[FILENAME_COLUMN]))
+        manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, SCAFFOLD_VIEW_MIME)
+
+        # Only the rows of the updated manifest file are indexed again.
+        manifest.update_supplemental_json(data_file, '{"x": 1}')
+        with mock.patch("os.stat", wraps=os.stat) as stat:
+            self.assertEqual(["data.csv"], list(manifest._get_matching_dataframe(data_file)[FILENAME_COLUMN]))
+        self.assertNotIn(mock.call(os.path.join(self._derivative_dir, "scaffold_view.json")), stat.call_args_list)
+
+        self._update(manifest)
+        indexes = manifest._get_identity_index(), manifest._get_column_index(ADDITIONAL_TYPES_COLUMN), \
+            list(manifest._get_column(FILE_LOCATION_COLUMN))
+        manifest._invalidate_indexes()
+        self.assertEqual((manifest._get_identity_index(), manifest._get_column_index(ADDITIONAL_TYPES_COLUMN),
+                          list(manifest._get_column(FILE_LOCATION_COLUMN))), indexes)
+        self.assertEqual(["scaffold_view.json", "thumbnail.jpeg"],
+                         manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, SCAFFOLD_VIEW_MIME))
+
+    def test_file_location_column(self):
+        manifestDataFrame = pd.DataFrame({
+            MANIFEST_DIR_COLUMN: ["/data/derivative", "/data/derivative", os.sep, "/data/primary"],
+            FILENAME_COLUMN: ["scaffold/view.json", None, "data.csv", "/elsewhere/data.csv"],
+        })
+        self.assertEqual([os.path.join("/data/derivative", "scaffold/view.json"), None, os.path.join(os.sep, "data.csv"),
+                          "/elsewhere/data.csv"], list(manifest_helper._get_file_locations(manifestDataFrame)))
+
+    def test_load_times(self):
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        load_times = manifest.get_load_times()
+        self.assertEqual(sorted([os.path.join(self._derivative_dir, MANIFEST_FILENAME),
+                                 os.path.join(self._primary_dir, MANIFEST_FILENAME)]),
+                         sorted(manifest_path for manifest_path, _ in load_times))
+        self.assertEqual(sorted((seconds for _, seconds in load_times), reverse=True), [seconds for _, seconds in load_times])
+
+    def test_manifest_cache(self):
+        cache = ManifestCache(get_cache_dir(self._dataset_dir))
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir, cache)
+        expected = manifest._manifestDataFrame.copy()
+
+        with mock.patch.object(manifest_helper, "_parse_manifest_workbook",
+                               wraps=manifest_helper._parse_manifest_workbook) as parse_manifest_workbook:
+            manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir, cache)
+            parse_manifest_workbook.assert_not_called()
+            self.assertTrue(expected.equals(manifest._manifestDataFrame))
+
+            # A write through the manifest data frame refreshes the cached entry.
+            self._update(manifest)
+            expected = manifest._manifestDataFrame.copy()
+            manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir, cache)
+            parse_manifest_workbook.assert_not_called()
+            self.assertEqual(sorted(expected[FILENAME_COLUMN].dropna()),
+                             sorted(manifest._manifestDataFrame[FILENAME_COLUMN].dropna()))
+
+            # Only a manifest changed by something else is parsed again.
+            _write_manifest(self._primary_dir, {FILENAME_COLUMN: ["data.csv", "other_data.csv"]})
+            manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir, cache)
+            self.assertEqual([os.path.join(self._primary_dir, MANIFEST_FILENAME)],
+                             [str(call.args[0]) for call in parse_manifest_workbook.call_args_list])
+        self.assertEqual(["other_data.csv"], manifest.get_filename(os.path.join(self._primary_dir, "other_data.csv")))
+
+    def test_parallel_load(self):
+        for i in range(4):
+            _write_manifest(os.path.join(self._dataset_dir, "primary", f"sub-{i}"), {FILENAME_COLUMN: [f"data_{i}.csv"]})
+        bad_manifest = os.path.join(self._dataset_dir, "primary", "sub-bad", MANIFEST_FILENAME)
+        os.makedirs(os.path.dirname(bad_manifest))
+        with open(bad_manifest, "w") as f:
+            f.write("not a workbook")
+
+        expected = ManifestDataFrame().setup_dataframe(self._dataset_dir)._manifestDataFrame.copy()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir, executor=executor)
+        self.assertTrue(expected.equals(manifest._manifestDataFrame))
+        self.assertEqual(["data.csv"] + [f"data_{i}.csv" for i in range(4)],
+                         sorted(manifest._manifestDataFrame[FILENAME_COLUMN].dropna())[:5])
+        self.assertEqual([bad_manifest], [manifest_path for manifest_path, _ in manifest.get_load_errors()])
+
+        # A programming error is not hidden as a load error.
+        with mock.patch.object(manifest_helper, "_parse_manifest_workbook", side_effect=TypeError("bug")):
+            with self.assertRaises(TypeError):
+                manifest_helper._load_manifest_workbook(bad_manifest)
+
+    def test_text_manifests(self):
+        metadata_file = os.path.join(self._derivative_dir, "scaffold_metadata.json")
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        self._update(manifest)
+        expected = _read_manifest(self._derivative_dir)["Sheet1"], _read_manifest(self._primary_dir)["Sheet1"]
+        expected_source_of = manifest.get_source_of(metadata_file)
+
+        for manifest_filename in ["manifest.csv", "manifest.tsv", "manifest.json"]:
+            self._set_up_dataset(os.path.join(self._temp_dir.name, manifest_filename))
+            for manifest_dir in [self._derivative_dir, self._primary_dir]:
+                sheet = _read_manifest(manifest_dir)["Sheet1"]
+                os.remove(os.path.join(manifest_dir, MANIFEST_FILENAME))
+                text_manifest = os.path.join(manifest_dir, manifest_filename)
+                if manifest_filename == "manifest.json":
+                    with open(text_manifest, "w") as f:
+                        json.dump(sheet.to_dict(orient="records"), f)
+                else:
+                    sheet.to_csv(text_manifest, sep="\t" if manifest_filename == "manifest.tsv" else ",", index=False)
+            metadata_file = os.path.join(self._derivative_dir, "scaffold_metadata.json")
+            text_manifest = os.path.join(self._derivative_dir, manifest_filename)
+            self.assertEqual((set(), [], None), classify_file(text_manifest, os.path.getsize(text_manifest),
+                                                             1000000, 1000000))
+
+            manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+            self.assertEqual(["scaffold_metadata.json"], manifest.get_filename(metadata_file))
+            self._update(manifest)
+            self.assertEqual(expected_source_of, manifest.get_source_of(metadata_file))
+
+            self.assertFalse(os.path.exists(os.path.join(self._derivative_dir, MANIFEST_FILENAME)))
+            manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+            self.assertEqual(expected_source_of, manifest.get_source_of(metadata_file))
+            for expected_sheet, manifest_dir in zip(expected, [self._derivative_dir, self._primary_dir]):
+                sheet = manifest._manifestDataFrame[manifest._manifestDataFrame[MANIFEST_DIR_COLUMN] == manifest_dir]
+                self.assertEqual(expected_sheet.fillna("").values.tolist(),
+                                 sheet[list(expected_sheet.columns)].fillna("").values.tolist())
+
+    def test_mixed_manifest_formats(self):
+        text_manifest = os.path.join(self._primary_dir, "manifest.csv")
+        pd.DataFrame({FILENAME_COLUMN: ["other_data.csv"]}).to_csv(text_manifest, index=False)
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+
+        # Each file is annotated in the manifest file that lists it.
+        manifest.update_additional_type(os.path.join(self._primary_dir, "other_data.csv"), PLOT_CSV_MIME)
+        manifest.update_supplemental_json(os.path.join(self._primary_dir, "data.csv"), '{"x": 1}')
+        self.assertEqual([PLOT_CSV_MIME], list(pd.read_csv(text_manifest)[ADDITIONAL_TYPES_COLUMN]))
+        self.assertEqual(["data.csv"], list(_read_manifest(self._primary_dir)["Sheet1"][FILENAME_COLUMN]))
+        self.assertEqual(["other_data.csv"], manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, PLOT_CSV_MIME))
+        self.assertEqual(['{"x": 1}'], manifest.get_matching_entry(FILENAME_COLUMN, "data.csv",
+                                                                   SUPPLEMENTAL_JSON_COLUMN))
+
+        # Reloading one manifest file keeps the rows of the other in the same directory.
+        pd.DataFrame({FILENAME_COLUMN: ["other_data.csv", "more_data.csv"]}).to_csv(text_manifest, index=False)
+        manifest.update_manifests([text_manifest])
+        self.assertEqual(["data.csv", "more_data.csv", "other_data.csv"],
+                         sorted(manifest._manifestDataFrame[manifest._manifestDataFrame[MANIFEST_DIR_COLUMN] ==
+                                                            self._primary_dir][FILENAME_COLUMN]))
+
+    def _set_up_relocation(self):
+        with pd.ExcelWriter(os.path.join(self._derivative_dir, MANIFEST_FILENAME)) as writer:
+            pd.DataFrame({
+                FILENAME_COLUMN: ["scaffold_metadata.json", "scaffold_view.json"],
+                ADDITIONAL_TYPES_COLUMN: [SCAFFOLD_META_MIME, SCAFFOLD_VIEW_MIME],
+                DERIVED_FROM_COLUMN: [None, "scaffold_metadata.json"],
+                SOURCE_OF_COLUMN: ["scaffold_view.json\nother_view.json", "thumbnail.jpeg"],
+            }).to_excel(writer, sheet_name="Sheet1", index=False)
+            pd.DataFrame({
+                FILENAME_COLUMN: ["thumbnail.jpeg"],
+                DERIVED_FROM_COLUMN: ["scaffold_view.json"],
+            }).to_excel(writer, sheet_name="Thumbnails", index=False)
+        _write_manifest(self._primary_dir, {FILENAME_COLUMN: ["data.csv"],
+                                            SOURCE_OF_COLUMN: ["../derivative/scaffold_view.json"]})
+        return ManifestDataFrame().setup_dataframe(self._dataset_dir)
+
+    def test_relocate_entry_same_folder(self):
+        manifest = self._set_up_relocation()
+        view_file = os.path.join(self._derivative_dir, "views", "view.json")
+        manifest.relocate_entry(os.path.join(self._derivative_dir, "scaffold_view.json"), view_file)
+
+        sheets = _read_manifest(self._derivative_dir)
+        self.assertEqual(["Sheet1", "Thumbnails"], list(sheets))
+        self.assertEqual(["scaffold_metadata.json", "views/view.json"], list(sheets["Sheet1"][FILENAME_COLUMN]))
+        self.assertEqual(["views/view.json\nother_view.json", "thumbnail.jpeg"], list(sheets["Sheet1"][SOURCE_OF_COLUMN]))
+        self.assertEqual(["scaffold_metadata.json"], list(sheets["Sheet1"][DERIVED_FROM_COLUMN].dropna()))
+        self.assertEqual(["views/view.json"], list(sheets["Thumbnails"][DERIVED_FROM_COLUMN]))
+        self.assertEqual(["../derivative/views/view.json"], list(_read_manifest(self._primary_dir)["Sheet1"][SOURCE_OF_COLUMN]))
+        self.assertEqual([SCAFFOLD_VIEW_MIME], manifest.get_matching_entry(FILE_LOCATION_COLUMN, view_file,
+                                                                          ADDITIONAL_TYPES_COLUMN))
+
+    def test_relocate_entry_cross_folder(self):
+        manifest = self._set_up_relocation()
+        other_dir = os.path.join(self._dataset_dir, "other")
+        os.makedirs(other_dir)
+        view_file = os.path.join(other_dir, "view.json")
+        manifest.relocate_entry(os.path.join(self._derivative_dir, "scaffold_view.json"), view_file)
+
+        sheets = _read_manifest(self._derivative_dir)
+        self.assertEqual(["Sheet1", "Thumbnails"], list(sheets))
+        self.assertEqual(["scaffold_metadata.json"], list(sheets["Sheet1"][FILENAME_COLUMN]))
+        self.assertEqual(["../other/view.json\nother_view.json"], list(sheets["Sheet1"][SOURCE_OF_COLUMN]))
+        self.assertEqual(["../other/view.json"], list(sheets["Thumbnails"][DERIVED_FROM_COLUMN]))
+        self.assertEqual(["../other/view.json"], list(_read_manifest(self._primary_dir)["Sheet1"][SOURCE_OF_COLUMN]))
+
+        # The references of the moved row are rewritten relative to its new manifest.
+        moved = _read_manifest(other_dir)["Sheet1"]
+        self.assertEqual(["view.json"], list(moved[FILENAME_COLUMN]))
+        self.assertEqual(["../derivative/scaffold_metadata.json"], list(moved[DERIVED_FROM_COLUMN]))
+        self.assertEqual(["../derivative/thumbnail.jpeg"], list(moved[SOURCE_OF_COLUMN]))
+        self.assertEqual([SCAFFOLD_VIEW_MIME], manifest.get_matching_entry(FILE_LOCATION_COLUMN, view_file,
+                                                                          ADDITIONAL_TYPES_COLUMN))
+        self.assertEqual([], manifest.get_matching_entry(FILE_LOCATION_COLUMN,
+                                                         os.path.join(self._derivative_dir, "scaffold_view.json")))
+
+    def test_patch_workbook(self):
+        manifest_path = os.path.join(self._derivative_dir, MANIFEST_FILENAME)
+        workbook = openpyxl.load_workbook(manifest_path)
+        worksheet = workbook.active
+        worksheet["A1"].font = Font(bold=True)
+        worksheet.column_dimensions["A"].width = 40
+        worksheet["C1"] = "size"
+        worksheet["C2"] = 12
+        workbook.create_sheet("Notes").append(["note", "kept"])
+        workbook.save(manifest_path)
+
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        self._update(manifest)
+        with manifest.batch():
+            manifest.update_supplemental_json(os.path.join(self._derivative_dir, "scaffold_view.json"), '{"y": 2}')
+
+        workbook = openpyxl.load_workbook(manifest_path)
+        self.assertEqual(["Sheet1", "Notes"], workbook.sheetnames)
+        worksheet = workbook["Sheet1"]
+        self.assertTrue(worksheet["A1"].font.b)
+        self.assertEqual(40, worksheet.column_dimensions["A"].width)
+        self.assertEqual(12, worksheet["C2"].value)
+        self.assertEqual([("note", "kept")], list(workbook["Notes"].values))
+
+        sheets = _read_manifest(self._derivative_dir)
+        self.assertEqual(["filename", "additional types", "size", SOURCE_OF_COLUMN, SUPPLEMENTAL_JSON_COLUMN],
+                         list(sheets["Sheet1"].columns))
+        self.assertEqual(["scaffold_metadata.json", "scaffold_view.json", "thumbnail.jpeg"],
+                         list(sheets["Sheet1"][FILENAME_COLUMN]))
+        self.assertEqual('{"y": 2}', sheets["Sheet1"][SUPPLEMENTAL_JSON_COLUMN][1])
+        self.assertEqual([], [name for name in os.listdir(self._derivative_dir) if name.startswith(".")])
+
+    def test_memory_lean(self):
+        metadata_file = os.path.join(self._derivative_dir, "scaffold_metadata.json")
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir)
+        self._update(manifest)
+        for column_name in manifest_helper.CATEGORICAL_COLUMNS:
+            self.assertEqual("category", manifest._manifestDataFrame[column_name].dtype.name)
+        self.assertNotIn(FILE_LOCATION_COLUMN, manifest._manifestDataFrame.columns)
+        self.assertEqual([metadata_file], manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, SCAFFOLD_META_MIME,
+                                                                      FILE_LOCATION_COLUMN))
+        memory_usage = manifest.get_memory_usage()
+        self.assertIn(FILE_LOCATION_COLUMN, dict(memory_usage))
+        self.assertEqual(sorted((nbytes for _, nbytes in memory_usage), reverse=True),
+                         [nbytes for _, nbytes in memory_usage])
+        expected_source_of = manifest.get_source_of(metadata_file)
+
+        manifest = ManifestDataFrame().setup_dataframe(self._dataset_dir, usecols=MANIFEST_VALIDATION_COLUMNS)
+        self.assertNotIn(SUPPLEMENTAL_JSON_COLUMN, manifest._manifestDataFrame.columns)
+        self.assertEqual(expected_source_of, manifest.get_source_of(metadata_file))
+
+        # The manifest files are written with the columns that were left out.
+        manifest.update_additional_type(os.path.join(self._primary_dir, "data.csv"), PLOT_CSV_MIME)
+        self.assertEqual(["data.csv"], manifest.get_matching_entry(ADDITIONAL_TYPES_COLUMN, PLOT_CSV_MIME))
+        self.assertNotIn(SUPPLEMENTAL_JSON_COLUMN, manifest._manifestDataFrame.columns)
+        self.assertEqual(['{"x": 1}'], list(_read_manifest(self._primary_dir)["Sheet1"][SUPPLEMENTAL_JSON_COLUMN]))
+
+
+if __name__ == "__main__":
+    unittest.main()